@@ -1,11 +1,12 @@
 from ..Service import *
-from flask import Blueprint, request,jsonify,make_response
+from flask import Blueprint, request,jsonify,make_response,Response,stream_with_context
 from ..CustomException import *
 from flask_jwt_extended import create_access_token,create_refresh_token,jwt_required,get_jwt,decode_token,set_access_cookies,set_refresh_cookies,get_csrf_token,get_jwt_identity,unset_jwt_cookies
 from datetime import timedelta,datetime
-from extensions import jwt,redis_client   
+from extensions import jwt,redis_client,mark_user_active,mark_user_inactive
 
 import redis
+import json
 
 auth_blueprint  = Blueprint("auth",__name__,url_prefix="/auth")
 
@@ -32,87 +33,12 @@ def login():
         user =  LoginUserService(user_data)
 
         # --- Caching User Data ---
-        # Cachujemo  (user:{user_id}) i dodatne podatke sa json.dumps
-        # ako postoji, setex will owerwrituje  ga, effectively updating it.
-
-        user_cache_data = {
-            "user_id": user["user_id"],
-            "username": user["username"],
-            "email": user["email"],
-            "user_type": user["user_type"],
-            "house_size_sqm": user["house_size_sqm"],
-            "num_household_members": user["num_household_members"],
-            "latitude": user["latitude"],
-            "longitude": user["longitude"],
-            "registration_date": user["registration_date"],              #bice u fomratu tipa 1753104047.0 sto je validno posto ovo moze da se json dumpuje u redis, govori kolko vremena je proslo od 1970 ....
-            "last_cached_at": datetime.now().timestamp()                        
-        }
-
-
-        redis_client.setex(f"user:{user['user_id']}", 3600, json.dumps(user_cache_data)) # Example TTL: 1 hour (3600 seconds)
-
-
-        solar_system_data = GetSolarSystemByUserIdService(user['user_id'])
-        if solar_system_data:
-            redis_client.set(f"user_solar_system_id:{user['user_id']}", str(solar_system_data['system_id']))
-            # cachiramo solarni sistem ceo
-
-            solar_system_cache_data = {
-                "system_id": solar_system_data["system_id"],
-                "user_id": solar_system_data["user_id"],
-                "battery_id": solar_system_data["battery_id"], # Can be None
-                "system_name": solar_system_data["system_name"],
-                "system_type": solar_system_data["system_type"],
-                "total_panel_wattage_wp": solar_system_data["total_panel_wattage_wp"],
-                "inverter_capacity_kw": solar_system_data["inverter_capacity_kw"],
-                "base_consumption_kw": solar_system_data["base_consumption_kw"],
-                "tilt_degrees": solar_system_data["tilt_degrees"],
-                "azimuth_degrees": solar_system_data["azimuth_degrees"],
-                "approved":solar_system_data["approved"],                       #DODATO ako ga je admin aprove-ovao onda je 1
-
-                "last_cached_at": datetime.now().timestamp()
-            }
-
-
-            redis_client.setex(f"solar_system:{solar_system_data['system_id']}", 3600, json.dumps(solar_system_cache_data))
-
-            # Cache battery_id mapiranje ako solarni system ima bateriju
-            if solar_system_data.get('battery_id'):
-                redis_client.set(f"solar_system_battery_id:{solar_system_data['system_id']}", str(solar_system_data['battery_id']))
-
-                
-                battery_data = GetBatteryDataService(solar_system_data['battery_id'])
-                if battery_data:
-
-                    battery_cache_data = {
-                        "battery_id": solar_system_data["battery_id"],
-                        "system_id": battery_data["system_id"], 
-                        "model_name": battery_data["model_name"],
-                        "capacity_kwh": battery_data["capacity_kwh"],
-                        "max_charge_rate_kw": battery_data["max_charge_rate_kw"],
-                        "max_discharge_rate_kw": battery_data["max_discharge_rate_kw"],
-                        "efficiency": battery_data["efficiency"],
-                        "manufacturer": battery_data["manufacturer"],
-                        "current_charge_percentage": battery_data["current_charge_percentage"],
-                        "last_cached_at": datetime.now().timestamp()
-                    }
-
-                    redis_client.setex(f"battery:{solar_system_data['battery_id']}", 1800, json.dumps(battery_cache_data))
-        else:
+        # user, solarni sistem, baterija i IoT uredjaji se ucitaju iz baze i prepisu u cache jednim pipeline-om (CacheRepository),
+        # refresh=True jer posle login-a user treba da vidi sveze podatke iz baze, ne ono sto je ostalo u cache-u
+        context = LoadUserContextService(user["user_id"], refresh=True)
+        if not context["solar_system"]:
             print(f"WARNING: No solar system found for user {user['user_id']} during login.")
 
-         # Cache IoT devices (ako postoje)
-        iot_devices_data = GetUsersIOTsService(user['user_id'])
-        if iot_devices_data:
-             
-            iot_devices_list_cache = {
-                "user_id": user["user_id"],
-                "solar_system_id": solar_system_data['system_id'],
-                "devices": iot_devices_data,                      # lista dictionary-a
-                "last_cached_at": datetime.now().timestamp()
-                }
-            redis_client.setex(f"user_iot_devices:{user['user_id']}", 600, json.dumps(iot_devices_list_cache))
-
 
         access_token = create_access_token(
             identity=str(user["user_id"]),
@@ -173,6 +99,9 @@ def login():
         pipe.setex(f"access_token:{access_jti}",int(timedelta(minutes=15).total_seconds()),json.dumps(user_metadata_access))    
         pipe.setex(f"refresh_token:{refresh_jti}",int(timedelta(days=7).total_seconds()),json.dumps(user_metadata_refresh))
 
+        # registar aktivnih user-a za live metering tick (umesto KEYS user:*)
+        mark_user_active(user["user_id"], pipe)
+
         #dodajemo sve id tokena koji pripadaju user-u, ukljucujuci i refresh token
         pipe.sadd(f"user_tokens:{user['user_id']}", access_jti, refresh_jti)
 
@@ -206,6 +135,44 @@ def login():
     
 
 
+def _parse_admin_users_query(args) -> tuple:
+    """
+    Query parametri za /admin_getUsers:
+        cursor                                  user_id poslednjeg user-a sa prethodne stranice (next_cursor iz odgovora)
+        limit                                   broj user-a na stranici (ADMIN_USERS_PAGE_SIZE default, najvise ADMIN_USERS_MAX_PAGE_SIZE)
+        approved                                true/false (1/0)
+        system_type                             grid_tied / grid_tied_hybrid
+        min_latitude, max_latitude,
+        min_longitude, max_longitude            region (bounding box)
+
+    Returns:
+        (after_user_id, limit, filters), ValueError za neispravne vrednosti
+    """
+    after_user_id = int(args.get("cursor", 0))
+    limit = int(args.get("limit", ADMIN_USERS_PAGE_SIZE))
+    if after_user_id < 0 or limit < 1:
+        raise ValueError("cursor must be >= 0 and limit >= 1")
+
+    filters = {}
+    approved = args.get("approved")
+    if approved is not None:
+        if approved.lower() not in ("1", "0", "true", "false"):
+            raise ValueError("approved must be true or false")
+        filters["approved"] = 1 if approved.lower() in ("1", "true") else 0
+
+    system_type = args.get("system_type")
+    if system_type is not None:
+        if system_type not in ("grid_tied", "grid_tied_hybrid"):
+            raise ValueError("system_type must be grid_tied or grid_tied_hybrid")
+        filters["system_type"] = system_type
+
+    for name in ("min_latitude", "max_latitude", "min_longitude", "max_longitude"):
+        if args.get(name) is not None:
+            filters[name] = float(args[name])
+
+    return after_user_id, limit, filters
+
+
 @auth_blueprint.route('/admin_getUsers', methods=['GET'])
 @jwt_required()
 def admin_only_get_users():
@@ -219,13 +186,32 @@ def admin_only_get_users():
             print(f"Unauthorized access attempt to /admin by user_id: {user_id}, user_type: {user_type}")
             return jsonify({"error": "Forbidden: Admin access required"}), 403
 
-        # 2. Fetch All User Data
-        all_users_data = GetAllUsersWithSystemDataService()
+        try:
+            after_user_id, limit, filters = _parse_admin_users_query(request.args)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid query parameters: {e}"}), 400
+
+        # 2a. NDJSON mod: svi user-i koji prolaze filtere, jedan JSON po liniji, ucitavaju se iz baze stranicu po stranicu dok se salju
+        if request.args.get("format") == "ndjson" or "application/x-ndjson" in request.headers.get("Accept", ""):
+            def generate():
+                try:
+                    for user in StreamUsersWithSystemDataService(after_user_id, filters):
+                        yield json.dumps(user) + "\n"
+                except Exception as e:
+                    # status 200 je vec poslat, greska ide kao poslednja linija
+                    print(f"Error while streaming users in /admin endpoint: {e}")
+                    yield json.dumps({"error": "An error occurred while streaming users"}) + "\n"
+
+            return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+        # 2b. Jedna stranica (keyset po user_id)
+        page = GetUsersWithSystemDataPageService(after_user_id, limit, filters)
         
         # 3. Success Response
         return jsonify({
-            "message": "Successfully retrieved all users and system data for admin review.",
-            "users": all_users_data
+            "message": "Successfully retrieved users and system data for admin review.",
+            "users": page["users"],
+            "next_cursor": page["next_cursor"],
         }), 200
 
     except ConnectionException as e:
@@ -263,9 +249,9 @@ def admin_update_user_approval():
         # 3. Perform update
         result = UpdateUserApprovalStatusService(system_id, approved)
 
-        #da ga obrisemo iz cache-a da bi se updejtovao approved
-        key = f"solar_system:{system_id}"
-        redis_client.delete(key)
+        #da ga obrisemo iz cache-a da bi se updejtovao approved (i sve sto zavisi od sistema, ukljucujuci live payload user-a)
+        # admin ne zna user_id vlasnika, publish_entity_change ga razresi iz solar_system:{id} ili iz baze
+        publish_entity_change("solar_system", system_id=system_id)
 
 
 
@@ -295,152 +281,24 @@ def get_current_user_details():
         #ovde treba int posto cemo ici do mysql-a
         user_id = int(get_jwt_identity())
 
-        # --- Uzimamo potrebne kljuceve za Redis ---
-
-        # kljucevi u redisu su storovani za         pipe.setex(f"solar_system:{solar_system_id}", 3600, json.dumps(solar_system_cache_data))
-        # i onda nam treba syste_id a to dobijamo preko drugog cache koji stoji vecno        
-        #  pipe.set(f"user_solar_system_id:{user_id}", str(solar_system_id))                      
-
-
-        system_id = None
-        battery_id = None
-
-        system_id_str = redis_client.get(f"user_solar_system_id:{user_id}")
-        if system_id_str:
-            system_id = int(system_id_str)
-            battery_id_str = redis_client.get(f"solar_system_battery_id:{system_id}")
-            if battery_id_str: 
-                battery_id = int(battery_id_str)
-
-        # --- Phase II: Build-ujemi i executujemo pipe za odredjene IDs ---
-        pipe = redis_client.pipeline()
-        keys_to_fetch = [] 
-
-        keys_to_fetch.append(f"user:{user_id}")
-        pipe.get(f"user:{user_id}")
-
-        keys_to_fetch.append(f"user_iot_devices:{user_id}")
-        pipe.get(f"user_iot_devices:{user_id}")
-
-        if system_id:
-            keys_to_fetch.append(f"solar_system:{system_id}")
-            pipe.get(f"solar_system:{system_id}")
-        if battery_id:
-            keys_to_fetch.append(f"battery:{battery_id}")
-            pipe.get(f"battery:{battery_id}")
-
-        # Parse JSON stringova
-        results = pipe.execute()
-        cached_data_raw = {keys_to_fetch[i]: results[i] for i in range(len(keys_to_fetch))}
-
+        # --- Phase I-III: ceo kontekst iz Redis-a u jednom round trip-u, fallback na bazu i upis u cache su u LoadUserContextService ---
+        context = LoadUserContextService(user_id)
 
-        user_data = json.loads(cached_data_raw.get(f"user:{user_id}")) if cached_data_raw.get(f"user:{user_id}") else None
-        
-        iot_devices_cache = json.loads(cached_data_raw.get(f"user_iot_devices:{user_id}")) if cached_data_raw.get(f"user_iot_devices:{user_id}") else None
+        user_data = context["user"]
+        solar_system_data = context["solar_system"]
+        battery_data = context["battery"]
+        iot_devices_data = context["iot_devices"]
 
-            #moramo ovako uzeti iot_devices posto sam ga cudno sacuvao
-        iot_devices_data = iot_devices_cache.get("devices", []) if iot_devices_cache else []
+        if not user_data:
+            return jsonify({"error": "User data not found"}), 404
 
-        solar_system_data = json.loads(cached_data_raw.get(f"solar_system:{system_id}")) if system_id and cached_data_raw.get(f"solar_system:{system_id}") else None
-        battery_data = json.loads(cached_data_raw.get(f"battery:{battery_id}")) if battery_id and cached_data_raw.get(f"battery:{battery_id}") else None
+        if not solar_system_data:
+            # CRITICAL ERROR: User postoji a system na postoji.
+            # Ovo ne sme da se desi
+            print(f"CRITICAL ERROR: User {user_id} found, but no solar system data in DB.")
+            return jsonify({"error": "Solar system data not found for user"}), 500
 
-
-        # --- Phase III: Fallback ka Bazi Podataka i Cachiramo (ako su podaci istekli u Redis-u tj Cache missovali smo) ---
-
-        # User Data (Ako ne postoji hasiran not user_data onda idemo do baze podataka u suprotnom nastavljamo dole)
-        if not user_data:
-            user_data = GetUserByIdService(user_id)
-            if user_data:
-                user_cache_data = {
-                    "user_id": user_id,
-                    "username": user_data["username"],
-                    "email": user_data["email"],
-                    "user_type": user_data["user_type"],
-                    "house_size_sqm": user_data["house_size_sqm"],
-                    "num_household_members": user_data["num_household_members"],
-                    "latitude": user_data["latitude"],
-                    "longitude": user_data["longitude"],
-                    "registration_date": user_data["registration_date"],              #bice u fomratu tipa 1753104047.0 sto je validno posto ovo moze da se json dumpuje u redis, govori kolko vremena je proslo od 1970 ....
-                    "last_cached_at": datetime.now().timestamp()                        
-                }
-
-
-                redis_client.setex(f"user:{user_id}", 3600, json.dumps(user_cache_data))              #cachiramo podatke 
-            else:
-                return jsonify({"error": "User data not found"}), 404
-        
-        # Solar System Data, uzimamo solar sistem ako postoji validni podaci za user-a 
-        if not solar_system_data and user_data:                                                 # Samo ako user postoji ovo pokusavamo
-            solar_system_data_from_db = GetSolarSystemByUserIdService(user_id)
-            if solar_system_data_from_db:
-                solar_system_data = solar_system_data_from_db
-                system_id = solar_system_data['system_id']
-
-                solar_system_cache_data = {
-                    "system_id": system_id,
-                    "user_id": user_id,
-                    "battery_id": battery_id, # Can be None
-                    "system_name": solar_system_data["system_name"],
-                    "system_type": solar_system_data["system_type"],
-                    "total_panel_wattage_wp": solar_system_data["total_panel_wattage_wp"],
-                    "inverter_capacity_kw": solar_system_data["inverter_capacity_kw"],
-                    "base_consumption_kw": solar_system_data["base_consumption_kw"],
-                    "tilt_degrees": solar_system_data["tilt_degrees"],
-                    "azimuth_degrees": solar_system_data["azimuth_degrees"],
-                    "approved":solar_system_data["approved"],                       #DODATO ako ga je admin aprove-ovao onda je 1
-                    "last_cached_at": datetime.now().timestamp()
-                }
-
-
-                redis_client.setex(f"solar_system:{system_id}", 3600, json.dumps(solar_system_cache_data))
-                redis_client.set(f"user_solar_system_id:{user_id}", str(system_id))
-            else:
-                # CRITICAL ERROR: User postoji a system na postoji.
-                # Ovo ne sme da se desi
-                print(f"CRITICAL ERROR: User {user_id} found, but no solar system data in DB.")
-                return jsonify({"error": "Solar system data not found for user"}), 500             
-
-        # Battery Data (opcionalno, zavisi da li uopste postoji solarni sistem da nije doslo do greske)
-        if not battery_data and solar_system_data and solar_system_data.get("battery_id"):
-            
-            #solar_system_data.get("battery_id") osigurava da battery_id nije None i onda mogu poslati dole u service id lagano
-            battery_id_from_solar_system = solar_system_data["battery_id"]
-            battery_data_from_db = GetBatteryDataService(battery_id_from_solar_system)      #saljemo id baterije iz solarnog sistema
-            if battery_data_from_db:
-                battery_data = battery_data_from_db
-
-                battery_cache_data = {
-                    "battery_id": battery_id,
-                    "system_id": battery_data["system_id"], 
-                    "model_name": battery_data["model_name"],
-                    "capacity_kwh": battery_data["capacity_kwh"],
-                    "max_charge_rate_kw": battery_data["max_charge_rate_kw"],
-                    "max_discharge_rate_kw": battery_data["max_discharge_rate_kw"],
-                    "efficiency": battery_data["efficiency"],
-                    "manufacturer": battery_data["manufacturer"],
-                    "current_charge_percentage": battery_data["current_charge_percentage"],
-                    "last_cached_at": datetime.now().timestamp()
-                }
-
-
-
-                redis_client.setex(f"battery:{battery_id_from_solar_system}", 1800, json.dumps(battery_cache_data))
-                redis_client.set(f"solar_system_battery_id:{solar_system_data['system_id']}", str(battery_id_from_solar_system)) # Update mapping too
-
-        # IoT Devices Data (optional)
-        if not iot_devices_data and user_data: 
-            iot_devices_data_from_db = GetUsersIOTsService(user_id)
-            if iot_devices_data_from_db:
-                iot_devices_data = iot_devices_data_from_db
-
-                iot_devices_list_cache = {
-                "user_id": user_id,
-                "solar_system_id": system_id,
-                "devices": iot_devices_data,                      # lista dictionary-a
-                "last_cached_at": datetime.now().timestamp()
-                }
-
-                redis_client.setex(f"user_iot_devices:{user_id}", 600, json.dumps(iot_devices_list_cache))
+        mark_user_active(user_id)               # /me se zove pri svakom ucitavanju fronta, pomera last-seen u registru
 
 
         # --- Phase IV: Pravimo Odgovor ---
@@ -560,7 +418,10 @@ def logout():                                #takoddje raiseuje error ako nema t
         # Brisanje cache-a da bi pri login-u dobili fresh data
         # Brisemo iot
         pipe.delete(f"user:{identity}")
-        pipe.delete(f"user_iot_devices:{identity}")
+        pipe.delete(f"user_iot_devices:{identity}")                                           # iot_device:{id} hash-evi bez indeksa se ne citaju, isticu sami (IOT_DEVICES_CACHE_TTL)
+
+        # user vise nije aktivan, live metering tick ga preskace
+        mark_user_inactive(identity, pipe)
 
         # 
         # odavde izvucemo solar_system id
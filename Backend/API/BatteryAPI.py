@@ -43,13 +43,10 @@ def add_battery():
 
         # 2. Update the 'solar_systems' table with the new battery ID
         # Use the new function we defined above
-        UpdateSolarSystemBatteryIdService(solar_System_id, new_battery["battery_id"])
+        UpdateSolarSystemBatteryIdService(solar_System_id, new_battery["battery_id"], user_id=user_id)
 
-
-        user_solar_system_key = f"user_solar_system_id:{user_id}" # Maps user to system ID
-        solar_system_data_key = f"solar_system:{solar_System_id}" # The main system data, now stale
-        # Batch delete the two keys that are now stale
-        redis_client.delete(user_solar_system_key, solar_system_data_key) 
+        # cache invalidaciju (solar_system -> battery -> iot -> live payload) objavljuju
+        # AddSolarSystemToBatteryService i UpdateSolarSystemBatteryIdService preko InvalidationBus-a
 
         return jsonify({
             "message": "Battery added/updated successfully.", 
@@ -84,22 +81,10 @@ def delete_battery():
             # Vracamo 404 ako baterija nije ni postojala (ili 500 ako je doslo do greske u bazi)
             return jsonify({"error": "Failed to delete battery or battery not found."}), 404
         
-        # --- Cache keys to delete: ---
-        battery_key = f"battery:{battery_id_to_delete}" # Cache for the battery itself (correct)
-        system_battery_link_key = f"solar_system_battery_id:{solar_system_id_to_delete}" # Link (correct)
-        user_solar_system_key = f"user_solar_system_id:{user_id}" # User->System ID mapping (correct)
-        
-    
-        solar_system_data_key = f"solar_system:{solar_system_id_to_delete}"
-        # -----------------------------
-        
-        # You can delete them all at once:
-        redis_client.delete(
-            battery_key, 
-            system_battery_link_key, 
-            user_solar_system_key, 
-            solar_system_data_key # ADDED
-    )
+        # --- Cache invalidacija ---
+        # solarni sistem vise nema bateriju: brise se solar_system, baterija, IoT i live payload user-a (Redis i L1 u svim procesima)
+        publish_entity_change("solar_system", user_id=user_id, system_id=solar_system_id_to_delete, battery_id=battery_id_to_delete)
+        ForgetBatteryStateService(int(battery_id_to_delete))
 
         return jsonify({
             "message": "Battery deleted successfully."
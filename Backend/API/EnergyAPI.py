@@ -0,0 +1,47 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime, timedelta, timezone
+from ..Service import *
+from ..CustomException import *
+
+# Kreiranje Blueprint-a za istoriju energije
+energy_bp = Blueprint('energy', __name__)
+
+# opseg kada from/to nisu prosledjeni
+ENERGY_HISTORY_DEFAULT_DAYS = 7
+
+
+@energy_bp.route("/energy/history", methods=["GET"])
+@jwt_required()
+def get_energy_history():
+    """
+    Istorija energije ulogovanog user-a za grafikone.
+
+    Query parametri:
+        from, to        unix sekunde ili ISO 8601 (UTC), default poslednjih ENERGY_HISTORY_DEFAULT_DAYS dana
+        resolution      auto (default), hour, day, week, month, auto bira po duzini opsega
+        max_points      najvise tacaka za auto (default HISTORY_DEFAULT_MAX_POINTS)
+
+    Odgovor je kolonski: {"resolution", "from", "to", "timestamps": [...], "solar_production_kwh": [...], ...}
+    """
+    try:
+        user_id = int(get_jwt_identity())
+
+        try:
+            end = parse_history_time(request.args["to"]) if "to" in request.args else datetime.now(timezone.utc)
+            start = parse_history_time(request.args["from"]) if "from" in request.args else end - timedelta(days=ENERGY_HISTORY_DEFAULT_DAYS)
+            max_points = int(request.args.get("max_points", HISTORY_DEFAULT_MAX_POINTS))
+
+            history = GetEnergyHistoryService(user_id, start, end, request.args.get("resolution", "auto"), max_points)
+        except (ValueError, OverflowError) as e:                       # OverflowError: "from" po default-u pre 1. godine
+            return jsonify({"error": f"Invalid query parameters: {e}"}), 400
+
+        return jsonify(history), 200
+
+    except ConnectionException as e:
+        print(f"Database error in /energy/history endpoint: {e}")
+        return jsonify({"error": "A database connection error occurred"}), 500
+
+    except Exception as e:
+        print(f"An unexpected error occurred in /energy/history endpoint: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
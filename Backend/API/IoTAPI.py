@@ -12,8 +12,8 @@ iot_bp = Blueprint('iot', __name__)
 def update_iot_device_state():
     """
     Endpoint za promenu stanja IoT uređaja.
-    Nakon promene, invalidira (brise) cache za live merenje kako bi se podaci
-    odmah aaurirali pri sledecem pozivu.
+    Nakon promene, menja current_status u cache-u uredjaja (jedan HSET) kako bi live merenje
+    odmah koristilo novo stanje bez odlaska do baze.
     """
     try:
         user_id = get_jwt_identity()
@@ -30,11 +30,10 @@ def update_iot_device_state():
         if not success:
             return jsonify({"error": "Failed to update device state"}), 500
 
-        # --- INVALIDACIJA CACHE-a ---
-        # obrisacemo ovo i onda u live meteringu ce morati da ide do baze da pokupi iot uredjaje
-
-        cache_key = f"user_iot_devices:{user_id}"
-        redis_client.delete(cache_key)
+        # --- AZURIRANJE CACHE-a ---
+        # ranije smo brisali celu listu i live metering je morao da ide do baze, sada se menja samo polje uredjaja
+        UpdateCachedIotDeviceService(user_id, device_id, {"current_status": new_state})
+        publish_entity_change("iot_devices", user_id=user_id, updated_in_place=True)       # cache uredjaja je vec azuriran, brise se live payload
 
         return jsonify({"message": "Device state updated successfully"}), 200
 
@@ -48,7 +47,7 @@ def update_iot_device_state():
 def update_iot_device_priority():
     """
     Endpoint for changing the priority level of an IoT device.
-    Invalidates the live metering cache after the change.
+    Updates the priority field of the cached device in place after the change.
     """
     try:
         user_id = get_jwt_identity()
@@ -73,9 +72,9 @@ def update_iot_device_priority():
         if not success:
              return jsonify({"error": "Failed to update device priority or device not found"}), 500
 
-        # --- INVALIDACIJA CACHE-a ---
-        cache_key = f"user_iot_devices:{user_id}"
-        redis_client.delete(cache_key)
+        # --- AZURIRANJE CACHE-a ---
+        UpdateCachedIotDeviceService(user_id, device_id, {"priority_level": new_priority})
+        publish_entity_change("iot_devices", user_id=user_id, updated_in_place=True)       # cache uredjaja je vec azuriran, brise se live payload
 
         return jsonify({"message": "Device priority updated successfully"}), 200
 
@@ -108,13 +107,15 @@ def add_iot_device():
         if not success:
             return jsonify({"error": "Failed to register new device in database."}), 500
         
-        # 2. Invalidate cache
-        cache_key = f"user_iot_devices:{user_id}"
-        redis_client.delete(cache_key)
-
-        # 3. Fetch and return the full, updated list of devices 
+        # 2. Fetch the full, updated list of devices (novi uredjaj dobija device_id tek u bazi)
         updated_devices = GetUsersIOTsService(user_id)
 
+        # 3. Refresh cache with the fresh list instead of deleting it
+        pipe = redis_client.pipeline()
+        write_iot_devices_cache(pipe, user_id, updated_devices)
+        pipe.execute()
+        publish_entity_change("iot_devices", user_id=user_id, updated_in_place=True)       # cache uredjaja je vec azuriran, brise se live payload
+
         return jsonify({
             "message": "Device added successfully.", 
             "devices": updated_devices
@@ -149,9 +150,9 @@ def delete_iot_device():
         if not success:
             return jsonify({"error": "Failed to delete device or device not found."}), 500
         
-        # 2. Invalidate cache
-        cache_key = f"user_iot_devices:{user_id}"
-        redis_client.delete(cache_key)
+        # 2. Remove only this device from cache
+        RemoveCachedIotDeviceService(user_id, device_id)
+        publish_entity_change("iot_devices", user_id=user_id, updated_in_place=True)       # cache uredjaja je vec azuriran, brise se live payload
 
         # 3. Fetch and return the full, updated list of devices
         updated_devices = GetUsersIOTsService(user_id)
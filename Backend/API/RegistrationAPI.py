@@ -251,75 +251,21 @@ def register_user():
 
         user_id = user_db["user_id"]
 
-        #2. Cachiranje user-a
-        user_cache_data = {
-            "user_id": user_id,
-            "username": user_db["username"],
-            "email": user_db["email"],
-            "user_type": user_db["user_type"],
-            "house_size_sqm": user_db["house_size_sqm"],
-            "num_household_members": user_db["num_household_members"],
-            "latitude": user_db["latitude"],
-            "longitude": user_db["longitude"],
-            "registration_date": user_db["registration_date"],              #bice u fomratu tipa 1753104047.0 sto je validno posto ovo moze da se json dumpuje u redis, govori kolko vremena je proslo od 1970 ....
-            "last_cached_at": datetime.now().timestamp()                        
-        }
-        # TTL za user podatke, 1 sat (3600 seconds)
-        pipe.setex(f"user:{user_id}", 3600, json.dumps(user_cache_data))
+        #2. Cachiranje user-a (oblik podataka i TTL-ovi su u CacheRepository)
+        write_user_cache(pipe, build_user_cache_data(user_db))
 
         solar_system_id = solar_system_db["system_id"]
-        # 3. Cache Solar System Data
-        solar_system_cache_data = {
-            "system_id": solar_system_id,
-            "user_id": user_id,
-            "battery_id": battery_id, # Can be None
-            "system_name": solar_system_db["system_name"],
-            "system_type": solar_system_db["system_type"],
-            "total_panel_wattage_wp": solar_system_db["total_panel_wattage_wp"],
-            "inverter_capacity_kw": solar_system_db["inverter_capacity_kw"],
-            "base_consumption_kw": solar_system_db["base_consumption_kw"],
-            "tilt_degrees": solar_system_db["tilt_degrees"],
-            "azimuth_degrees": solar_system_db["azimuth_degrees"],
-            "approved":solar_system_db["approved"],                       #DODATO ako ga je admin aprove-ovao onda je 1
-
-            "last_cached_at": datetime.now().timestamp()
-        }
-
-        # TTL za solar system data, 1 hour (3600 seconds)
-        pipe.setex(f"solar_system:{solar_system_id}", 3600, json.dumps(solar_system_cache_data))
-        pipe.set(f"user_solar_system_id:{user_id}", str(solar_system_id))                       # da bih posle mogao pre user_id da dobavim system_id od solarnog sistema
+        # 3. Cache Solar System Data + user_solar_system_id:{user_id} mapiranje
+        write_solar_system_cache(pipe, user_id, build_solar_system_cache_data({**solar_system_db, "user_id": user_id, "battery_id": battery_id}))
 
-
-        # 4. Cache Battery Data (ako postoji)
+        # 4. Cache Battery Data (ako postoji), hash battery:{id} + solar_system_battery_id:{system_id} mapiranje
         if battery_db:
-            battery_cache_data = {
-                "battery_id": battery_id,
-                "system_id": battery_db["system_id"], 
-                "model_name": battery_db["model_name"],
-                "capacity_kwh": battery_db["capacity_kwh"],
-                "max_charge_rate_kw": battery_db["max_charge_rate_kw"],
-                "max_discharge_rate_kw": battery_db["max_discharge_rate_kw"],
-                "efficiency": battery_db["efficiency"],
-                "manufacturer": battery_db["manufacturer"],
-                "current_charge_percentage": battery_db["current_charge_percentage"],
-                "last_cached_at": datetime.now().timestamp()
-            }
-            # TTL za battery data, 30 minutes (1800 seconds)
-            pipe.setex(f"battery:{battery_id}", 1800, json.dumps(battery_cache_data))
-            pipe.set(f"solar_system_battery_id:{solar_system_id}", str(battery_id))                       # da bih preko system_id mogao da dobavim podatke o bateriji
+            write_battery_cache(pipe, battery_id, battery_db, system_id=solar_system_id)
 
         # 5. Cache IoT Devices Data (ako postoje)
         if iot_devices_data:
-            # Cache  cele liste IoT devices od user-a
-            # Posle pogledaj da li treba individualno cachiranje IoT device-a
-            iot_devices_list_cache = {
-                "user_id": user_id,
-                "solar_system_id": solar_system_id,
-                "devices": iot_devices_db,                      # lista dictionary-a
-                "last_cached_at": datetime.now().timestamp()
-            }
-            # TTL for IoT devices, maybe shorter, e.g., 5-15 minutes (300-900 seconds)
-            pipe.setex(f"user_iot_devices:{user_id}", 600, json.dumps(iot_devices_list_cache))
+            # Svaki uredjaj je svoj hash iot_device:{device_id}, a user_iot_devices:{user_id} je set njihovih id-eva
+            write_iot_devices_cache(pipe, user_id, iot_devices_db)
 
 
         pipe.execute()
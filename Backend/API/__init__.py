@@ -2,3 +2,4 @@ from .RegistrationAPI import *
 from .AuthentificationAPI import *
 from .IoTAPI import *
 from .BatteryAPI import *
+from .EnergyAPI import *
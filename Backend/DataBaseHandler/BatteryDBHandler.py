@@ -262,6 +262,47 @@ def update_battery_percentage(battery_id: int, new_percentage: float) -> bool:
 
 
 
+def update_battery_percentages(percentages: list) -> int:
+    """
+    Azurira procenat napunjenosti za vise baterija jednim executemany pozivom i jednim commit-om.
+    Koristi ga write-behind flush (UpdateService.FlushBatteryStateService) umesto po jednog UPDATE-a po bateriji po tick-u.
+
+    Args:
+        percentages (list): lista (battery_id, new_percentage) parova
+
+    Returns:
+        int: broj azuriranih redova
+
+    Raises:
+        ConnectionException: Ako dođe do greske prilikom rada sa bazom.
+    """
+    if not percentages:
+        return 0
+
+    update_query = """
+    UPDATE batteries
+    SET current_charge_percentage = %s
+    WHERE battery_id = %s
+    """
+
+    connection = getConnection()
+    cursor = connection.cursor()
+
+    try:
+        cursor.executemany(update_query, [(new_percentage, battery_id) for battery_id, new_percentage in percentages])
+        connection.commit()
+
+        return cursor.rowcount
+
+    except mysql.connector.Error as err:
+        connection.rollback()
+        raise ConnectionException(f"Greska baze podataka prilikom azuriranja stanja baterija: {str(err)}")
+
+    finally:
+        cursor.close()
+        release_connection(connection)
+
+
 
 
 def DeleteBattery(battery_id: int) -> bool:
@@ -141,6 +141,30 @@ def GetSolarSystemByUserId(user_id:int)->dict:
 
 
 
+def GetSolarSystemOwnerId(system_id: int) -> int:
+    """
+    Vraca user_id vlasnika solarnog sistema, ili None ako sistem ne postoji.
+    Koristi ga InvalidationBus kada solar_system:{id} vise nije u cache-u pa vlasnik ne moze da se procita odatle.
+
+    Raises:
+        ConnectionException: Ako dođe do greske prilikom rada sa bazom.
+    """
+    connection = getConnection()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("SELECT user_id FROM solar_systems WHERE system_id = %s;", (system_id,))
+        row = cursor.fetchone()
+        return int(row[0]) if row else None
+
+    except mysql.connector.Error as err:
+        raise ConnectionException(f"Database error while reading solar system owner: {str(err)}")
+
+    finally:
+        cursor.close()
+        release_connection(connection)
+
+
 #NOVO
 def UpdateSolarSystemBatteryId(system_id: int, battery_id: int = None) -> bool:
     """
@@ -1 +1,133 @@
-# NE ZABORAVI DA KONVERTUJES IZ DECIMALA U FLOAT 
\ No newline at end of file
+# NE ZABORAVI DA KONVERTUJES IZ DECIMALA U FLOAT
+from .DataBaseStart import *
+from .UserHourlyDBHandler import HOURLY_ENERGY_COLUMNS
+
+from ..CustomException import *
+
+
+def get_changed_energy_days(since) -> tuple:
+    """
+    Vraca (user, dan) parove ciji su se satni redovi u user_hourly_energy_data promenili od since (updated_at, indeks idx_hourly_updated_at)
+    i trenutno vreme baze, koje je sledeci watermark (uzima se pre upita da promene tokom upita ne bi bile preskocene).
+
+    Args:
+        since (datetime): watermark, None za sve dane
+
+    Returns:
+        tuple: (lista (user_id, record_date) parova, datetime baze na pocetku)
+
+    Raises:
+        ConnectionException: Ako dođe do greske prilikom rada sa bazom.
+    """
+    connection = getConnection()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("SELECT NOW();")
+        db_now = cursor.fetchone()[0]
+
+        if since is None:
+            cursor.execute("SELECT DISTINCT user_id, DATE(record_datetime) FROM user_hourly_energy_data;")
+        else:
+            cursor.execute(
+                "SELECT DISTINCT user_id, DATE(record_datetime) FROM user_hourly_energy_data WHERE updated_at >= %s;",
+                (since,),
+            )
+        return [(int(user_id), record_date) for user_id, record_date in cursor.fetchall()], db_now
+
+    except mysql.connector.Error as err:
+        raise ConnectionException(f"Database error while reading changed energy days: {str(err)}")
+
+    finally:
+        cursor.close()
+        release_connection(connection)
+
+
+def rollup_daily_energy(user_days: list) -> int:
+    """
+    Preracunava user_daily_energy_summary za date (user, dan) parove jednim INSERT ... SELECT ... GROUP BY upitom.
+    Dan se uvek sabira iz svih njegovih sati (ne dodaje se na staru sumu), pa ponovni rollup istog dana daje isti rezultat.
+    Uslov je po opsegu (user_id, record_datetime) da bi se koristio primarni kljuc satne tabele.
+
+    Args:
+        user_days (list): lista (user_id, record_date) parova, pozivalac ih deli u batch-eve
+
+    Returns:
+        int: broj preracunatih dana
+
+    Raises:
+        ConnectionException: Ako dođe do greske prilikom rada sa bazom.
+    """
+    if not user_days:
+        return 0
+
+    day_condition = " OR ".join(
+        ["(user_id = %s AND record_datetime >= %s AND record_datetime < %s + INTERVAL 1 DAY)"] * len(user_days)
+    )
+    params = []
+    for user_id, record_date in user_days:
+        params.extend((user_id, record_date, record_date))
+
+    columns = ", ".join(HOURLY_ENERGY_COLUMNS)
+    sums = ", ".join(f"SUM({column})" for column in HOURLY_ENERGY_COLUMNS)
+    update_clause = ", ".join(f"{column} = VALUES({column})" for column in HOURLY_ENERGY_COLUMNS)
+
+    rollup_query = f"""
+    INSERT INTO user_daily_energy_summary (user_id, record_date, {columns})
+    SELECT user_id, DATE(record_datetime), {sums}
+    FROM user_hourly_energy_data
+    WHERE {day_condition}
+    GROUP BY user_id, DATE(record_datetime)
+    ON DUPLICATE KEY UPDATE {update_clause}
+    """
+
+    connection = getConnection()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute(rollup_query, tuple(params))
+        connection.commit()
+        return len(user_days)
+
+    except mysql.connector.Error as err:
+        connection.rollback()
+        raise ConnectionException(f"Database error while rolling up daily energy: {str(err)}")
+
+    finally:
+        cursor.close()
+        release_connection(connection)
+
+
+def get_user_daily_energy(user_id: int, start_date, end_date) -> list[dict]:
+    """
+    Dnevne sume user-a za dane [start_date, end_date) sortirane po datumu, vrednosti kao float.
+
+    Raises:
+        ConnectionException: Ako dođe do greske prilikom rada sa bazom.
+    """
+    query = f"""
+    SELECT record_date, {", ".join(HOURLY_ENERGY_COLUMNS)}
+    FROM user_daily_energy_summary
+    WHERE user_id = %s AND record_date >= %s AND record_date < %s
+    ORDER BY record_date;
+    """
+
+    connection = getConnection()
+    cursor = connection.cursor(dictionary=True)
+
+    try:
+        cursor.execute(query, (user_id, start_date, end_date))
+        rows = cursor.fetchall()
+
+        for row in rows:
+            for column in HOURLY_ENERGY_COLUMNS:
+                row[column] = float(row[column])
+
+        return rows
+
+    except mysql.connector.Error as err:
+        raise ConnectionException(f"Database error while reading daily energy summary: {str(err)}")
+
+    finally:
+        cursor.close()
+        release_connection(connection)
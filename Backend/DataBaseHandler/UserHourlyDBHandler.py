@@ -1,4 +1,107 @@
+# NE ZABORAVI DA KONVERTUJES IZ DECIMALA U FLOAT
+from .DataBaseStart import *
 
+from ..CustomException import *
 
 
-# NE ZABORAVI DA KONVERTUJES IZ DECIMALA U FLOAT 
\ No newline at end of file
+HOURLY_ENERGY_COLUMNS = (
+    "solar_production_kwh",
+    "household_consumption_kwh",
+    "grid_import_kwh",
+    "grid_export_kwh",
+    "battery_charge_kwh",
+    "battery_discharge_kwh",
+)
+
+# koliko redova ide u jedan INSERT (max_allowed_packet i velicina jednog upita)
+HOURLY_ENERGY_INSERT_BATCH = 500
+
+
+def upsert_user_hourly_energy(rows: list[dict]) -> int:
+    """
+    Dodaje satne kWh vrednosti u user_hourly_energy_data multi-row INSERT ... ON DUPLICATE KEY UPDATE upitima (po HOURLY_ENERGY_INSERT_BATCH redova)
+    i jednim commit-om. Ako red za (user_id, record_datetime) vec postoji vrednosti se SABIRAJU, pa deo sata koji je stigao posle flush-a
+    (zakasneli tick) samo dopuni sat umesto da ga pregazi.
+
+    Args:
+        rows (list[dict]): {"user_id", "record_datetime" (datetime, pocetak sata u UTC), i kolone iz HOURLY_ENERGY_COLUMNS}
+
+    Returns:
+        int: broj upisanih sati
+
+    Raises:
+        ConnectionException: Ako dođe do greske prilikom rada sa bazom.
+    """
+    if not rows:
+        return 0
+
+    columns = ("user_id", "record_datetime") + HOURLY_ENERGY_COLUMNS
+    row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    update_clause = ", ".join(f"{column} = {column} + VALUES({column})" for column in HOURLY_ENERGY_COLUMNS)
+
+    connection = getConnection()
+    cursor = connection.cursor()
+
+    try:
+        for start in range(0, len(rows), HOURLY_ENERGY_INSERT_BATCH):
+            batch = rows[start:start + HOURLY_ENERGY_INSERT_BATCH]
+            insert_query = f"""
+            INSERT INTO user_hourly_energy_data ({", ".join(columns)})
+            VALUES {", ".join([row_placeholder] * len(batch))}
+            ON DUPLICATE KEY UPDATE {update_clause}
+            """
+            params = []
+            for row in batch:
+                params.append(row["user_id"])
+                params.append(row["record_datetime"])
+                params.extend(round(float(row.get(column, 0.0)), 3) for column in HOURLY_ENERGY_COLUMNS)
+            cursor.execute(insert_query, tuple(params))
+
+        connection.commit()
+        return len(rows)
+
+    except mysql.connector.Error as err:
+        connection.rollback()
+        raise ConnectionException(f"Database error while saving hourly energy data: {str(err)}")
+
+    finally:
+        cursor.close()
+        release_connection(connection)
+
+
+def get_user_hourly_energy(user_id: int, start, end) -> list[dict]:
+    """
+    Satni redovi user-a za [start, end) sortirani po vremenu, vrednosti kao float.
+
+    Args:
+        start, end (datetime): naivni UTC (kao record_datetime)
+
+    Raises:
+        ConnectionException: Ako dođe do greske prilikom rada sa bazom.
+    """
+    query = f"""
+    SELECT record_datetime, {", ".join(HOURLY_ENERGY_COLUMNS)}
+    FROM user_hourly_energy_data
+    WHERE user_id = %s AND record_datetime >= %s AND record_datetime < %s
+    ORDER BY record_datetime;
+    """
+
+    connection = getConnection()
+    cursor = connection.cursor(dictionary=True)
+
+    try:
+        cursor.execute(query, (user_id, start, end))
+        rows = cursor.fetchall()
+
+        for row in rows:
+            for column in HOURLY_ENERGY_COLUMNS:
+                row[column] = float(row[column])
+
+        return rows
+
+    except mysql.connector.Error as err:
+        raise ConnectionException(f"Database error while reading hourly energy data: {str(err)}")
+
+    finally:
+        cursor.close()
+        release_connection(connection)
@@ -222,58 +222,167 @@ def GetAllUsersBasic() -> list[dict]:
 
 
 
-def GetAllUsersWithSystemData() -> list[dict]:
+# Kolone koje GetAllUsersWithSystemData vraca za solarni sistem i bateriju (iste kao SELECT * iz GetSolarSystemByUserId / GetBatteryIdBySystemIDService),
+# u JOIN-u dobijaju prefiks da se ne bi sudarile (system_id, battery_id i user_id postoje u vise tabela)
+_SOLAR_SYSTEM_COLUMNS = (
+    "system_id", "user_id", "system_name", "system_type", "total_panel_wattage_wp", "inverter_capacity_kw",
+    "battery_id", "base_consumption_kw", "tilt_degrees", "azimuth_degrees", "approved",
+)
+_BATTERY_COLUMNS = (
+    "battery_id", "system_id", "model_name", "capacity_kwh", "max_charge_rate_kw", "max_discharge_rate_kw",
+    "efficiency", "manufacturer", "current_charge_percentage",
+)
+_SOLAR_SYSTEM_FLOAT_COLUMNS = ("total_panel_wattage_wp", "inverter_capacity_kw", "base_consumption_kw")
+_BATTERY_FLOAT_COLUMNS = ("capacity_kwh", "max_charge_rate_kw", "max_discharge_rate_kw", "efficiency", "current_charge_percentage")
+
+
+def _take_prefixed(row: dict, prefix: str, columns: tuple, float_columns: tuple) -> dict:
+    """Izdvaja kolone sa prefiksom iz reda JOIN-a, None ako LEFT JOIN nije nasao red (primarni kljuc je NULL)."""
+    if row[f"{prefix}{columns[0]}"] is None:
+        return None
+    data = {column: row[f"{prefix}{column}"] for column in columns}
+    for column in float_columns:
+        if data[column] is not None:
+            data[column] = float(data[column])
+    return data
+
+
+# Filteri za admin listu user-a: ime filtera -> SQL uslov (vrednost ide kao parametar)
+USER_LIST_FILTERS = {
+    "approved": "s.approved = %s",
+    "system_type": "s.system_type = %s",
+    "min_latitude": "u.latitude >= %s",
+    "max_latitude": "u.latitude <= %s",
+    "min_longitude": "u.longitude >= %s",
+    "max_longitude": "u.longitude <= %s",
+}
+
+
+def _load_users_with_system_data(conditions: list, params: list, limit: int = None) -> list[dict]:
     """
-    Fetches all users and aggregates their associated solar system, battery, and IoT devices.
-    
-    Returns:
-        list[dict]: A list where each dictionary contains user data and nested system/device data.
+    User-i (samo regular) sa solarnim sistemom, baterijom i IoT uredjajima u dva upita na jednoj konekciji:
+    user-i, sistemi i baterije su jedan LEFT JOIN, IoT uredjaji samo za vracene user-e drugi upit, grupisanje po user-u je u Python-u.
     """
-    all_users = GetAllUsersBasic()
-    
+    solar_system_select = ", ".join(f"s.{column} AS ss_{column}" for column in _SOLAR_SYSTEM_COLUMNS)
+    battery_select = ", ".join(f"b.{column} AS b_{column}" for column in _BATTERY_COLUMNS)
+    where = " AND ".join(["u.user_type='regular'"] + conditions)
+
+    # baterija se vraca samo za hibridne sisteme, kao i ranije
+    users_query = f"""
+    SELECT
+        u.user_id, u.username, u.email, u.user_type, u.house_size_sqm,
+        u.num_household_members, u.latitude, u.longitude, u.registration_date,
+        {solar_system_select},
+        {battery_select}
+    FROM users u
+    LEFT JOIN solar_systems s ON s.user_id = u.user_id
+    LEFT JOIN batteries b ON b.system_id = s.system_id AND s.system_type = 'grid_tied_hybrid'
+    WHERE {where}
+    ORDER BY u.user_id
+    """
+    if limit is not None:
+        users_query += " LIMIT %s"
+        params = list(params) + [int(limit)]
 
-    
-    users_with_data = []
-    
-    for user in all_users:
-        user_id = user["user_id"]
-        
+    connection = getConnection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(users_query, tuple(params))
+        rows = cursor.fetchall()
+
+        devices = []
+        if rows:
+            if limit is None:
+                # svi user-i, nema smisla slati listu id-eva
+                cursor.execute("""
+                SELECT d.*
+                FROM iot_devices d
+                JOIN users u ON u.user_id = d.user_id
+                WHERE u.user_type='regular'
+                ORDER BY d.user_id, d.device_id;
+                """)
+            else:
+                user_ids = [row["user_id"] for row in rows]
+                placeholders = ", ".join(["%s"] * len(user_ids))
+                cursor.execute(f"SELECT * FROM iot_devices WHERE user_id IN ({placeholders}) ORDER BY user_id, device_id;", tuple(user_ids))
+            devices = cursor.fetchall()
+    except mysql.connector.Error as err:
+        raise ConnectionException(f"Database error while fetching all users: {str(err)}")
+    finally:
+        cursor.close()
+        release_connection(connection)
 
-        # SELECT * FROM solar_systems WHERE user_id = %s
-        solar_system = None
-        try:
-            solar_system = GetSolarSystemByUserId(user_id)
-        except Exception: 
-            # Catching generic exception here is a common pattern for "optional" related data 
-            pass
-        
-        user["solar_system"] = solar_system
-        
-        battery = None
-        if solar_system and solar_system.get("system_type") == "grid_tied_hybrid":
-            try:
+    devices_by_user = {}
+    for device in devices:
+        device["base_consumption_watts"] = float(device["base_consumption_watts"])
+        if device["added_date"]:
+            device["added_date"] = device["added_date"].timestamp()
+        devices_by_user.setdefault(device["user_id"], []).append(device)
 
-                battery = GetBatteryIdBySystemIDService(solar_system["system_id"])
-            except Exception:
-                pass
-        
+    users_with_data = []
+    for row in rows:
+        user = {
+            "user_id": row["user_id"],
+            "username": row["username"],
+            "email": row["email"],
+            "user_type": row["user_type"],
+            "house_size_sqm": float(row["house_size_sqm"]),
+            "num_household_members": row["num_household_members"],
+            "latitude": float(row["latitude"]),
+            "longitude": float(row["longitude"]),
+            "registration_date": row["registration_date"].timestamp() if row["registration_date"] else row["registration_date"],
+        }
+
+        solar_system = _take_prefixed(row, "ss_", _SOLAR_SYSTEM_COLUMNS, _SOLAR_SYSTEM_FLOAT_COLUMNS)
         if solar_system:
-            solar_system["battery"] = battery 
+            solar_system["battery"] = _take_prefixed(row, "b_", _BATTERY_COLUMNS, _BATTERY_FLOAT_COLUMNS)
 
+        user["solar_system"] = solar_system
+        user["iot_devices"] = devices_by_user.get(user["user_id"], [])
 
-        iot_devices = []
-        try:
-            iot_devices = GetIoTDevicesByUserId(user_id)
-        except Exception:
-            pass
-            
-        user["iot_devices"] = iot_devices
-        
         users_with_data.append(user)
-        
+
     return users_with_data
 
 
+def GetAllUsersWithSystemData() -> list[dict]:
+    """
+    Fetches all users and aggregates their associated solar system, battery, and IoT devices.
+
+    Ranije je ovo bio GetAllUsersBasic pa za svakog user-a GetSolarSystemByUserId, GetBatteryIdBySystemIDService i GetIoTDevicesByUserId
+    (1 + 3N upita i isto toliko uzimanja konekcije iz pool-a), sada su to dva upita (_load_users_with_system_data). Oblik odgovora je isti.
+
+    Returns:
+        list[dict]: A list where each dictionary contains user data and nested system/device data.
+    """
+    return _load_users_with_system_data([], [])
+
+
+def GetUsersWithSystemDataPage(after_user_id: int = 0, limit: int = 50, filters: dict = None) -> list[dict]:
+    """
+    Jedna stranica admin liste user-a (isti oblik kao GetAllUsersWithSystemData), keyset paginacija po user_id:
+    WHERE user_id > after_user_id ORDER BY user_id LIMIT, pa svaka stranica kosta isto bez obzira koliko je duboko.
+
+    Args:
+        after_user_id: poslednji user_id sa prethodne stranice (0 za prvu)
+        limit: broj user-a na stranici
+        filters: kljucevi iz USER_LIST_FILTERS (approved, system_type, min/max_latitude, min/max_longitude),
+                 filteri po sistemu vracaju samo user-e koji imaju solarni sistem
+
+    Returns:
+        list[dict]: user-i sortirani po user_id, manje od limit znaci da je ovo poslednja stranica
+    """
+    conditions = ["u.user_id > %s"]
+    params = [int(after_user_id)]
+    for name, value in (filters or {}).items():
+        if name not in USER_LIST_FILTERS:
+            raise IlegalValuesException(f"Unknown user filter '{name}'")
+        conditions.append(USER_LIST_FILTERS[name])
+        params.append(value)
+
+    return _load_users_with_system_data(conditions, params, limit)
+
+
 
 def UpdateUserApprovalStatus(system_id: int, approved: bool) -> None:
     """
@@ -2,4 +2,6 @@ from .DataBaseStart import *
 from .UsersDBHandler import *
 from .BatteryDBHandler import *
 from .SolarSystemDBHandler import *
-from .IotDBHandler import*
\ No newline at end of file
+from .IotDBHandler import*
+from .UserHourlyDBHandler import *
+from .UserDailyDBHandle import *
\ No newline at end of file
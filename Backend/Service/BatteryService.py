@@ -1,4 +1,5 @@
 from ..DataBaseHandler import *                #importujemo DataBase Handlere, tu se nalazi RegisterBattery
+from .InvalidationBus import publish_entity_change
 
 
 
@@ -52,7 +53,9 @@ def AddSolarSystemToBatteryService(battery_id,system_id) -> bool:
     if not isinstance(system_id, int) or system_id <= 0:
         raise IlegalValuesException("Solar System ID must be a positive integer.")
 
-    return AddSolarSystemToBattery(battery_id, system_id)
+    result = AddSolarSystemToBattery(battery_id, system_id)
+    publish_entity_change("battery", battery_id=battery_id, system_id=system_id)        # system_id baterije je promenjen
+    return result
 
 def GetBatteryDataService(battery_id:int)->dict:
 
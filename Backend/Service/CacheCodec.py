@@ -0,0 +1,100 @@
+#Service/CacheCodec.py
+# Kodiranje vrednosti za Redis cache (user:, solar_system:, live_metering_data: kao celi string-ovi, battery: i iot_device: po poljima hash-a).
+#
+# Do sada je sve bilo json.dumps string, sada se bira codec preko CACHE_CODEC:
+#   msgpack -> binarni format, manji i brzi za encode/decode (default, ako msgpack nije instaliran koristi se json)
+#   json    -> isto kao ranije
+# Binarne vrednosti pocinju jednim header bajtom (MSGPACK_HEADER) koji JSON tekst nikad nema na pocetku,
+# pa decode_cache_value cita i stare JSON unose koji su jos u Redis-u dok im ne istekne TTL.
+# Binarne vrednosti se citaju preko redis_binary_client (decode_responses=False), redis_client bi pokusao da ih dekodira kao utf-8.
+#
+# battery:{id} i iot_device:{id} su Redis hash-evi (da bi promena jednog polja bila jedan HSET), njihova polja se kodiraju
+# encode_hash_fields: svaka vrednost kao JSON skalar da bi se sacuvao tip (13.5 ostaje float, null ostaje None).
+
+import json
+import os
+
+try:
+    import msgpack
+except ImportError:                     # msgpack je u requirements.txt, bez njega cache ostaje JSON
+    msgpack = None
+
+
+MSGPACK_HEADER = b"\x01"
+
+
+class JsonCodec:
+    name = "json"
+
+    @staticmethod
+    def encode(value) -> str:
+        return json.dumps(value)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+
+    @staticmethod
+    def encode(value) -> bytes:
+        return MSGPACK_HEADER + msgpack.packb(value, use_bin_type=True)
+
+
+CACHE_CODECS = {
+    JsonCodec.name: JsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+}
+
+
+def get_cache_codec(name: str = None):
+    """Vraca codec po imenu (default CACHE_CODEC iz env-a), msgpack bez instaliranog paketa pada na json."""
+    name = (name or os.getenv("CACHE_CODEC", "msgpack")).lower()
+    if name not in CACHE_CODECS:
+        raise ValueError(f"Unknown CACHE_CODEC '{name}', expected one of: {', '.join(CACHE_CODECS)}")
+    if name == MsgpackCodec.name and msgpack is None:
+        return JsonCodec
+    return CACHE_CODECS[name]
+
+
+_cache_codec = get_cache_codec()
+
+
+def encode_cache_value(value):
+    """Kodira dict/listu za upis u Redis trenutnim codec-om."""
+    return _cache_codec.encode(value)
+
+
+def encode_hash_fields(values: dict) -> dict:
+    """dict -> mapping za HSET, svaka vrednost kao JSON skalar."""
+    return {field: json.dumps(value) for field, value in values.items()}
+
+
+def decode_hash_fields(raw) -> dict:
+    """
+    Rezultat HGETALL-a (dict iz redis-py ili ravna lista [polje, vrednost, ...] iz Lua skripte) -> dict sa originalnim tipovima.
+
+    Returns:
+        dict ili None ako hash ne postoji (prazan rezultat)
+    """
+    if not raw:
+        return None
+    pairs = raw.items() if isinstance(raw, dict) else zip(raw[0::2], raw[1::2])
+    return {
+        (field.decode("utf-8") if isinstance(field, bytes) else field): json.loads(value)
+        for field, value in pairs
+    }
+
+
+def decode_cache_value(raw):
+    """
+    Dekodira vrednost procitanu iz Redis-a bez obzira kojim je codec-om upisana.
+
+    Returns:
+        dict/lista ili None ako kljuc ne postoji
+    """
+    if not raw:
+        return None
+    if isinstance(raw, bytes) and raw[:1] == MSGPACK_HEADER:
+        if msgpack is None:
+            raise ValueError("Cache entry is msgpack encoded but msgpack is not installed")
+        return msgpack.unpackb(raw[1:], raw=False)
+    return json.loads(raw)
@@ -0,0 +1,409 @@
+#Service/CacheRepository.py
+# Jedno mesto za Redis cache entiteta (user, solarni sistem, baterija, IoT uredjaji, live payload).
+#
+# Ranije su login, /auth/me i calculate_and_emit_live_data svaki imali svoju kopiju koda koji ucita podatke iz baze,
+# napravi dict za cache i uradi setex sa TTL-om napisanim rucno (3600/1800/600). Sada:
+#   CacheEntity            format kljuca, TTL i nacin cuvanja (ceo string kodiran CacheCodec-om ili hash po poljima)
+#   CACHE_TTL_POLICY       TTL po entitetu, moze se promeniti preko env-a CACHE_TTL_<ENTITET> (npr. CACHE_TTL_BATTERY=900)
+#   build_*_cache_data     jedini oblik podataka koji ide u cache
+#   load_*                 tipizirani loader-i iz baze koji vracaju vec napravljen cache oblik
+#   get_many / set_many    bulk citanje/upis preko jednog pipeline-a
+#   record_cache_lookup    hit/miss brojaci po entitetu, skupljaju se u memoriji procesa i na CACHE_STATS_FLUSH_SECONDS
+#                          upisuju u Redis hash cache_stats (HINCRBY) pa se vide zbirno za sve worker-e i API procese
+#   *_cache_fill_lock      single-flight punjenje izmedju procesa: SET NX PX lock, samo vlasnik ide do baze,
+#                          ostali cekaju da ga pusti (najvise CACHE_FILL_WAIT_SECONDS) i citaju ono sto je upisao
+
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from extensions import redis_binary_client
+from .CacheCodec import encode_cache_value, decode_cache_value, encode_hash_fields, decode_hash_fields
+from .UserService import GetUserByIdService
+from .SolarSystemService import GetSolarSystemByUserIdService
+from .BatteryService import GetBatteryDataService
+from .IoTService import GetUsersIOTsService
+
+
+def _cache_ttl(entity_name: str, default: int) -> int:
+    return int(os.getenv(f"CACHE_TTL_{entity_name.upper()}", str(default)))
+
+
+CACHE_TTL_POLICY = {
+    "user": _cache_ttl("user", 3600),
+    "solar_system": _cache_ttl("solar_system", 3600),
+    "battery": _cache_ttl("battery", 1800),
+    "iot_devices": _cache_ttl("iot_devices", 600),
+    "live_metering_data": _cache_ttl("live_metering_data", 4),
+    "live_metering_snapshot": _cache_ttl("live_metering_snapshot", 3600),
+}
+
+USER_CACHE_TTL = CACHE_TTL_POLICY["user"]
+SOLAR_SYSTEM_CACHE_TTL = CACHE_TTL_POLICY["solar_system"]
+BATTERY_CACHE_TTL = CACHE_TTL_POLICY["battery"]
+IOT_DEVICES_CACHE_TTL = CACHE_TTL_POLICY["iot_devices"]
+LIVE_METERING_CACHE_TTL = CACHE_TTL_POLICY["live_metering_data"]
+LIVE_SNAPSHOT_CACHE_TTL = CACHE_TTL_POLICY["live_metering_snapshot"]
+
+CACHE_STATS_KEY = "cache_stats"
+CACHE_STATS_FLUSH_SECONDS = float(os.getenv("CACHE_STATS_FLUSH_SECONDS", "10"))
+
+# Lock istice sam ako vlasnik padne usred punjenja, pa mora biti duzi od najsporijeg ucitavanja iz baze
+CACHE_FILL_LOCK_SECONDS = float(os.getenv("CACHE_FILL_LOCK_SECONDS", "5"))
+# Koliko dugo ostali cekaju vlasnika pre nego sto sami odu do baze
+CACHE_FILL_WAIT_SECONDS = float(os.getenv("CACHE_FILL_WAIT_SECONDS", "2"))
+CACHE_FILL_POLL_SECONDS = 0.02
+
+
+class CacheEntity:
+    """Jedna vrsta cache unosa: format kljuca, TTL i da li se cuva kao hash (battery:, iot_device:) ili kao kodiran string."""
+    __slots__ = ("name", "key_format", "ttl", "is_hash")
+
+    def __init__(self, name: str, key_format: str, ttl: int, is_hash: bool = False):
+        self.name = name
+        self.key_format = key_format
+        self.ttl = ttl
+        self.is_hash = is_hash
+
+    def key(self, entity_id) -> str:
+        return self.key_format.format(entity_id)
+
+    def read(self, pipe, entity_id):
+        """Dodaje citanje u pipeline, rezultat se dekodira sa decode."""
+        if self.is_hash:
+            pipe.hgetall(self.key(entity_id))
+        else:
+            pipe.get(self.key(entity_id))
+
+    def decode(self, raw):
+        return decode_hash_fields(raw) if self.is_hash else decode_cache_value(raw)
+
+    def write(self, pipe, entity_id, data: dict):
+        """Dodaje upis u pipeline. Hash se prvo brise da ne ostanu polja (ili stari string unos) od prethodne verzije."""
+        key = self.key(entity_id)
+        if self.is_hash:
+            pipe.delete(key)
+            pipe.hset(key, mapping=encode_hash_fields(data))
+            pipe.expire(key, self.ttl)
+        else:
+            pipe.setex(key, self.ttl, encode_cache_value(data))
+
+
+USER_CACHE = CacheEntity("user", "user:{}", USER_CACHE_TTL)
+SOLAR_SYSTEM_CACHE = CacheEntity("solar_system", "solar_system:{}", SOLAR_SYSTEM_CACHE_TTL)
+BATTERY_CACHE = CacheEntity("battery", "battery:{}", BATTERY_CACHE_TTL, is_hash=True)
+IOT_DEVICE_CACHE = CacheEntity("iot_devices", "iot_device:{}", IOT_DEVICES_CACHE_TTL, is_hash=True)
+LIVE_METERING_CACHE = CacheEntity("live_metering_data", "live_metering_data:{}", LIVE_METERING_CACHE_TTL)
+# poslednji payload poslat klijentima sa seq brojem, osnova za delta emit-ove (LiveDelta)
+LIVE_SNAPSHOT_CACHE = CacheEntity("live_metering_snapshot", "live_metering_snapshot:{}", LIVE_SNAPSHOT_CACHE_TTL)
+
+# Negativni cache: user bez solarnog sistema ili bez IoT uredjaja bi inace svaki tick promasio cache, uzeo fill lock i isao do baze.
+# user_solar_system_id:{user_id} = "0" (sa TTL-om solarnog sistema) znaci da user nema sistem,
+# user_iot_devices:{user_id} koji sadrzi samo 0 (sa TTL-om uredjaja) znaci da user nema uredjaja. Id-evi iz baze su uvek > 0.
+# Oba markera nestaju sa istim brisanjima kao i pravi unosi (logout, publish_entity_change, novi upis).
+NO_ENTITY_ID = 0
+
+
+# --- Hit/miss brojaci ---
+_cache_stats = Counter()
+_cache_stats_flushed_at = time.monotonic()
+
+
+def record_cache_lookup(entity_name: str, hits: int = 0, misses: int = 0):
+    """Broji hit/miss za entitet u memoriji procesa, na svakih CACHE_STATS_FLUSH_SECONDS ih upisuje u Redis."""
+    if hits:
+        _cache_stats[f"{entity_name}:hits"] += hits
+    if misses:
+        _cache_stats[f"{entity_name}:misses"] += misses
+
+    if time.monotonic() - _cache_stats_flushed_at >= CACHE_STATS_FLUSH_SECONDS:
+        flush_cache_stats()
+
+
+def flush_cache_stats():
+    """Upisuje brojace nakupljene u ovom procesu u cache_stats hash (jedan pipeline HINCRBY-a) i prazni ih."""
+    global _cache_stats_flushed_at
+    _cache_stats_flushed_at = time.monotonic()
+    if not _cache_stats:
+        return
+
+    pending = dict(_cache_stats)
+    _cache_stats.clear()
+    try:
+        pipe = redis_binary_client.pipeline(transaction=False)
+        for field, count in pending.items():
+            pipe.hincrby(CACHE_STATS_KEY, field, count)
+        pipe.execute()
+    except Exception as e:
+        # brojaci nisu bitni da bi se zbog njih oborio request, vracamo ih za sledeci flush
+        _cache_stats.update(pending)
+        print(f"Failed to flush cache stats: {e}")
+
+
+def GetCacheStatsService() -> dict:
+    """
+    Vraca zbirne hit/miss brojace iz Redis-a (svi procesi) plus ono sto ovaj proces jos nije upisao.
+
+    Returns:
+        dict: entitet -> {"hits", "misses", "hit_rate"}
+    """
+    totals = Counter({
+        (field.decode("utf-8") if isinstance(field, bytes) else field): int(count)
+        for field, count in redis_binary_client.hgetall(CACHE_STATS_KEY).items()
+    })
+    totals.update(_cache_stats)
+
+    stats = {}
+    for field, count in totals.items():
+        entity_name, kind = field.rsplit(":", 1)
+        stats.setdefault(entity_name, {"hits": 0, "misses": 0})[kind] = count
+    for entity_stats in stats.values():
+        lookups = entity_stats["hits"] + entity_stats["misses"]
+        entity_stats["hit_rate"] = round(entity_stats["hits"] / lookups, 3) if lookups else None
+    return stats
+
+
+# --- Single-flight punjenje cache-a ---
+# brise lock samo ako je jos nas (token), da ne obrisemo lock koji je drugi proces uzeo posle isteka naseg
+_release_fill_lock_script = redis_binary_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+def _cache_fill_lock_key(name: str) -> str:
+    return f"cache_fill_lock:{name}"
+
+
+def acquire_cache_fill_lock(name: str):
+    """
+    Pokusava da uzme lock za punjenje cache-a (npr. name="user_context:12").
+
+    Returns:
+        str token ako je lock nas (tada mi idemo do baze i moramo ga pustiti sa release_cache_fill_lock), inace None
+    """
+    token = uuid.uuid4().hex
+    if redis_binary_client.set(_cache_fill_lock_key(name), token, nx=True, px=int(CACHE_FILL_LOCK_SECONDS * 1000)):
+        return token
+    return None
+
+
+def release_cache_fill_lock(name: str, token: str):
+    _release_fill_lock_script(keys=[_cache_fill_lock_key(name)], args=[token])
+
+
+def wait_for_cache_fill(name: str) -> bool:
+    """
+    Ceka da vlasnik pusti lock (upisao je cache). time.sleep je gevent-patch-ovan pa ostali greenlet-i rade za to vreme.
+
+    Returns:
+        bool: True ako je lock pusten, False ako je isteklo CACHE_FILL_WAIT_SECONDS (pozivalac tada sam ide do baze)
+    """
+    lock_key = _cache_fill_lock_key(name)
+    deadline = time.monotonic() + CACHE_FILL_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(CACHE_FILL_POLL_SECONDS)
+        if not redis_binary_client.exists(lock_key):
+            record_cache_lookup("fill_lock", hits=1)
+            return True
+    record_cache_lookup("fill_lock", misses=1)
+    return False
+
+
+# --- Oblik podataka u cache-u ---
+def build_user_cache_data(user_data: dict) -> dict:
+    return {
+        "user_id": user_data["user_id"],
+        "username": user_data["username"],
+        "email": user_data["email"],
+        "user_type": user_data["user_type"],
+        "house_size_sqm": user_data["house_size_sqm"],
+        "num_household_members": user_data["num_household_members"],
+        "latitude": user_data["latitude"],
+        "longitude": user_data["longitude"],
+        "registration_date": user_data["registration_date"],              #bice u fomratu tipa 1753104047.0 sto je validno posto ovo moze da se json dumpuje u redis
+        "last_cached_at": datetime.now().timestamp()
+    }
+
+
+def build_solar_system_cache_data(solar_system_data: dict) -> dict:
+    return {
+        "system_id": solar_system_data["system_id"],
+        "user_id": solar_system_data["user_id"],
+        "battery_id": solar_system_data["battery_id"], # Can be None
+        "system_name": solar_system_data["system_name"],
+        "system_type": solar_system_data["system_type"],
+        "total_panel_wattage_wp": solar_system_data["total_panel_wattage_wp"],
+        "inverter_capacity_kw": solar_system_data["inverter_capacity_kw"],
+        "base_consumption_kw": solar_system_data["base_consumption_kw"],
+        "tilt_degrees": solar_system_data["tilt_degrees"],
+        "azimuth_degrees": solar_system_data["azimuth_degrees"],
+        "approved": solar_system_data["approved"],                       #ako ga je admin aprove-ovao onda je 1
+        "last_cached_at": datetime.now().timestamp()
+    }
+
+
+def build_battery_cache_data(battery_id, battery_data):
+    """
+    Builds a battery cache data dictionary from the given battery data.
+
+    Args:
+        battery_id (int): Battery ID for the Redis key.
+        battery_data (dict): Battery information from DB or calculations.
+
+    Returns:
+        dict: Battery data formatted for Redis cache.
+    """
+    return {
+        "battery_id": battery_id,
+        "system_id": battery_data.get("system_id"),
+        "model_name": battery_data.get("model_name"),
+        "capacity_kwh": battery_data.get("capacity_kwh"),
+        "max_charge_rate_kw": battery_data.get("max_charge_rate_kw"),
+        "max_discharge_rate_kw": battery_data.get("max_discharge_rate_kw"),
+        "efficiency": battery_data.get("efficiency"),
+        "manufacturer": battery_data.get("manufacturer"),
+        "current_charge_percentage": battery_data.get("current_charge_percentage"),
+        "last_cached_at": datetime.now().timestamp()
+    }
+
+
+# --- Tipizirani loader-i iz baze (vracaju cache oblik ili None) ---
+def load_user(user_id: int) -> dict:
+    user_data = GetUserByIdService(user_id)
+    return build_user_cache_data(user_data) if user_data else None
+
+
+def load_solar_system(user_id: int) -> dict:
+    solar_system_data = GetSolarSystemByUserIdService(user_id)
+    return build_solar_system_cache_data(solar_system_data) if solar_system_data else None
+
+
+def load_battery(battery_id: int) -> dict:
+    battery_data = GetBatteryDataService(battery_id)
+    return build_battery_cache_data(battery_id, battery_data) if battery_data else None
+
+
+def load_iot_devices(user_id: int) -> list:
+    return GetUsersIOTsService(user_id) or []
+
+
+# --- Upis ---
+def write_user_cache(pipe, user_data: dict):
+    USER_CACHE.write(pipe, user_data["user_id"], user_data)
+
+
+def write_solar_system_cache(pipe, user_id, solar_system_data: dict):
+    """Upisuje solarni sistem i mapiranje user_solar_system_id:{user_id} (ono nema TTL, brise se na logout-u)."""
+    SOLAR_SYSTEM_CACHE.write(pipe, solar_system_data["system_id"], solar_system_data)
+    pipe.set(f"user_solar_system_id:{user_id}", str(solar_system_data["system_id"]))
+
+
+def write_battery_cache(pipe, battery_id, battery_data: dict, system_id=None):
+    """Upisuje bateriju kao hash battery:{id}, a ako je prosledjen system_id i mapiranje solar_system_battery_id:{system_id}."""
+    BATTERY_CACHE.write(pipe, battery_id, build_battery_cache_data(battery_id, battery_data))
+    if system_id is not None:
+        pipe.set(f"solar_system_battery_id:{system_id}", str(battery_id))
+
+
+def write_no_solar_system_cache(pipe, user_id):
+    """Negativni cache: user nema solarni sistem (NO_ENTITY_ID umesto system_id-a), istice posle SOLAR_SYSTEM_CACHE_TTL."""
+    pipe.set(f"user_solar_system_id:{user_id}", str(NO_ENTITY_ID), ex=SOLAR_SYSTEM_CACHE.ttl)
+
+
+def write_iot_devices_cache(pipe, user_id, devices: list):
+    """
+    Upisuje uredjaje user-a u prosledjeni pipeline: svaki uredjaj je hash iot_device:{device_id},
+    a user_iot_devices:{user_id} je set njihovih id-eva. Prazna lista se upisuje kao set sa samo NO_ENTITY_ID.
+    """
+    index_key = f"user_iot_devices:{user_id}"
+    pipe.delete(index_key)
+    if not devices:
+        pipe.sadd(index_key, NO_ENTITY_ID)
+        pipe.expire(index_key, IOT_DEVICE_CACHE.ttl)
+        return
+
+    cached_at = datetime.now().timestamp()
+    for device in devices:
+        IOT_DEVICE_CACHE.write(pipe, device["device_id"], {**device, "last_cached_at": cached_at})
+    pipe.sadd(index_key, *[device["device_id"] for device in devices])
+    pipe.expire(index_key, IOT_DEVICE_CACHE.ttl)
+
+
+# HSET polja uredjaja samo ako je uredjaj u cache-u i pripada user-u (inace bi HSET napravio hash sa samo tim poljem)
+# KEYS[1] = user_iot_devices:{user_id}, KEYS[2] = iot_device:{device_id}, ARGV[1] = device_id, ARGV[2..] = polje, vrednost, ...
+_update_iot_device_script = redis_binary_client.register_script("""
+if redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 1 and redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('HSET', KEYS[2], unpack(ARGV, 2))
+    return 1
+end
+return 0
+""")
+
+
+def UpdateCachedIotDeviceService(user_id, device_id, fields: dict, pipe=None) -> bool:
+    """
+    Menja polja jednog uredjaja u cache-u na mestu (npr. current_status ili priority_level), bez prepisivanja cele liste.
+    Ako uredjaj nije u cache-u ne radi nista, sledece ucitavanje ga uzima iz baze gde je promena vec upisana.
+
+    Returns:
+        bool: True ako je uredjaj bio u cache-u i azuriran (uvek True kada se prosledi pipeline, rezultat je tada u pipe.execute())
+    """
+    args = [device_id]
+    for field, value in encode_hash_fields(fields).items():
+        args.extend((field, value))
+
+    result = _update_iot_device_script(
+        keys=[f"user_iot_devices:{user_id}", IOT_DEVICE_CACHE.key(device_id)], args=args, client=pipe or redis_binary_client
+    )
+    return pipe is not None or result == 1
+
+
+def RemoveCachedIotDeviceService(user_id, device_id):
+    """Brise uredjaj iz cache-a user-a (posle brisanja iz baze)."""
+    pipe = redis_binary_client.pipeline(transaction=False)
+    pipe.srem(f"user_iot_devices:{user_id}", device_id)
+    pipe.delete(IOT_DEVICE_CACHE.key(device_id))
+    pipe.execute()
+
+
+# --- Bulk ---
+def get_many(entity: CacheEntity, entity_ids, client=None) -> dict:
+    """
+    Cita vise unosa istog entiteta jednim pipeline-om i broji hit/miss.
+    Unos koji ne moze da se procita (npr. WRONGTYPE za stari string umesto hash-a) se racuna kao miss.
+
+    Returns:
+        dict: entity_id -> dekodiran unos ili None
+    """
+    entity_ids = list(entity_ids)
+    if not entity_ids:
+        return {}
+
+    pipe = (client or redis_binary_client).pipeline(transaction=False)
+    for entity_id in entity_ids:
+        entity.read(pipe, entity_id)
+    results = pipe.execute(raise_on_error=False)
+
+    values = {
+        entity_id: None if isinstance(raw, Exception) else entity.decode(raw)
+        for entity_id, raw in zip(entity_ids, results)
+    }
+    hits = sum(1 for value in values.values() if value is not None)
+    record_cache_lookup(entity.name, hits=hits, misses=len(values) - hits)
+    return values
+
+
+def set_many(entity: CacheEntity, items: dict, pipe=None):
+    """Upisuje vise unosa istog entiteta (entity_id -> podaci). Bez prosledjenog pipeline-a pravi svoj i odmah ga izvrsava."""
+    own_pipe = pipe is None
+    if own_pipe:
+        pipe = redis_binary_client.pipeline(transaction=False)
+    for entity_id, data in items.items():
+        entity.write(pipe, entity_id, data)
+    if own_pipe:
+        pipe.execute()
@@ -0,0 +1,273 @@
+#Service/EnergyAccumulator.py
+# Satna energija (kWh) po user-u iz live tick-a, za user_hourly_energy_data.
+#
+# Tick racuna trenutnu snagu (kW) i posle emit-a je bacao. Sada AccumulateEnergyService jednom Lua skriptom (jedan round trip,
+# moze i u pipeline-u tick-a) doda snagu * proteklo vreme u bucket za trenutni sat:
+#   energy_hourly:{user_id}:{hour}   hash kolona (solar_production_kwh, ..., battery_discharge_kwh) -> kWh u tom satu
+#   energy_hourly_buckets            zset "user_id:hour" -> hour (pocetak sata, unix sekunde UTC), indeks bucket-a za flush
+#   energy_last_sample_at            hash user_id -> vreme poslednjeg uzorka, proteklo vreme je razlika (najvise ENERGY_MAX_SAMPLE_GAP_SECONDS,
+#                                    da pauza dok user nije aktivan ne bi bila uracunata kao sat sa istom snagom)
+# Uzorke daje tick: svakih 5s za user-e sa otvorenim socket-om i svakih LIVE_METERING_UNWATCHED_INTERVAL_SECONDS (default 60) za ostale
+# aktivne user-e (active_users). ENERGY_MAX_SAMPLE_GAP_SECONDS mora biti veci od tog intervala, inace bi user-i koje niko ne gleda
+# imali samo deo sata. Vreme dok user nije u active_users registru se ne simulira i nije u istoriji.
+# FlushClosedEnergyHoursService (celery beat) uzima zatvorene sate (zavrsene pre vise od ENERGY_FLUSH_GRACE_SECONDS), atomski ih skida
+# iz Redis-a i upisuje jednim multi-row INSERT ... ON DUPLICATE KEY UPDATE (sabiranje). Ako upis ne uspe bucket-i se vracaju u Redis.
+# Uzorak se cela pripisuje satu u kome je uzet (greska na granici sata je najvise jedan interval tick-a).
+#
+# RollupDailyEnergyService (celery beat) posle toga preracunava user_daily_energy_summary samo za (user, dan) parove ciji su se sati
+# promenili (updated_at) od watermark-a iz energy_daily_rollup_watermark, INSERT ... SELECT ... GROUP BY po batch-u parova.
+# Oba posle upisa brisu cache-ovane chunk-ove istorije (EnergyHistoryService) koje su promenili: flush dan satnih, rollup mesec dnevnih.
+
+import os
+import time
+from datetime import datetime, timezone, timedelta
+
+try:
+    from ..DataBaseHandler import HOURLY_ENERGY_COLUMNS, upsert_user_hourly_energy, get_changed_energy_days, rollup_daily_energy
+except ImportError:                     # modul ucitan direktno (unittest iz Backend/Service foldera), bez paketa i baze
+    HOURLY_ENERGY_COLUMNS = (
+        "solar_production_kwh",
+        "household_consumption_kwh",
+        "grid_import_kwh",
+        "grid_export_kwh",
+        "battery_charge_kwh",
+        "battery_discharge_kwh",
+    )
+    upsert_user_hourly_energy = get_changed_energy_days = rollup_daily_energy = None
+
+try:
+    from .EnergyHistory import history_chunk_key, history_chunk_start
+except ImportError:                     # modul ucitan direktno (unittest iz Backend/Service foldera), bez paketa
+    from EnergyHistory import history_chunk_key, history_chunk_start
+
+
+ENERGY_BUCKET_KEY_PREFIX = "energy_hourly:"
+ENERGY_BUCKETS_KEY = "energy_hourly_buckets"
+ENERGY_LAST_SAMPLE_KEY = "energy_last_sample_at"
+
+# prvi uzorak user-a (nema prethodnog) vredi jedan interval tick-a
+ENERGY_DEFAULT_SAMPLE_SECONDS = float(os.getenv("ENERGY_DEFAULT_SAMPLE_SECONDS", "5"))
+# isti env kao u celery_app.py, default je dva unwatched intervala da jedan zakasneli tick ne napravi rupu u satu
+_UNWATCHED_INTERVAL_SECONDS = int(os.getenv("LIVE_METERING_UNWATCHED_INTERVAL_SECONDS", "60"))
+ENERGY_MAX_SAMPLE_GAP_SECONDS = float(os.getenv("ENERGY_MAX_SAMPLE_GAP_SECONDS", str(max(60, 2 * _UNWATCHED_INTERVAL_SECONDS))))
+if ENERGY_MAX_SAMPLE_GAP_SECONDS < _UNWATCHED_INTERVAL_SECONDS:
+    print(f"⚠️ ENERGY_MAX_SAMPLE_GAP_SECONDS ({ENERGY_MAX_SAMPLE_GAP_SECONDS}) < LIVE_METERING_UNWATCHED_INTERVAL_SECONDS "
+          f"({_UNWATCHED_INTERVAL_SECONDS}), energy history will miss time for unwatched users")
+# sat se flush-uje tek kada je zavrsen pre ovoliko sekundi, da tick koji je poceo pre kraja sata stigne da upise
+ENERGY_FLUSH_GRACE_SECONDS = int(os.getenv("ENERGY_FLUSH_GRACE_SECONDS", "60"))
+ENERGY_FLUSH_BATCH = int(os.getenv("ENERGY_FLUSH_BATCH", "2000"))
+# bucket koji iz nekog razloga nikad nije flush-ovan ne ostaje zauvek u Redis-u
+ENERGY_BUCKET_TTL_SECONDS = 7 * 24 * 3600
+
+ENERGY_ROLLUP_WATERMARK_KEY = "energy_daily_rollup_watermark"
+ENERGY_ROLLUP_BATCH = int(os.getenv("ENERGY_ROLLUP_BATCH", "500"))
+# updated_at se postavlja kada se izvrsi upit, a red postaje vidljiv tek na commit, pa se gleda i ovoliko unazad od watermark-a
+ENERGY_ROLLUP_LAG_SECONDS = int(os.getenv("ENERGY_ROLLUP_LAG_SECONDS", "60"))
+
+
+def split_power_flows(payload: dict) -> dict:
+    """
+    Snage iz live payload-a (kW) po kolonama user_hourly_energy_data:
+    grid_contribution_kw > 0 je uvoz a < 0 izvoz, battery_flow_kw > 0 je punjenje a < 0 praznjenje.
+    """
+    grid_kw = payload.get("grid_contribution_kw") or 0.0
+    battery_kw = payload.get("battery_flow_kw") or 0.0
+    return {
+        "solar_production_kwh": max(payload.get("solar_production_kw") or 0.0, 0.0),
+        "household_consumption_kwh": max(payload.get("household_consumption_kw") or 0.0, 0.0),
+        "grid_import_kwh": max(grid_kw, 0.0),
+        "grid_export_kwh": max(-grid_kw, 0.0),
+        "battery_charge_kwh": max(battery_kw, 0.0),
+        "battery_discharge_kwh": max(-battery_kw, 0.0),
+    }
+
+
+# ARGV[1] = user_id, ARGV[2] = vreme uzorka, ARGV[3] = ENERGY_DEFAULT_SAMPLE_SECONDS, ARGV[4] = ENERGY_MAX_SAMPLE_GAP_SECONDS,
+# ARGV[5] = ENERGY_BUCKET_TTL_SECONDS, ARGV[6..11] = snage u kW redom kao HOURLY_ENERGY_COLUMNS
+# uzorak koji nije noviji od poslednjeg (dupli tick) se ignorise
+_ACCUMULATE_ENERGY_LUA = """
+local user_id = ARGV[1]
+local now = tonumber(ARGV[2])
+local last = tonumber(redis.call('HGET', '%(last_sample_key)s', user_id))
+local dt = tonumber(ARGV[3])
+if last then
+    if now <= last then
+        return 0
+    end
+    dt = math.min(now - last, tonumber(ARGV[4]))
+end
+redis.call('HSET', '%(last_sample_key)s', user_id, ARGV[2])
+
+local hour = math.floor(now / 3600) * 3600
+local member = user_id .. ':' .. string.format('%%d', hour)
+local key = '%(bucket_prefix)s' .. member
+local fields = {%(fields)s}
+for i, field in ipairs(fields) do
+    local kw = tonumber(ARGV[5 + i])
+    if kw > 0 then
+        redis.call('HINCRBYFLOAT', key, field, kw * dt / 3600)
+    end
+end
+redis.call('EXPIRE', key, ARGV[5])
+redis.call('ZADD', '%(buckets_key)s', hour, member)
+return 1
+""" % {
+    "last_sample_key": ENERGY_LAST_SAMPLE_KEY,
+    "bucket_prefix": ENERGY_BUCKET_KEY_PREFIX,
+    "buckets_key": ENERGY_BUCKETS_KEY,
+    "fields": ", ".join(f"'{column}'" for column in HOURLY_ENERGY_COLUMNS),
+}
+
+# Citanje i brisanje zatvorenih bucket-a u jednom koraku, da uzorak koji stigne izmedju citanja i brisanja ne bi bio izgubljen
+# ARGV[1] = najveci hour koji je zatvoren, ARGV[2] = najvise bucket-a
+# vraca {member, {polje, vrednost, ...}, member, {...}, ...}
+_CLAIM_ENERGY_BUCKETS_LUA = """
+local members = redis.call('ZRANGEBYSCORE', '%(buckets_key)s', '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local result = {}
+for _, member in ipairs(members) do
+    local key = '%(bucket_prefix)s' .. member
+    result[#result + 1] = member
+    result[#result + 1] = redis.call('HGETALL', key)
+    redis.call('DEL', key)
+    redis.call('ZREM', '%(buckets_key)s', member)
+end
+return result
+""" % {
+    "bucket_prefix": ENERGY_BUCKET_KEY_PREFIX,
+    "buckets_key": ENERGY_BUCKETS_KEY,
+}
+
+_default_energy_client = None
+
+
+def _energy_client(redis=None) -> tuple:
+    """
+    (klijent, accumulate skripta, claim skripta) za prosledjen klijent (testovi) ili redis_client iz extensions.py.
+    Skripte na redis_client se registruju jednom, pri prvom pozivu (modul se moze ucitati i bez extensions-a).
+    """
+    global _default_energy_client
+    if redis is not None:
+        return redis, redis.register_script(_ACCUMULATE_ENERGY_LUA), redis.register_script(_CLAIM_ENERGY_BUCKETS_LUA)
+    if _default_energy_client is None:
+        from extensions import redis_client
+        _default_energy_client = _energy_client(redis_client)
+    return _default_energy_client
+
+
+def AccumulateEnergyService(user_id, payload: dict, now: float = None, pipe=None):
+    """
+    Dodaje energiju jednog tick-a (snage iz live payload-a * vreme od prethodnog uzorka) u bucket trenutnog sata.
+    Sa pipe se samo dodaje u pipeline tick-a (izvrsava ga pozivalac), bez dodatnog round trip-a.
+    """
+    now = time.time() if now is None else now
+    flows = split_power_flows(payload)
+    args = [int(user_id), now, ENERGY_DEFAULT_SAMPLE_SECONDS, ENERGY_MAX_SAMPLE_GAP_SECONDS, ENERGY_BUCKET_TTL_SECONDS]
+    args.extend(flows[column] for column in HOURLY_ENERGY_COLUMNS)
+    _, accumulate_script, _ = _energy_client()
+    return accumulate_script(args=args, client=pipe)
+
+
+def _claimed_rows(claimed: list) -> list[dict]:
+    """Rezultat claim skripte ({member, {polje, vrednost, ...}, ...}) kao redovi za upsert_user_hourly_energy."""
+    rows = []
+    for member, raw_fields in zip(claimed[0::2], claimed[1::2]):
+        user_id, hour = member.split(":")
+        values = dict(zip(raw_fields[0::2], raw_fields[1::2]))
+        row = {
+            "user_id": int(user_id),
+            "record_datetime": datetime.fromtimestamp(int(hour), tz=timezone.utc).replace(tzinfo=None),
+        }
+        row.update({column: float(values.get(column, 0.0)) for column in HOURLY_ENERGY_COLUMNS})
+        rows.append(row)
+    return rows
+
+
+def _restore_energy_buckets(rows: list[dict], redis=None):
+    """Vraca skinute bucket-e u Redis (HINCRBYFLOAT, pa se sabiraju sa uzorcima koji su stigli u medjuvremenu)."""
+    pipe = (redis or _energy_client()[0]).pipeline()
+    for row in rows:
+        hour = int(row["record_datetime"].replace(tzinfo=timezone.utc).timestamp())
+        member = f"{row['user_id']}:{hour}"
+        for column in HOURLY_ENERGY_COLUMNS:
+            if row[column]:
+                pipe.hincrbyfloat(f"{ENERGY_BUCKET_KEY_PREFIX}{member}", column, row[column])
+        pipe.expire(f"{ENERGY_BUCKET_KEY_PREFIX}{member}", ENERGY_BUCKET_TTL_SECONDS)
+        pipe.zadd(ENERGY_BUCKETS_KEY, {member: hour})
+    pipe.execute()
+
+
+def _invalidate_history_chunks(redis, source: str, user_moments):
+    """Brise cache-ovane chunk-ove istorije za (user_id, aware UTC datetime) parove, chunk koji nije u cache-u se preskace."""
+    keys = {history_chunk_key(user_id, source, history_chunk_start(moment, source)) for user_id, moment in user_moments}
+    if keys:
+        redis.delete(*keys)
+
+
+def FlushClosedEnergyHoursService(now: float = None, redis=None, upsert=None) -> int:
+    """
+    Upisuje zatvorene sate iz Redis-a u user_hourly_energy_data (po ENERGY_FLUSH_BATCH bucket-a dok ih ima).
+    redis i upsert (default upsert_user_hourly_energy) se prosledjuju samo u testovima.
+
+    Returns:
+        int: broj upisanih (user, sat) redova
+    """
+    now = time.time() if now is None else now
+    # sat [hour, hour + 3600) je zatvoren ako je hour + 3600 + grace <= now
+    last_closed_hour = now - 3600 - ENERGY_FLUSH_GRACE_SECONDS
+    redis, _, claim_script = _energy_client(redis)
+    upsert = upsert or upsert_user_hourly_energy
+
+    flushed = 0
+    while True:
+        claimed = claim_script(args=[last_closed_hour, ENERGY_FLUSH_BATCH])
+        if not claimed:
+            break
+
+        rows = _claimed_rows(claimed)
+        try:
+            upsert(rows)
+        except Exception:
+            _restore_energy_buckets(rows, redis)
+            raise
+        _invalidate_history_chunks(redis, "hour", ((row["user_id"], row["record_datetime"].replace(tzinfo=timezone.utc)) for row in rows))
+
+        flushed += len(rows)
+        if len(rows) < ENERGY_FLUSH_BATCH:
+            break
+
+    if flushed:
+        print(f"Flushed {flushed} hourly energy buckets to DB")
+    return flushed
+
+
+def RollupDailyEnergyService(redis=None, get_changed=None, rollup=None) -> int:
+    """
+    Preracunava dnevne sume za (user, dan) parove ciji su se satni redovi promenili od poslednjeg rollup-a.
+    Watermark se pomera tek kada su svi batch-evi upisani, pa se posle greske isti dani preracunaju ponovo (rollup je idempotentan).
+    Bez watermark-a (prvo pokretanje, prazan Redis) preracunavaju se svi dani.
+    redis, get_changed (get_changed_energy_days) i rollup (rollup_daily_energy) se prosledjuju samo u testovima.
+
+    Returns:
+        int: broj preracunatih (user, dan) parova
+    """
+    redis = _energy_client(redis)[0]
+    get_changed = get_changed or get_changed_energy_days
+    rollup = rollup or rollup_daily_energy
+
+    watermark = redis.get(ENERGY_ROLLUP_WATERMARK_KEY)
+    since = datetime.fromisoformat(watermark) - timedelta(seconds=ENERGY_ROLLUP_LAG_SECONDS) if watermark else None
+
+    user_days, db_now = get_changed(since)
+
+    for start in range(0, len(user_days), ENERGY_ROLLUP_BATCH):
+        batch = user_days[start:start + ENERGY_ROLLUP_BATCH]
+        rollup(batch)
+        _invalidate_history_chunks(redis, "day", (
+            (user_id, datetime(record_date.year, record_date.month, record_date.day, tzinfo=timezone.utc)) for user_id, record_date in batch
+        ))
+
+    redis.set(ENERGY_ROLLUP_WATERMARK_KEY, db_now.isoformat())
+
+    if user_days:
+        print(f"Rolled up {len(user_days)} daily energy summaries (changes since {since})")
+    return len(user_days)
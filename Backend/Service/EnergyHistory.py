@@ -0,0 +1,145 @@
+#Service/EnergyHistory.py
+# Racunanje istorije energije za grafikone: izbor rezolucije, bucket-i, downsampling i kolonski oblik odgovora.
+# Sve je u UTC. Izvor za rezoluciju "hour" je user_hourly_energy_data, za "day", "week" i "month" user_daily_energy_summary
+# (week i month se sabiraju iz dana na serveru). Citanje iz baze i cache su u EnergyHistoryService.
+#
+# Odgovor je kolonski ({"timestamps": [...], "solar_production_kwh": [...], ...}), ne lista dict-ova,
+# pa godisnji grafikon ne nosi imena kolona za svaku tacku. Bucket-i bez podataka se ne salju (timestamps kaze gde je koja tacka).
+
+from datetime import datetime, timedelta, timezone
+
+
+HISTORY_RESOLUTIONS = ("hour", "day", "week", "month")
+
+# auto bira najfiniju rezoluciju sa najvise ovoliko tacaka
+HISTORY_DEFAULT_MAX_POINTS = 400
+# eksplicitna rezolucija ne sme dati vise tacaka od ovoga (npr. godina po satima)
+HISTORY_MAX_POINTS = 5000
+
+
+def _from_unix_seconds(seconds) -> datetime:
+    # 1e20 / inf daju OverflowError, vrednosti van opsega platforme OSError, NaN ValueError: sve je los ulaz (400), ne 500
+    try:
+        return datetime.fromtimestamp(seconds, tz=timezone.utc)
+    except (ValueError, OverflowError, OSError) as e:
+        raise ValueError(f"Timestamp {seconds} is out of range") from e
+
+
+def parse_history_time(value) -> datetime:
+    """Unix sekunde ili ISO 8601 (datum ili datum i vreme) -> aware datetime u UTC, naivne vrednosti su UTC. ValueError za ostalo."""
+    if isinstance(value, (int, float)):
+        return _from_unix_seconds(value)
+    value = str(value).strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+    return _from_unix_seconds(seconds)
+
+
+def bucket_start(moment: datetime, resolution: str) -> datetime:
+    """Pocetak bucket-a u kome je moment (week pocinje u ponedeljak)."""
+    if resolution == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return day
+    if resolution == "week":
+        return day - timedelta(days=day.weekday())
+    if resolution == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown resolution '{resolution}', expected one of: {', '.join(HISTORY_RESOLUTIONS)}")
+
+
+def next_bucket_start(start: datetime, resolution: str) -> datetime:
+    if resolution == "hour":
+        return start + timedelta(hours=1)
+    if resolution == "day":
+        return start + timedelta(days=1)
+    if resolution == "week":
+        return start + timedelta(weeks=1)
+    if resolution == "month":
+        return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    raise ValueError(f"Unknown resolution '{resolution}', expected one of: {', '.join(HISTORY_RESOLUTIONS)}")
+
+
+def count_buckets(start: datetime, end: datetime, resolution: str) -> int:
+    """Broj bucket-a koji preseca [start, end)."""
+    if end <= start:
+        return 0
+    first = bucket_start(start, resolution)
+    if resolution == "month":
+        last = bucket_start(end - timedelta(microseconds=1), resolution)
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    step = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}[resolution]
+    return -(-(end - first) // step)
+
+
+def select_resolution(start: datetime, end: datetime, max_points: int = HISTORY_DEFAULT_MAX_POINTS) -> str:
+    """Najfinija rezolucija koja za [start, end) daje najvise max_points tacaka (za jako duge opsege month)."""
+    for resolution in HISTORY_RESOLUTIONS:
+        if count_buckets(start, end, resolution) <= max_points:
+            return resolution
+    return HISTORY_RESOLUTIONS[-1]
+
+
+def source_resolution(resolution: str) -> str:
+    """Iz koje tabele se cita: hour iz satne, sve ostalo iz dnevne."""
+    return "hour" if resolution == "hour" else "day"
+
+
+def chunk_ranges(start: datetime, end: datetime, source: str) -> list:
+    """
+    Delovi opsega koji se cache-uju kao celina: dan satnih podataka ili mesec dnevnih.
+
+    Returns:
+        list[(chunk_start, chunk_end)] koji pokrivaju [start, end)
+    """
+    chunk_resolution = "day" if source == "hour" else "month"
+    chunks = []
+    chunk = bucket_start(start, chunk_resolution)
+    while chunk < end:
+        chunk_end = next_bucket_start(chunk, chunk_resolution)
+        chunks.append((chunk, chunk_end))
+        chunk = chunk_end
+    return chunks
+
+
+def history_chunk_start(moment: datetime, source: str) -> datetime:
+    """Pocetak chunk-a kome pripada tacka izvora (aware UTC): dan za satne redove, mesec za dnevne."""
+    return bucket_start(moment, "day" if source == "hour" else "month")
+
+
+def history_chunk_key(user_id, source: str, chunk_start: datetime) -> str:
+    """Redis kljuc cache-ovanog chunk-a, koriste ga EnergyHistoryService (citanje) i EnergyAccumulator (brisanje posle flush-a/rollup-a)."""
+    return f"energy_history:{user_id}:{source}:{int(chunk_start.timestamp())}"
+
+
+def downsample(points: list, resolution: str, columns: tuple) -> dict:
+    """
+    Sabira tacke izvorne rezolucije (kWh su energije pa se sabiraju) u bucket-e trazene rezolucije.
+
+    Args:
+        points: lista (datetime, [vrednosti redom kao columns]) sortirana po vremenu
+        resolution: jedna od HISTORY_RESOLUTIONS
+        columns: imena kolona
+
+    Returns:
+        dict: {"timestamps": [unix sekunde pocetka bucket-a], kolona: [kWh zaokruzeno na 3 decimale], ...}
+    """
+    timestamps = []
+    sums = []
+    for moment, values in points:
+        start = bucket_start(moment, resolution)
+        if not timestamps or timestamps[-1] != start:
+            timestamps.append(start)
+            sums.append([0.0] * len(columns))
+        bucket = sums[-1]
+        for i, value in enumerate(values):
+            bucket[i] += value
+
+    result = {"timestamps": [int(start.timestamp()) for start in timestamps]}
+    for i, column in enumerate(columns):
+        result[column] = [round(bucket[i], 3) for bucket in sums]
+    return result
@@ -0,0 +1,132 @@
+#Service/EnergyHistoryService.py
+# Citanje istorije energije (user_hourly_energy_data / user_daily_energy_summary) za /energy/history.
+#
+# Podaci se citaju i cache-uju po delovima (chunk): dan satnih redova ili mesec dnevnih suma, kljuc energy_history:{user_id}:{izvor}:{pocetak}.
+# Chunk koji se zavrsio pre vise od ENERGY_HISTORY_FINAL_AFTER_SECONDS se vise ne menja (sati su flush-ovani, dani rollup-ovani),
+# pa se cuva ENERGY_HISTORY_CACHE_TTL. Chunk-ovi koji jos mogu da se menjaju (danas, ovaj mesec) se uvek citaju iz baze i ne cache-uju.
+# Svi chunk-ovi kojih nema u cache-u se citaju jednim upitom. Tekuci sat je jos u Redis akumulatoru (EnergyAccumulator) i nije u istoriji.
+# Sat koji stigne kasno (restore posle neuspelog flush-a) ili ponovljen rollup brisu svoj chunk (EnergyAccumulator), pa se on ponovo cita iz baze.
+
+import os
+from datetime import datetime, timedelta, timezone
+
+try:
+    from ..DataBaseHandler import HOURLY_ENERGY_COLUMNS, get_user_hourly_energy, get_user_daily_energy
+    from .CacheCodec import encode_cache_value, decode_cache_value
+    from .CacheRepository import record_cache_lookup
+    from .EnergyHistory import *
+except ImportError:                     # modul ucitan direktno (unittest iz Backend/Service foldera), bez paketa i baze
+    from CacheCodec import encode_cache_value, decode_cache_value
+    from EnergyHistory import *
+    from EnergyAccumulator import HOURLY_ENERGY_COLUMNS
+    get_user_hourly_energy = get_user_daily_energy = None
+
+    def record_cache_lookup(entity_name: str, hits: int = 0, misses: int = 0):
+        """Bez CacheRepository hit/miss se ne broji."""
+
+
+ENERGY_HISTORY_CACHE_TTL = int(os.getenv("ENERGY_HISTORY_CACHE_TTL", str(30 * 24 * 3600)))
+# posle ovoliko sekundi od kraja chunk-a flush (EnergyAccumulator) i dnevni rollup su sigurno prosli preko njega
+ENERGY_HISTORY_FINAL_AFTER_SECONDS = int(os.getenv("ENERGY_HISTORY_FINAL_AFTER_SECONDS", "7200"))
+
+
+def _history_cache():
+    """redis_binary_client iz extensions.py (chunk-ovi su kodirani CacheCodec-om), testovi prosledjuju svoj klijent."""
+    from extensions import redis_binary_client
+    return redis_binary_client
+
+
+def _load_points(user_id, source: str, start: datetime, end: datetime) -> list:
+    """Tacke izvorne tabele za [start, end) kao (aware UTC datetime, [vrednosti redom kao HOURLY_ENERGY_COLUMNS])."""
+    if source == "hour":
+        rows = get_user_hourly_energy(user_id, start.replace(tzinfo=None), end.replace(tzinfo=None))
+        moments = [row["record_datetime"].replace(tzinfo=timezone.utc) for row in rows]
+    else:
+        rows = get_user_daily_energy(user_id, start.date(), end.date())
+        moments = [datetime(row["record_date"].year, row["record_date"].month, row["record_date"].day, tzinfo=timezone.utc) for row in rows]
+
+    return [(moment, [row[column] for column in HOURLY_ENERGY_COLUMNS]) for moment, row in zip(moments, rows)]
+
+
+def GetEnergyHistoryService(user_id, start: datetime, end: datetime, resolution: str = "auto", max_points: int = HISTORY_DEFAULT_MAX_POINTS,
+                            redis=None, load_points=None, now: datetime = None) -> dict:
+    """
+    Istorija energije user-a za [start, end) u kolonskom obliku.
+
+    Args:
+        start, end: aware datetime (UTC)
+        resolution: "auto" (najfinija sa najvise max_points tacaka) ili jedna od HISTORY_RESOLUTIONS
+        max_points: gornja granica tacaka za auto
+        redis, load_points, now: cache klijent, citanje iz baze (kao _load_points) i trenutno vreme, prosledjuju se samo u testovima
+
+    Returns:
+        dict: {"resolution", "from", "to", "timestamps": [...], kolona: [...], ...}, ValueError za neispravan opseg/rezoluciju
+    """
+    if end <= start:
+        raise ValueError("'to' must be after 'from'")
+
+    if resolution == "auto":
+        resolution = select_resolution(start, end, max(1, min(int(max_points), HISTORY_MAX_POINTS)))
+    elif resolution not in HISTORY_RESOLUTIONS:
+        raise ValueError(f"resolution must be auto or one of: {', '.join(HISTORY_RESOLUTIONS)}")
+    elif count_buckets(start, end, resolution) > HISTORY_MAX_POINTS:
+        raise ValueError(f"Range is too long for resolution '{resolution}' (more than {HISTORY_MAX_POINTS} points)")
+
+    redis = redis or _history_cache()
+    load_points = load_points or _load_points
+    source = source_resolution(resolution)
+    chunks = chunk_ranges(start, end, source)
+    final_before = (now or datetime.now(timezone.utc)) - timedelta(seconds=ENERGY_HISTORY_FINAL_AFTER_SECONDS)
+
+    # 1. Zavrseni chunk-ovi iz cache-a (jedan pipeline)
+    cached = {}
+    final_chunks = [chunk_start for chunk_start, chunk_end in chunks if chunk_end <= final_before]
+    if final_chunks:
+        pipe = redis.pipeline(transaction=False)
+        for chunk_start in final_chunks:
+            pipe.get(history_chunk_key(user_id, source, chunk_start))
+        for chunk_start, raw in zip(final_chunks, pipe.execute()):
+            if raw is not None:
+                cached[chunk_start] = decode_cache_value(raw)
+        record_cache_lookup("energy_history", hits=len(cached), misses=len(final_chunks) - len(cached))
+
+    # 2. Sve ostalo jednim upitom od prvog do poslednjeg chunk-a koji fali, zavrseni chunk-ovi se upisuju u cache
+    loaded = {}
+    missing = [(chunk_start, chunk_end) for chunk_start, chunk_end in chunks if chunk_start not in cached]
+    if missing:
+        loaded = {chunk_start: [] for chunk_start, _ in missing}
+        for moment, values in load_points(user_id, source, missing[0][0], missing[-1][1]):
+            chunk_start = history_chunk_start(moment, source)
+            if chunk_start in loaded:
+                loaded[chunk_start].append((moment, values))
+
+        pipe = redis.pipeline(transaction=False)
+        for chunk_start, chunk_end in missing:
+            if chunk_end <= final_before:
+                points = loaded[chunk_start]
+                pipe.setex(
+                    history_chunk_key(user_id, source, chunk_start),
+                    ENERGY_HISTORY_CACHE_TTL,
+                    encode_cache_value({"t": [int(moment.timestamp()) for moment, _ in points], "v": [values for _, values in points]}),
+                )
+        pipe.execute()
+
+    # 3. Spajanje po redu chunk-ova, odsecanje na opseg i downsampling
+    range_start = bucket_start(start, source)
+    points = []
+    for chunk_start, _ in chunks:
+        if chunk_start in cached:
+            chunk_points = [
+                (datetime.fromtimestamp(timestamp, tz=timezone.utc), values)
+                for timestamp, values in zip(cached[chunk_start]["t"], cached[chunk_start]["v"])
+            ]
+        else:
+            chunk_points = loaded[chunk_start]
+        points.extend(point for point in chunk_points if range_start <= point[0] < end)
+
+    return {
+        "resolution": resolution,
+        "from": int(start.timestamp()),
+        "to": int(end.timestamp()),
+        **downsample(points, resolution, HOURLY_ENERGY_COLUMNS),
+    }
@@ -0,0 +1,148 @@
+#Service/InvalidationBus.py
+# Bus za invalidaciju cache-a kada se promeni user, solarni sistem, baterija ili IoT uredjaji.
+#
+# Ranije je svaki endpoint (admin_update_user_approval, /battery/add, /battery/delete, IoT) sam brisao kljuceve koje se setio,
+# pa su ostajali npr. live_metering_data:{id} (4s payload sa starim podacima) ili solar_system_battery_id:{sid}.
+# Sada endpoint javi samo sta se promenilo (publish_entity_change), a pravila zavisnosti odrede sta jos vise ne vazi:
+#   user -> solar_system -> battery -> iot_devices -> live_metering_data
+# promena entiteta invalidira njega i sve iza njega u lancu. Redis kljucevi se brisu jednom (jedan pipeline u procesu koji je objavio),
+# a dogadjaj ide na pub/sub kanal cache_invalidation koji slusa svaki proces i brise svoj L1 (LocalCache).
+
+import json
+import threading
+import time
+
+from extensions import redis_client, redis_binary_client
+from ..DataBaseHandler import GetSolarSystemOwnerId
+from .CacheCodec import decode_cache_value
+from .LocalCache import local_cache, apply_cache_invalidation, CACHE_INVALIDATION_CHANNEL
+
+
+ENTITY_CHAIN = ("user", "solar_system", "battery", "iot_devices", "live_metering_data")
+
+
+def invalidated_entities(entity: str, updated_in_place: bool = False) -> list:
+    """
+    Entitet i sve sto zavisi od njega po ENTITY_CHAIN.
+    updated_in_place: cache samog entiteta je vec azuriran na mestu (npr. HSET polja IoT uredjaja), brisu se samo zavisni.
+    """
+    if entity not in ENTITY_CHAIN:
+        raise ValueError(f"Unknown cache entity '{entity}', expected one of: {', '.join(ENTITY_CHAIN)}")
+    affected = list(ENTITY_CHAIN[ENTITY_CHAIN.index(entity):])
+    return affected[1:] if updated_in_place else affected
+
+
+def _resolve_ids(user_id, system_id, battery_id):
+    """
+    Dopunjuje id-eve koji nisu prosledjeni iz mapiranja u Redis-u (sve sto nije u cache-u ionako nema sta da se brise).
+    Izuzetak je vlasnik sistema: kljucevi user-a (user_solar_system_id, uredjaji, live payload) zive duze od solar_system:{id},
+    pa se bez njega user_id cita iz baze.
+    """
+    if system_id is None and user_id is not None:
+        system_id = redis_client.get(f"user_solar_system_id:{user_id}")
+    if user_id is None and system_id is not None:
+        # solar_system: je kodiran CacheCodec-om (moze biti msgpack), zato ide preko binarnog klijenta
+        solar_system = decode_cache_value(redis_binary_client.get(f"solar_system:{system_id}"))
+        user_id = solar_system.get("user_id") if solar_system else GetSolarSystemOwnerId(int(system_id))
+    if battery_id is None and system_id is not None:
+        battery_id = redis_client.get(f"solar_system_battery_id:{system_id}")
+
+    def as_int(value):
+        return int(value) if value not in (None, "") else None
+
+    return as_int(user_id), as_int(system_id), as_int(battery_id)
+
+
+def _keys_for(entity: str, user_id, system_id, battery_id) -> list:
+    if entity == "user":
+        return [f"user:{user_id}"] if user_id else []
+    if entity == "solar_system":
+        keys = [f"solar_system:{system_id}"] if system_id else []
+        return keys + ([f"user_solar_system_id:{user_id}"] if user_id else [])
+    if entity == "battery":
+        keys = [f"battery:{battery_id}"] if battery_id else []
+        return keys + ([f"solar_system_battery_id:{system_id}"] if system_id else [])
+    if entity == "iot_devices":
+        if not user_id:
+            return []
+        index_key = f"user_iot_devices:{user_id}"
+        device_ids = redis_client.smembers(index_key) if redis_client.type(index_key) == "set" else []
+        # 0 je negativni cache (user nema uredjaja, CacheRepository.NO_ENTITY_ID), brise se sa indeksom
+        return [index_key] + [f"iot_device:{device_id}" for device_id in device_ids if device_id != "0"]
+    if entity == "live_metering_data":
+        return [f"live_metering_data:{user_id}"] if user_id else []
+    return []
+
+
+def publish_entity_change(entity: str, user_id=None, system_id=None, battery_id=None, updated_in_place: bool = False) -> list:
+    """
+    Objavljuje promenu entiteta: brise Redis kljuceve entiteta i svega sto zavisi od njega i javlja svim procesima da obrisu L1.
+
+    Args:
+        entity: jedan od ENTITY_CHAIN
+        user_id, system_id, battery_id: sto je poznato pozivaocu, ostalo se razresi iz mapiranja u Redis-u
+        updated_in_place: pozivalac je vec azurirao cache samog entiteta, brisu se samo zavisni kljucevi
+
+    Returns:
+        list: obrisani Redis kljucevi
+    """
+    entities = invalidated_entities(entity, updated_in_place)
+    user_id, system_id, battery_id = _resolve_ids(user_id, system_id, battery_id)
+
+    keys = []
+    for affected in entities:
+        keys.extend(_keys_for(affected, user_id, system_id, battery_id))
+
+    message = json.dumps({
+        "entity": entity,
+        "entities": entities,
+        "user_id": user_id,
+        "system_id": system_id,
+        "battery_id": battery_id,
+    })
+
+    pipe = redis_client.pipeline()
+    if keys:
+        pipe.delete(*keys)
+    pipe.publish(CACHE_INVALIDATION_CHANNEL, message)
+    pipe.execute()
+
+    # ovaj proces ne ceka svoju poruku sa kanala
+    apply_cache_invalidation(message)
+
+    print(f"Cache invalidation for {entity} (user {user_id}, system {system_id}, battery {battery_id}): {len(keys)} keys")
+    return keys
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _handle_invalidation_message(message):
+    try:
+        apply_cache_invalidation(message["data"])
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Invalid cache invalidation message {message.get('data')!r}: {e}")
+
+
+def _handle_listener_error(error, pubsub, worker):
+    # dok veza nije bila tu poruke su mogle da se izgube, pa nista iz L1 vise nije pouzdano
+    print(f"Cache invalidation listener error, clearing L1 cache: {error}")
+    local_cache.clear()
+    time.sleep(1)
+
+
+def start_cache_invalidation_listener():
+    """Pokrece (jednom po procesu) pozadinski thread koji slusa cache_invalidation kanal. Pod gevent-om je to greenlet."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    with _listener_lock:
+        if _listener is None:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{CACHE_INVALIDATION_CHANNEL: _handle_invalidation_message})
+            # sve sto je upisano u L1 pre pretplate je moglo propustiti invalidaciju
+            local_cache.clear()
+            _listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True, exception_handler=_handle_listener_error)
+    return _listener
@@ -0,0 +1,66 @@
+#Service/LiveDelta.py
+# Delta protokol za live metering emit-ove.
+#
+# Ranije je svaki tick slao ceo payload u room (ukljucujuci celu listu iot_devices_data) i kada se nista nije promenilo.
+# Sada:
+#   live_metering_data   ceo snapshot sa seq brojem, salje se klijentu pri handle_connect i na live_metering_resync,
+#                        ili celom room-u kada jos nema snapshot-a za user-a
+#   live_metering_delta  samo polja koja su se promenila od prethodnog snapshot-a, seq = prethodni seq + 1
+# Klijent primenjuje delta samo ako je seq tacno sledeci, inace trazi resync (live_metering_resync) i dobija ceo snapshot.
+# Ako se osim timestamp-a nista nije promenilo ne salje se nista.
+
+# polja koja se menjaju svaki tick ili ne zanimaju front, sama ne prave delta
+VOLATILE_FIELDS = ("timestamp",)
+IGNORED_DEVICE_FIELDS = ("last_cached_at",)
+
+
+def _device_view(device: dict) -> dict:
+    return {field: value for field, value in device.items() if field not in IGNORED_DEVICE_FIELDS}
+
+
+def strip_device_fields(devices) -> list:
+    """Uredjaji bez polja koja front ne koristi (last_cached_at se menja pri svakom punjenju cache-a i pravio bi lazne promene)."""
+    return [_device_view(device) for device in devices or []]
+
+
+def compute_live_delta(previous: dict, current: dict):
+    """
+    Razlika dva live payload-a.
+
+    Returns:
+        dict {"changes": {...}, "iot_devices_changed": [...], "iot_devices_removed": [...]} ili None ako se nista bitno nije promenilo
+    """
+    changes = {
+        field: value
+        for field, value in current.items()
+        if field != "iot_devices_data" and previous.get(field) != value
+    }
+
+    previous_devices = {device["device_id"]: _device_view(device) for device in previous.get("iot_devices_data") or []}
+    current_devices = {device["device_id"]: _device_view(device) for device in current.get("iot_devices_data") or []}
+
+    devices_changed = [device for device_id, device in current_devices.items() if previous_devices.get(device_id) != device]
+    devices_removed = [device_id for device_id in previous_devices if device_id not in current_devices]
+
+    if not devices_changed and not devices_removed and all(field in VOLATILE_FIELDS for field in changes):
+        return None
+
+    delta = {"changes": changes}
+    if devices_changed:
+        delta["iot_devices_changed"] = devices_changed
+    if devices_removed:
+        delta["iot_devices_removed"] = devices_removed
+    return delta
+
+
+def apply_live_delta(snapshot: dict, delta: dict) -> dict:
+    """Primenjuje delta na snapshot (isto sto radi front), vraca novi payload. Uredjaji ostaju sortirani po device_id."""
+    payload = {**snapshot, **delta.get("changes", {})}
+
+    devices = {device["device_id"]: device for device in snapshot.get("iot_devices_data") or []}
+    for device in delta.get("iot_devices_changed", []):
+        devices[device["device_id"]] = device
+    for device_id in delta.get("iot_devices_removed", []):
+        devices.pop(device_id, None)
+    payload["iot_devices_data"] = [devices[device_id] for device_id in sorted(devices)]
+    return payload
@@ -1,15 +1,15 @@
-import json
 import threading
 
 from ..Service import *
 
-import pandas as pd
-import requests_cache
-import openmeteo_requests
-from retry_requests import retry
-from flask import Blueprint, jsonify, current_app,request
+from .UserContextService import LoadUserContextService
+from .CacheRepository import UpdateCachedIotDeviceService, USER_CACHE, SOLAR_SYSTEM_CACHE, LIVE_METERING_CACHE, LIVE_SNAPSHOT_CACHE, LIVE_SNAPSHOT_CACHE_TTL, NO_ENTITY_ID, get_many, record_cache_lookup
+from .LiveDelta import compute_live_delta, strip_device_fields
+from .EnergyAccumulator import AccumulateEnergyService
+from .WeatherService import get_site_weather, weather_site_key, get_shared_site_weather, refresh_site_forecasts
+from flask import Blueprint, jsonify, current_app,request,session
 from flask_jwt_extended import jwt_required, get_jwt_identity,decode_token
-from extensions import redis_client, get_active_users_from_redis #scheduler,socketio ovo su imporit sto su bili ovde samo su zakomentarisani da probam sa celery-em
+from extensions import redis_client, redis_binary_client, get_active_users_from_redis, mark_user_active, touch_live_subscriber, remove_live_subscriber #scheduler,socketio ovo su imporit sto su bili ovde samo su zakomentarisani da probam sa celery-em
 from datetime import datetime, timezone
 #from apscheduler.schedulers.background import BackgroundScheduler
 try:
@@ -25,301 +25,373 @@ live_metering_bp = Blueprint('live_metering', __name__)
 
 # Scheduler instance to run background tasks
 
+# korak simulacije baterije po tick-u, isti za skalarni (calculate_and_emit_live_data) i batch put (shard tick-a)
+LIVE_METERING_TIME_STEP_HOURS = 1
 
 
 
-def build_battery_cache_data(battery_id, battery_data):
+
+# --- HELPER FUNCTION: Get Open-Meteo API Data ---
+def get_live_irradiance(latitude, longitude, tilt, azimuth, user_id=None):
     """
-    Builds a battery cache data dictionary from the given battery data.
-    
-    Args:
-        battery_id (int): Battery ID for the Redis key.
-        battery_data (dict): Battery information from DB or calculations.
+    Helper function that returns the current minutely_15 slot (GTI instant, temperature_2m, is_day) for the user's panels.
+    Weather is fetched per site (grid cell, tilt, azimuth) by WeatherService, so neighbours share one cached Open-Meteo call.
+    user_id is kept only for the log message, it is no longer part of the request.
+    """
+    live_data = get_site_weather(latitude, longitude, tilt, azimuth)
+    if live_data is None and user_id is not None:
+        print(f"No weather data for user {user_id} site ({latitude}, {longitude}, {tilt}, {azimuth})")
+    return live_data
+
+def resolve_weather_sites(user_ids) -> dict:
+    """
+    Za listu user-a vraca njihov weather site kljuc (celija, tilt, azimut) iz Redis cache-a u dva pipeline round trip-a.
+    User-i ciji user:/solar_system: cache ne postoji se preskacu, oni ce weather dobiti preko get_live_irradiance kao i ranije.
 
     Returns:
-        dict: Battery cache payload.
+        dict: user_id (int) -> site_key
+    """
+    user_ids = [int(user_id) for user_id in user_ids]
+
+    # binarni klijent jer su user:/solar_system: kodirani CacheCodec-om
+    pipe = redis_binary_client.pipeline()
+    for user_id in user_ids:
+        USER_CACHE.read(pipe, user_id)
+        pipe.get(f"user_solar_system_id:{user_id}")
+    results = pipe.execute()
+
+    users_with_system = []
+    for i, user_id in enumerate(user_ids):
+        user_raw, system_id_str = results[2 * i], results[2 * i + 1]
+        if user_raw and system_id_str and int(system_id_str) != NO_ENTITY_ID:       # "0" je negativni cache, user nema sistem
+            users_with_system.append((user_id, USER_CACHE.decode(user_raw), int(system_id_str)))
+    solar_systems = get_many(SOLAR_SYSTEM_CACHE, {system_id for _, _, system_id in users_with_system})
+
+    sites = {}
+    for user_id, user_data, system_id in users_with_system:
+        solar_system_data = solar_systems.get(system_id)
+        if not solar_system_data or user_data.get("latitude") is None or user_data.get("longitude") is None:
+            continue
+        # isti default-i kao u calculate_and_emit_live_data
+        tilt = solar_system_data.get("tilt_degrees", 30)
+        azimuth = solar_system_data.get("azimuth_degrees", 180)
+        if tilt is None or azimuth is None:
+            continue
+        sites[user_id] = weather_site_key(user_data["latitude"], user_data["longitude"], tilt, azimuth)
+
+    return sites
+
+
+def prefetch_weather_for_users(user_ids) -> dict:
     """
+    Dohvata trenutni slot za sve razlicite lokacije aktivnih user-a (iz prognoza u memoriji/Redis-u, a samo za lokacije
+    bez prognoze sa nekoliko multi-location Open-Meteo zahteva) i mapira rezultat nazad na user-e. Koristi ga celery tick pre nego sto podeli user-e na shard-ove.
+
+    Returns:
+        dict: str(user_id) -> dict trenutnog slota (str kljuc jer ovo ide kroz celery JSON serijalizaciju)
+    """
+    sites_by_user = resolve_weather_sites(user_ids)
+    if not sites_by_user:
+        return {}
+
+    weather_by_site = get_shared_site_weather(sites_by_user.values())
+    print(f"Prefetched weather for {len(weather_by_site)} sites covering {len(sites_by_user)} users")
+
     return {
-        "battery_id": battery_id,
-        "system_id": battery_data.get("system_id"),
-        "model_name": battery_data.get("model_name"),
-        "capacity_kwh": battery_data.get("capacity_kwh"),
-        "max_charge_rate_kw": battery_data.get("max_charge_rate_kw"),
-        "max_discharge_rate_kw": battery_data.get("max_discharge_rate_kw"),
-        "efficiency": battery_data.get("efficiency"),
-        "manufacturer": battery_data.get("manufacturer"),
-        "current_charge_percentage": battery_data.get("current_charge_percentage"),
-        "last_cached_at": datetime.now().timestamp()
+        str(user_id): weather_by_site[site_key]
+        for user_id, site_key in sites_by_user.items()
+        if site_key in weather_by_site
     }
 
 
+def refresh_weather_forecasts_for_users(user_ids) -> int:
+    """
+    Osvezava prognoze za lokacije aktivnih user-a pre nego sto isteknu, poziva ga celery beat (refresh_weather_forecasts)
+    tako da live metering tick uvek nadje svezu prognozu i ne ceka na Open-Meteo.
+
+    Returns:
+        int: broj lokacija sa vazecom prognozom
+    """
+    sites_by_user = resolve_weather_sites(user_ids)
+    if not sites_by_user:
+        return 0
 
-# --- HELPER FUNCTION: Get Open-Meteo API Data ---
-def get_live_irradiance(latitude, longitude, tilt, azimuth, user_id):
+    refreshed = refresh_site_forecasts(sites_by_user.values())
+    print(f"Weather forecasts ready for {refreshed}/{len(set(sites_by_user.values()))} sites")
+    return refreshed
+
+
+def _prepare_live_inputs(user_id, weather=None):
     """
-    Helper function to call OpenMeteo API with cache and retry logic.
-    Caches per user by adding user_id to the request parameters.
-    Uses `global_tilted_irradiance_instant` for more precise measurements.
+    Prvi deo tick-a za jednog user-a: kontekst iz Redis-a, weather slot i otisak ulaza simulacije.
+    Ako nema sta da se racuna (payload jos vazi, fale podaci, ili su ulazi isti kao prosli tick pa je energija samo dodata) vraca None.
+
+    Returns:
+        dict: ulazi za simulaciju (solar_system, battery, iot_devices, weather zaokruzen kao pre racunanja) i ostalo sto treba _finish_live_update
     """
-    cache_session = requests_cache.CachedSession('.cache', expire_after = 60*15)        #15 min
-    retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
-    openmeteo = openmeteo_requests.Client(session = retry_session)
-
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "minutely_15": ["global_tilted_irradiance_instant", "temperature_2m", "is_day"],
-        "forecast_minutely_15": 1,
-        "timezone": "auto",
-        "tilt": tilt,
-        "azimuth": azimuth,
-        "user_id": user_id
-    }
+    # Ceo kontekst user-a (i poslednji payload) u jednom Redis round trip-u, fallback na bazu je u LoadUserContextService
+    context = LoadUserContextService(user_id, skip_db_if_live_payload=True)
 
-    try:
-        responses = openmeteo.weather_api(url, params=params)
-        response = responses[0]
-        minutely_15 = response.Minutely15()
-        
-        irradiance_data = minutely_15.Variables(0).ValuesAsNumpy()
-        temperature_data = minutely_15.Variables(1).ValuesAsNumpy()
-        is_day_data = minutely_15.Variables(2).ValuesAsNumpy()
-        
-        offset = pd.Timedelta(seconds=response.UtcOffsetSeconds())
-        
-        minutely_15_data = {
-            "date": pd.date_range(
-                start=pd.to_datetime(minutely_15.Time(), unit="s", utc=False) + offset,
-                end=pd.to_datetime(minutely_15.TimeEnd(), unit="s", utc=False) + offset,
-                freq=pd.Timedelta(seconds=minutely_15.Interval()),
-                inclusive="left"
-            ),
-            "global_tilted_irradiance_instant": irradiance_data,
-            "temperature_2m": temperature_data,
-            "is_day": is_day_data
-        }
-        
-        minutely_15_dataframe = pd.DataFrame(data=minutely_15_data)
-        
-        if not minutely_15_dataframe.empty:
-            return minutely_15_dataframe.iloc[0].to_dict()
-        
+    #da sprecimo da se funkcija izvrsava vise puta u 15 min (da ne bi svake sekunde sa povecavao % baterije / smanjivao )
+    # payload je izracunat pre manje od LIVE_METERING_CACHE_TTL i room ga je vec dobio (snapshot ili delta), nema sta da se salje
+    if context["live_payload"]:
         return None
-        
-    except Exception as e:
-        print(f"Error calling Open-Meteo API: {e}")
+
+    user_data = context["user"]
+    solar_system_data = context["solar_system"]
+    battery_data = context["battery"]
+    iot_devices_data = context["iot_devices"]
+
+    if not user_data:
+        print(f"Error: User data not found for user {user_id}")
+        return None
+
+    if not solar_system_data:
+        print(f"CRITICAL ERROR: User {user_id} found, but no solar system data in DB.")
+        return None
+
+    # Check for required data
+    if not all([user_data.get('latitude'), user_data.get('longitude'), solar_system_data.get('total_panel_wattage_wp')]):
+        print(f"Error: Incomplete solar system data for user {user_id}")
+        return None
+
+    latitude = user_data.get('latitude')
+    longitude = user_data.get('longitude')
+    tilt = solar_system_data.get('tilt_degrees', 30)
+    azimuth = solar_system_data.get('azimuth_degrees', 180)
+
+    live_data = weather or get_live_irradiance(latitude, longitude, tilt, azimuth, user_id)
+    if not live_data:
+        print(f"Error: Failed to fetch live weather data for user {user_id}")
+        return None
+
+    # isti slot, isti uredjaji, ista konfiguracija i SoC (baterija zakucana na 0% ili 100%) -> isti rezultat kao prosli tick,
+    # room ga vec ima pa se simulacija preskace i ne salje se nista, samo se produzi snapshot
+    fingerprint = simulation_input_fingerprint(solar_system_data, battery_data, iot_devices_data, live_data)
+    previous_snapshot = context["live_snapshot"]
+    if previous_snapshot and previous_snapshot.get("fingerprint") == fingerprint:
+        record_cache_lookup("simulation", hits=1)
+        # energija i dalje tece (npr. izvoz sa punom baterijom), racuna se sa snagama iz poslednjeg rezultata
+        pipe = redis_binary_client.pipeline(transaction=False)
+        AccumulateEnergyService(user_id, previous_snapshot["payload"], pipe=pipe)
+        pipe.expire(LIVE_SNAPSHOT_CACHE.key(user_id), LIVE_SNAPSHOT_CACHE_TTL)
+        pipe.execute()
         return None
+    record_cache_lookup("simulation", misses=1)
+
+    return {
+        "user_id": user_id,
+        "solar_system": solar_system_data,
+        "battery": battery_data,
+        "iot_devices": iot_devices_data,
+        "battery_id": context["battery_id"],
+        "weather": {
+            "global_tilted_irradiance_instant": round(live_data.get("global_tilted_irradiance_instant", 0), 2),  # na 2 decimale zbog preciznosti
+            "temperature_2m": round(live_data.get("temperature_2m", 0), 2),
+            "is_day": live_data.get("is_day"),
+        },
+        "fingerprint": fingerprint,
+        "previous_snapshot": previous_snapshot,
+    }
+
+
+def _simulate_live_inputs(prepared: dict) -> dict:
+    """Skalarni lanac simulacije za jednog user-a, isti kljucevi i zaokruzivanja kao simulate_users_batch(..., decimals=2)."""
+    solar_production_kw = round(calculate_solar_production(prepared["solar_system"], prepared["weather"]), 2)
+    household_consumption_kw = round(calculate_household_consumption(prepared["solar_system"], prepared["iot_devices"]), 2)
+    net_power_kw = round(solar_production_kw - household_consumption_kw, 2)
+
+    #DODAJ IF ako ne postoji baterija da se ovo ne racuna, battery_loss_kw se desava zbog efikasnosnti baterije i to moramo istu uracunati da ne bi imao fantomski import i export ka gridu, iako se ta snaga zapravo gubi kod baterije
+    new_charge_percentage, battery_flow_kw, battery_loss_kw = update_battery_charge(prepared["battery"], net_power_kw, time_step_hours=LIVE_METERING_TIME_STEP_HOURS)
+
+    battery_flow_kw = round(battery_flow_kw,2)
+    new_charge_percentage = round(new_charge_percentage,2)                      #100.00, 95.23 je ok, a d abi moglo norm da se upise
+    battery_loss_kw = round(battery_loss_kw,2)
+
+    return {
+        "solar_production_kw": solar_production_kw,
+        "household_consumption_kw": household_consumption_kw,
+        "net_power_kw": net_power_kw,
+        "battery_charge_percentage": new_charge_percentage,
+        "battery_flow_kw": battery_flow_kw,
+        "battery_loss_kw": battery_loss_kw,
+        "grid_contribution_kw": calculate_grid_contribution(solar_production_kw, household_consumption_kw, battery_flow_kw, battery_loss_kw),
+    }
+
+
+def _finish_live_update(prepared: dict, result: dict, emitter):
+    """Drugi deo tick-a: stanje baterije, gasenje uredjaja ispod 25%, payload, satna energija i emit room-u."""
+    user_id = prepared["user_id"]
+    battery_data = prepared["battery"]
+    iot_devices_data = prepared["iot_devices"]
+    new_charge_percentage = result["battery_charge_percentage"]
+
+    # U bazu ne pisemo svaki tick, FlushBatteryStateService (celery beat) upisuje promene periodicno
+    if battery_data:
+        SetBatteryStateService(prepared["battery_id"], new_charge_percentage)
+
+    alarm_user = None
+    # battery:{id} se vise ne prepisuje svaki tick, procenat je jedan HSET u battery_soc (SetBatteryStateService iznad)
+    # a LoadUserContextService ga cita odatle
+    if battery_data:
+        battery_data["current_charge_percentage"] = new_charge_percentage
+
+        # Automatizacija uredjaja i onda tipa ako je baterija ispod 50% gase se non critical
+        # ispod 25% gase se svi osim kriticnih uredjaja
+        # samo je fora poslati tipa poruku na front e kao ugasi sve te i te i onda da se Redux updejtuje i tamo
+
+        if iot_devices_data and new_charge_percentage <25:
+            # samo uredjaji koji jos nisu ugaseni, svaki je jedan HSET current_status u iot_device:{id}
+            cache_pipe = redis_binary_client.pipeline(transaction=False)
+            for device in iot_devices_data:
+                if device.get("priority_level") !="critical" and device.get("current_status") != "off":
+                    device["current_status"] = "off"
+
+                    device_id = int(device["device_id"])
+                    UpdateIotDeviceStateService(device_id,"off",int(user_id))                                     #updejtujemo u bazi takodje
+                    UpdateCachedIotDeviceService(user_id, device_id, {"current_status": "off"}, pipe=cache_pipe)
+            cache_pipe.execute()
+
+            alarm_user = "Battery is bellow 25% turning off all IoT that are not critical priority"
+
+    weather = prepared["weather"]
+    live_data_payload = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "user_id": user_id,
+        "solar_production_kw": round(result["solar_production_kw"], 2),
+        "household_consumption_kw": round(result["household_consumption_kw"], 2),
+        "battery_charge_percentage": round(new_charge_percentage, 2),
+        "battery_flow_kw": round(result["battery_flow_kw"], 2),
+        "global_tilted_irradiance_instant": weather["global_tilted_irradiance_instant"],
+        "grid_contribution_kw": round(result["grid_contribution_kw"], 2),
+        "current_temperature_c": round(weather["temperature_2m"], 1),
+        "battery_loss_kw":round(result["battery_loss_kw"], 2),
+        "is_day": bool(weather["is_day"]),
+        "alarm_user":alarm_user,
+        "iot_devices_data":strip_device_fields(iot_devices_data)                              # resenje onog bug-a sa tim da se ne ne gase non critical uredjaji automatski kada padne na <25%
+    }
+
+    # Emit data to the connected user via WebSocket, samo promene od poslednjeg snapshot-a
+    # satna energija (kWh) za user_hourly_energy_data ide u isti pipeline kao payload i snapshot
+    pipe = redis_binary_client.pipeline(transaction=False)
+    AccumulateEnergyService(user_id, live_data_payload, pipe=pipe)
+    emit_live_update(user_id, live_data_payload, prepared["previous_snapshot"], emitter, prepared["fingerprint"], pipe=pipe)
+
 
 #TODO dodaj da ako je vec izracunati podaci da se samo uzme iz cache-a da bih sprecio da kada user se npr logoutuje i ponovo udje da mu smanji % baterije za 2 puta
-def calculate_and_emit_live_data(user_id, emitter=None):
+def calculate_and_emit_live_data(user_id, emitter=None, weather=None):
     """
     Performs all the live metering calculations and emits the data via WebSocket.
-    This function can be called from multiple places:
-    1. The background scheduler (every 15 minutes)
-    2. A user action (e.g., turning on an IoT device)
+    This function is called for a single user (socket connect/resync, IoT device changes),
+    the background tick uses calculate_and_emit_live_data_batch for a whole shard.
+
+    weather: current minutely_15 slot already fetched by the tick (prefetch_weather_for_users),
+             when None the weather is fetched for this user with get_live_irradiance.
     """
     if emitter is None:
         emitter = default_socketio
     try:
-            cache_key = f"live_metering_data:{user_id}"
-            
-            live_data_payload_cache= None
-
-            #da sprecimo da se funkcija izvrsava vise puta u 15 min (da ne bi svake sekunde sa povecavao % baterije / smanjivao )
-            live_data_payload_cache = redis_client.get(f"live_metering_data:{user_id}")
-
-            if live_data_payload_cache:
-                live_data_payload_cache = json.loads(live_data_payload_cache);    
-
-                emitter.emit('live_metering_data', live_data_payload_cache, room=f"user_{user_id}")
-                print(f"Emitted CACHE data for user {user_id}")
-                return
-                 
-
-            # --- Fetching data from Redis with fallback to DB ---
-            system_id = None
-            battery_id = None
-            system_id_str = redis_client.get(f"user_solar_system_id:{user_id}")
-            if system_id_str:
-                system_id = int(system_id_str)
-                battery_id_str = redis_client.get(f"solar_system_battery_id:{system_id}")
-                if battery_id_str: 
-                    battery_id = int(battery_id_str)
-            
-            #  Redis pipeline da fetchujemo podatke brzo
-            pipe = redis_client.pipeline()
-            keys_to_fetch = [f"user:{user_id}", f"user_iot_devices:{user_id}"]
-            pipe.get(f"user:{user_id}")
-            pipe.get(f"user_iot_devices:{user_id}")
-            
-            if system_id:
-                keys_to_fetch.append(f"solar_system:{system_id}")
-                pipe.get(f"solar_system:{system_id}")
-            if battery_id:
-                keys_to_fetch.append(f"battery:{battery_id}")
-                pipe.get(f"battery:{battery_id}")
-            
-            results = pipe.execute()
-            cached_data_raw = {keys_to_fetch[i]: results[i] for i in range(len(keys_to_fetch))}
-            
-            # Deserialize cached data
-            user_data = json.loads(cached_data_raw.get(f"user:{user_id}")) if cached_data_raw.get(f"user:{user_id}") else None
-            iot_devices_cache = json.loads(cached_data_raw.get(f"user_iot_devices:{user_id}")) if cached_data_raw.get(f"user_iot_devices:{user_id}") else None
-
-            #moramo ovako uzeti iot_devices posto sam ga cudno sacuvao
-            iot_devices_data = iot_devices_cache.get("devices", []) if iot_devices_cache else []
-            solar_system_data = json.loads(cached_data_raw.get(f"solar_system:{system_id}")) if system_id and cached_data_raw.get(f"solar_system:{system_id}") else None
-            battery_data = json.loads(cached_data_raw.get(f"battery:{battery_id}")) if battery_id and cached_data_raw.get(f"battery:{battery_id}") else None
-            
-            # Fallback ka DB-u ako cache-a nema
-            if not user_data:
-                user_data = GetUserByIdService(user_id)
-                if user_data:
-                    redis_client.setex(f"user:{user_id}", 3600, json.dumps(user_data))
-                else:
-                    print(f"Error: User data not found for user {user_id}")
-                    return
-            
-            if not solar_system_data and user_data:
-                solar_system_data_from_db = GetSolarSystemByUserIdService(user_id)
-                if solar_system_data_from_db:
-                    solar_system_data = solar_system_data_from_db
-                    system_id = solar_system_data['system_id']
-                    redis_client.setex(f"solar_system:{system_id}", 3600, json.dumps(solar_system_data))
-                    redis_client.set(f"user_solar_system_id:{user_id}", str(system_id))
-                else:
-                    print(f"CRITICAL ERROR: User {user_id} found, but no solar system data in DB.")
-                    return
-            
-            if not battery_data and solar_system_data and solar_system_data.get("battery_id"):
-                battery_id_from_solar_system = solar_system_data["battery_id"]
-                battery_data_from_db = GetBatteryDataService(battery_id_from_solar_system)
-                if battery_data_from_db:
-                    battery_data = battery_data_from_db
-                    redis_client.setex(f"battery:{battery_id_from_solar_system}", 1800, json.dumps(battery_data))
-                    redis_client.set(f"solar_system_battery_id:{solar_system_data['system_id']}", str(battery_id_from_solar_system))
-            
-            if not iot_devices_data and user_data:
-                iot_devices_data_from_db = GetUsersIOTsService(user_id)
-                if iot_devices_data_from_db:
-                    iot_devices_data = iot_devices_data_from_db
-                    #mislim da iot samo mora ovako da se cachira ostali ce raditi normalno, ovo je zbog /auth/me
-                    iot_devices_list_cache = {
-                    "user_id": user_id,
-                    "solar_system_id": system_id,
-                    "devices": iot_devices_data,                      # lista dictionary-a
-                    "last_cached_at": datetime.now().timestamp()
-                    }
-
-                    redis_client.setex(f"user_iot_devices:{user_id}", 600, json.dumps(iot_devices_list_cache))
-            
-            # Check for required data
-            if not all([user_data.get('latitude'), user_data.get('longitude'), solar_system_data.get('total_panel_wattage_wp')]):
-                print(f"Error: Incomplete solar system data for user {user_id}")
-                return
-            
-            latitude = user_data.get('latitude')
-            longitude = user_data.get('longitude')
-            tilt = solar_system_data.get('tilt_degrees', 30)
-            azimuth = solar_system_data.get('azimuth_degrees', 180)
-            
-            live_data = get_live_irradiance(latitude, longitude, tilt, azimuth, user_id)
-            if not live_data:
-                print(f"Error: Failed to fetch live weather data for user {user_id}")
-                return
-            
-            current_gti = round(live_data.get("global_tilted_irradiance_instant", 0), 2)  # na 2 decimale zbog preciznosti
-            current_temperature = round(live_data.get("temperature_2m", 0), 2)            
-            current_is_day = live_data.get("is_day")
-            
-            # pozivanje funkcije koja racunaju
-            solar_production_kw = calculate_solar_production(solar_system_data, {"global_tilted_irradiance_instant": current_gti, "temperature_2m": current_temperature, "is_day": current_is_day})
-            
-            solar_production_kw = round(solar_production_kw,2)
-
-            household_consumption_kw = calculate_household_consumption(solar_system_data, iot_devices_data)
-
-            household_consumption_kw = round(household_consumption_kw,2)
-            
-            net_power_kw = solar_production_kw - household_consumption_kw
-
-            net_power_kw = round(net_power_kw,2)
-
-            #DODAJ IF ako ne postoji baterija da se ovo ne racuna, battery_loss_kw se desava zbog efikasnosnti baterije i to moramo istu uracunati da ne bi imao fantomski import i export ka gridu, iako se ta snaga zapravo gubi kod baterije
-            new_charge_percentage, battery_flow_kw, battery_loss_kw = update_battery_charge(battery_data, net_power_kw, time_step_hours=1)
-
-            battery_flow_kw = round(battery_flow_kw,2)
-            new_charge_percentage = round(new_charge_percentage,2)                      #100.00, 95.23 je ok, a d abi moglo norm da se upise
-            battery_loss_kw = round(battery_loss_kw,2)
-
-            grid_contribution_kw = calculate_grid_contribution(solar_production_kw, household_consumption_kw, battery_flow_kw,battery_loss_kw)
-            
-            
-            
-            #DODAJ IF DA AKO NE POSTOJI BATERIJA DA SE OVO NE RACUNA , MSM da nema potrebe za if-om
-            flag = UpdateBatteryCurrentPercentageService(battery_id, new_charge_percentage)
-
-
-            alarm_user = None
-            # Treba i reddis updejtovati kao sto smo i bazu updejtovali, Posto mi je ovde bio problem jer nisam u reddi-su updejtovao battery_percentage i onda je on  istao isti kao pre prvog izvrsavanja
-            # i kada je otislo do baze onaj current_row se nije promenio posto je u bazi bilo upsiano 45 a u redisu je ostalo 75 kao originalno i onda je current row bio kao da se nista nije promenilo i ovde mi je bacalo false
-            if battery_data:
-                battery_data["current_charge_percentage"] = new_charge_percentage
-                
-                battery_cache_data = build_battery_cache_data(battery_data["battery_id"], battery_data)     #dodao sam i onaj timestamp kao u svakom cache-ovanju
-
-                redis_client.setex(f"battery:{battery_id}", 1800, json.dumps(battery_cache_data))
-                # Automatizacija uredjaja i onda tipa ako je baterija ispod 50% gase se non critical
-                # ispod 25% gase se svi osim kriticnih uredjaja
-                # samo je fora poslati tipa poruku na front e kao ugasi sve te i te i onda da se Redux updejtuje i tamo
-
-                if iot_devices_data and new_charge_percentage <25:
-                    for device in iot_devices_data:
-                        if device.get("priority_level") !="critical":
-                            device["current_status"] = "off"
-
-                            device_id = int(device["device_id"])
-                            UpdateIotDeviceStateService(device_id,"off",int(user_id))                                     #updejtujemo u bazi takodje
-
-                    
-                    iot_devices_list_cache = {
-                    "user_id": user_id,
-                    "solar_system_id": system_id,
-                    "devices": iot_devices_data,                      # lista dictionary-a
-                    "last_cached_at": datetime.now().timestamp()
-                    }
-
-                    redis_client.setex(f"user_iot_devices:{user_id}", 600, json.dumps(iot_devices_list_cache))
-                        
-                    alarm_user = "Battery is bellow 25% turning off all IoT that are not critical priority"
-
-
-                       
-            live_data_payload = {
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "user_id": user_id,
-                "solar_production_kw": round(solar_production_kw, 2),
-                "household_consumption_kw": round(household_consumption_kw, 2),
-                "battery_charge_percentage": round(new_charge_percentage, 2),
-                "battery_flow_kw": round(battery_flow_kw, 2),
-                "global_tilted_irradiance_instant": current_gti,
-                "grid_contribution_kw": round(grid_contribution_kw, 2),
-                "current_temperature_c": round(current_temperature, 1),
-                "battery_loss_kw":round(battery_loss_kw, 2),
-                "is_day": bool(current_is_day),
-                "alarm_user":alarm_user,
-                "iot_devices_data":iot_devices_data                                                   # resenje onog bug-a sa tim da se ne ne gase non critical uredjaji automatski kada padne na <25%
-            }
-            redis_client.setex(cache_key, 4, json.dumps(live_data_payload))                           #4 sekunde  traje cache
-            
-            # Emit data to the connected user via WebSocket
-            emitter.emit('live_metering_data', live_data_payload, room=f"user_{user_id}")
-            print(f"Emitted new data for user {user_id}")
+        prepared = _prepare_live_inputs(user_id, weather)
+        if prepared is None:
+            return
+        _finish_live_update(prepared, _simulate_live_inputs(prepared), emitter)
 
     except Exception as e:
         print(f"An unexpected error occurred during calculation for user {user_id}: {e}")
 
+
+def calculate_and_emit_live_data_batch(user_ids, emitter=None, weather_by_user=None) -> int:
+    """
+    Isto sto i calculate_and_emit_live_data za vise user-a (jedan shard tick-a), ali se simulacija za sve user-e kojima treba
+    racuna jednim simulate_users_batch pozivom (numpy) umesto skalarnog lanca po user-u. Greska kod jednog user-a ne prekida ostale.
+
+    weather_by_user: str(user_id) -> slot iz prefetch_weather_for_users, user-i kojih nema sami dohvataju weather
+
+    Returns:
+        int: broj user-a kod kojih je doslo do greske
+    """
+    if emitter is None:
+        emitter = default_socketio
+    weather_by_user = weather_by_user or {}
+    errors = 0
+
+    prepared_users = []
+    for user_id in user_ids:
+        try:
+            prepared = _prepare_live_inputs(int(user_id), weather_by_user.get(str(user_id)))
+            if prepared is not None:
+                prepared_users.append(prepared)
+        except Exception as e:
+            errors += 1
+            print(f"An unexpected error occurred during calculation for user {user_id}: {e}")
+
+    results = simulate_users_batch(
+        [(prepared["solar_system"], prepared["weather"], prepared["iot_devices"], prepared["battery"]) for prepared in prepared_users],
+        time_step_hours=LIVE_METERING_TIME_STEP_HOURS,
+        decimals=2,
+    )
+
+    for prepared, result in zip(prepared_users, results):
+        try:
+            if result is None:
+                # ulaz nije broj (npr. NULL kolona baterije): skalarni lanac ili racuna isto ili baci gresku koja se broji ispod
+                result = _simulate_live_inputs(prepared)
+            _finish_live_update(prepared, result, emitter)
+        except Exception as e:
+            errors += 1
+            print(f"An unexpected error occurred during calculation for user {prepared['user_id']}: {e}")
+
+    batched = sum(result is not None for result in results)
+    print(f"Simulated {batched}/{len(user_ids)} users in one batch")
+    return errors
+
+
+def emit_live_update(user_id, live_data_payload: dict, previous_snapshot: dict, emitter, fingerprint: str = None, pipe=None):
+    """
+    Salje room-u samo promene od poslednjeg snapshot-a (live_metering_delta sa seq+1), ili ceo snapshot (live_metering_data)
+    ako snapshot jos ne postoji. Payload (LIVE_METERING_CACHE_TTL) i novi snapshot se upisuju jednim pipeline-om.
+    fingerprint (otisak ulaza simulacije) se cuva uz snapshot da bi sledeci tick sa istim ulazima mogao da preskoci racunanje.
+    pipe: pipeline sa ostalim upisima tick-a (izvrsava se ovde), ako nije prosledjen pravi se novi.
+
+    Returns:
+        int seq koji klijenti sada imaju
+    """
+    room = f"user_{user_id}"
+    if pipe is None:
+        pipe = redis_binary_client.pipeline(transaction=False)
+    LIVE_METERING_CACHE.write(pipe, user_id, live_data_payload)                                         #LIVE_METERING_CACHE_TTL (4 sekunde) traje cache
+
+    if not previous_snapshot:
+        seq = 1
+        LIVE_SNAPSHOT_CACHE.write(pipe, user_id, {"seq": seq, "payload": live_data_payload, "fingerprint": fingerprint})
+        pipe.execute()
+        emitter.emit('live_metering_data', {**live_data_payload, "seq": seq}, room=room)
+        print(f"Emitted live snapshot for user {user_id} (seq {seq})")
+        return seq
+
+    delta = compute_live_delta(previous_snapshot["payload"], live_data_payload)
+    if delta is None:
+        # klijenti vec imaju ovo stanje, seq ostaje isti, menja se samo otisak ulaza
+        LIVE_SNAPSHOT_CACHE.write(pipe, user_id, {**previous_snapshot, "fingerprint": fingerprint})
+        pipe.execute()
+        return previous_snapshot["seq"]
+
+    seq = previous_snapshot["seq"] + 1
+    LIVE_SNAPSHOT_CACHE.write(pipe, user_id, {"seq": seq, "payload": live_data_payload, "fingerprint": fingerprint})
+    pipe.execute()
+    emitter.emit('live_metering_delta', {"user_id": user_id, "seq": seq, **delta}, room=room)
+    print(f"Emitted live delta for user {user_id} (seq {seq}, {len(delta['changes'])} fields, {len(delta.get('iot_devices_changed', []))} devices)")
+    return seq
+
+
+def send_live_snapshot(user_id) -> bool:
+    """Salje poslednji snapshot (ceo payload sa seq) samo klijentu koji je poslao trenutni socket event (connect ili resync)."""
+    snapshot = get_many(LIVE_SNAPSHOT_CACHE, [user_id])[user_id]
+    if not snapshot:
+        return False
+    emit('live_metering_data', {**snapshot["payload"], "seq": snapshot["seq"]})
+    return True
+
 # --- WEB SOCKET HANDLERS ---
 @default_socketio.on('connect')
 def handle_connect():
@@ -344,6 +416,9 @@ def handle_connect():
         user_id = decoded_token['sub']
 
         join_room(f"user_{user_id}")
+        mark_user_active(user_id)
+        session["user_id"] = user_id                    # socketio session je po konekciji, treba nam u handle_disconnect
+        touch_live_subscriber(user_id, request.sid)     # jedna konekcija po tabu, tick racuna samo za user-e koje neko gleda
         print(f"--- [DEBUG] Client connected and authenticated for user {user_id} ---")
 
         #prvo cu bez thread-ova da bih mogao da debagujem i da proverim sve kalkulacije
@@ -352,6 +427,9 @@ def handle_connect():
 
         calculate_and_emit_live_data(user_id)
 
+        # novi klijent nema osnovu za delta emit-ove, dobija ceo snapshot samo on
+        send_live_snapshot(user_id)
+
         print("--- [DEBUG] Started data calculation ---")
 
     except Exception as e:
@@ -361,8 +439,36 @@ def handle_connect():
 
 @default_socketio.on('disconnect')
 def handle_disconnect():
+    user_id = session.get("user_id")
+    if user_id is not None:
+        # user mozda ima jos neki otvoren tab pa ga ne brisemo iz registra, samo pomeramo last-seen, expire_stale_active_users ga brise posle ACTIVE_USER_TTL_SECONDS
+        mark_user_active(user_id)
+        remaining = remove_live_subscriber(user_id, request.sid)
+        print(f"Client disconnected (user {user_id}, {remaining} subscriber(s) left)")
+        return
     print("Client disconnected")
 
+@default_socketio.on('live_metering_resync')
+def handle_live_metering_resync():
+    """Klijent je propustio delta (seq nije sledeci) i trazi ceo snapshot."""
+    user_id = session.get("user_id")
+    if user_id is None:
+        return
+    touch_live_subscriber(user_id, request.sid)
+    if not send_live_snapshot(user_id):
+        # snapshot je istekao, racuna se ponovo i salje svima u room-u
+        calculate_and_emit_live_data(user_id)
+        send_live_snapshot(user_id)
+
+@default_socketio.on('live_metering_ping')
+def handle_live_metering_ping():
+    """Heartbeat klijenta (svakih LIVE_SUBSCRIBER_PING_SECONDS), bez njega konekcija ispada iz live_subscriber_sessions."""
+    user_id = session.get("user_id")
+    if user_id is None:
+        return
+    touch_live_subscriber(user_id, request.sid)
+    mark_user_active(user_id)
+
 # # # --- BACKGROUND TASK ---
 # def scheduled_task_for_all_users():
 #     print("Running scheduled task to update live metering for all users...")
@@ -0,0 +1,96 @@
+#Service/LocalCache.py
+# L1 cache u memoriji procesa (celery worker, web proces) ispred Redis-a za podatke koji se skoro nikad ne menjaju:
+# konfiguracija solarnog sistema (snaga panela, inverter, tilt, azimut, base_consumption_kw) i specifikacije baterije.
+# Tick ih je svakih 5 sekundi za svakog user-a citao iz Redis-a i dekodirao, sada ih uzima iz memorije.
+#
+#   LocalCache         ograniceni LRU (L1_CACHE_MAX_ENTRIES), svaki unos ima generation u kojoj je upisan i istice posle L1_CACHE_TTL_SECONDS
+#   generation         raste sa svakom invalidacijom; put(key, value, generation) ne upisuje vrednost procitanu pre invalidacije
+#                      koja je stigla u medjuvremenu (inace bi stara vrednost iz Redis-a ostala u L1)
+#   invalidacija       InvalidationBus.publish_entity_change salje dogadjaj na Redis pub/sub kanal cache_invalidation,
+#                      svaki proces ga slusa (start_cache_invalidation_listener) i apply_cache_invalidation brise pogodjene unose iz svog L1
+# Pub/sub poruke se gube ako proces nije bio povezan, zato L1 unosi imaju i TTL, a pri gresci u listener-u se ceo L1 brise.
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+L1_CACHE_MAX_ENTRIES = int(os.getenv("L1_CACHE_MAX_ENTRIES", "10000"))
+L1_CACHE_TTL_SECONDS = float(os.getenv("L1_CACHE_TTL_SECONDS", "300"))
+
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+
+
+class LocalCache:
+    """Ograniceni LRU sa generation brojem, kljuc je (entitet, id). get vraca kopiju da pozivalac ne bi menjao unos u cache-u."""
+
+    def __init__(self, max_entries: int = L1_CACHE_MAX_ENTRIES, ttl_seconds: float = L1_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self._entries = OrderedDict()           # key -> (generation, expires_at, value)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, now: float = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            value = entry[2]
+        return dict(value) if isinstance(value, dict) else value
+
+    def put(self, key, value, generation: int, now: float = None) -> bool:
+        """
+        Upisuje vrednost procitanu dok je generation bila ovakva (uzeti self.generation pre citanja iz Redis-a).
+
+        Returns:
+            bool: False ako je u medjuvremenu stigla invalidacija pa vrednost mozda nije sveza
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self._entries[key] = (generation, now + self.ttl_seconds, dict(value) if isinstance(value, dict) else value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def invalidate(self, key):
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+local_cache = LocalCache()
+
+
+def apply_cache_invalidation(message: str):
+    """
+    Obradjuje dogadjaj sa kanala ({"entities": [...], "user_id", "system_id", "battery_id"}): brise pogodjene unose iz L1 ovog procesa.
+    L1 drzi samo solarni sistem (i mapiranje user -> sistem) i bateriju, ostali entiteti su samo u Redis-u.
+    """
+    event = json.loads(message)
+    entities = event["entities"]
+    if "solar_system" in entities:
+        if event.get("system_id") is not None:
+            local_cache.invalidate(("solar_system", int(event["system_id"])))
+        if event.get("user_id") is not None:
+            local_cache.invalidate(("user_solar_system", int(event["user_id"])))
+    if "battery" in entities and event.get("battery_id") is not None:
+        local_cache.invalidate(("battery", int(event["battery_id"])))
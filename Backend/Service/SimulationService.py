@@ -1,5 +1,10 @@
 
 #Service/SimulationService.py
+import hashlib
+import json
+
+import numpy as np
+
 #najbolje da koristis onu INSTANT opciju za ove parametre tako ces dobiti najbolje podatke
 
 # Funkcije nisu dirketno povezane (da jedna drugu zovu unutar racunanje zato sto onda unit testovi ne bi bili moguci za razlicite podatke)
@@ -374,4 +379,287 @@ def update_battery_charge( battery_config: dict, net_power_kw: float, time_step_
 
     new_charge_percentage = (new_charge_kwh / capacity_kwh) * 100.0 if capacity_kwh > 0 else 0.0
 
-    return  new_charge_percentage, actual_battery_flow_kw, battery_loss_kw
\ No newline at end of file
+    return  new_charge_percentage, actual_battery_flow_kw, battery_loss_kw
+
+
+# --- BATCH (VEKTORIZOVANA) VERZIJA SIMULACIJE ---
+# Iste formule kao skalarne funkcije iznad, samo sto svaki argument je NumPy niz gde je jedan red = jedan user.
+# Koristi se kada tick racuna vise user-a odjednom, umesto N Python poziva imamo nekoliko operacija nad nizovima.
+# Konstante moraju ostati iste kao u calculate_solar_production, test_simulation_calculations proverava da batch i skalarni put daju isto.
+
+BATCH_I_STC = 1000.0            # W/m^2
+BATCH_EFF_SYSTEM = 0.90
+BATCH_TEMP_REF = 25.0
+BATCH_TEMP_COEF = 0.004
+
+
+def _as_float_array(values, size=None) -> np.ndarray:
+    """Pretvara listu/skalar u float64 niz, skalar se broadcast-uje na size redova."""
+    array = np.asarray(values, dtype=np.float64)
+    if size is not None and array.ndim == 0:
+        array = np.full(size, float(array))
+    return array
+
+
+def calculate_solar_production_batch(total_panel_wattage_wp, inverter_capacity_kw, global_tilted_irradiance_instant, temperature_2m, is_day) -> np.ndarray:
+    """
+    Vektorizovana verzija calculate_solar_production.
+
+    Returns:
+        np.ndarray: proizvodnja u kW po user-u, 0 za redove gde je is_day == 0
+    """
+    total_panel_wattage_wp = _as_float_array(total_panel_wattage_wp)
+    size = total_panel_wattage_wp.shape[0]
+    inverter_capacity_kw = _as_float_array(inverter_capacity_kw, size)
+    irradiance = _as_float_array(global_tilted_irradiance_instant, size)
+    temperature = _as_float_array(temperature_2m, size)
+    is_day = _as_float_array(is_day, size)
+
+    eff_temp = 1.0 - np.maximum(0.0, (temperature - BATCH_TEMP_REF) * BATCH_TEMP_COEF)
+    production_kw = (total_panel_wattage_wp * (irradiance / BATCH_I_STC) * BATCH_EFF_SYSTEM * eff_temp) / 1000
+
+    final_production_kw = np.maximum(0.0, np.minimum(production_kw, inverter_capacity_kw))
+
+    return np.where(is_day == 0, 0.0, final_production_kw)
+
+
+def calculate_household_consumption_batch(base_consumption_kw, iot_consumption_watts) -> np.ndarray:
+    """
+    Vektorizovana verzija calculate_household_consumption.
+    iot_consumption_watts je vec sabrana snaga UKLJUCENIH IoT uredjaja po user-u (vidi sum_active_iot_watts).
+    """
+    base_consumption_kw = _as_float_array(base_consumption_kw)
+    iot_consumption_watts = _as_float_array(iot_consumption_watts, base_consumption_kw.shape[0])
+
+    return base_consumption_kw + iot_consumption_watts / 1000.0
+
+
+def sum_active_iot_watts(iot_devices_per_user: list[list[dict]]) -> np.ndarray:
+    """Sabira base_consumption_watts ukljucenih uredjaja za svakog user-a, ulaz za calculate_household_consumption_batch."""
+    return np.array([
+        sum(device.get("base_consumption_watts", 0.0) for device in (devices or []) if device.get("current_status") == "on")
+        for devices in iot_devices_per_user
+    ], dtype=np.float64)
+
+
+def update_battery_charge_batch(has_battery, capacity_kwh, current_charge_percentage, max_charge_rate_kw, max_discharge_rate_kw, efficiency, net_power_kw, time_step_hours) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vektorizovana verzija update_battery_charge.
+
+    Redovi bez baterije (has_battery == False) ili sa capacity_kwh <= 0 vracaju (0, 0, 0) isto kao skalarna funkcija.
+    Za net_power_kw == 0 baterija miruje: procenat ostaje isti, protok i gubitak su 0.
+
+    Returns:
+        tuple: (new_charge_percentage, actual_battery_flow_kw, battery_loss_kw) kao nizovi
+    """
+    has_battery = np.asarray(has_battery, dtype=bool)
+    size = has_battery.shape[0]
+    capacity_kwh = _as_float_array(capacity_kwh, size)
+    current_charge_percentage = _as_float_array(current_charge_percentage, size)
+    max_charge_rate_kw = _as_float_array(max_charge_rate_kw, size)
+    max_discharge_rate_kw = _as_float_array(max_discharge_rate_kw, size)
+    efficiency = _as_float_array(efficiency, size)
+    net_power_kw = _as_float_array(net_power_kw, size)
+
+    valid = has_battery & (capacity_kwh > 0) & (efficiency > 0)
+    # da ne bi delili sa 0 u redovima koji se svakako odbacuju na kraju
+    safe_capacity = np.where(valid, capacity_kwh, 1.0)
+    safe_efficiency = np.where(valid, efficiency, 1.0)
+
+    current_charge_kwh = (current_charge_percentage / 100.0) * safe_capacity
+
+    # punjenje (net_power_kw > 0)
+    charge_raw_kwh = np.minimum.reduce([
+        np.maximum(net_power_kw, 0.0) * time_step_hours,
+        max_charge_rate_kw * time_step_hours,
+        (safe_capacity - current_charge_kwh) / safe_efficiency,
+    ])
+    charge_change_kwh = charge_raw_kwh * safe_efficiency
+
+    # praznjenje (net_power_kw < 0)
+    discharge_raw_kwh = np.minimum.reduce([
+        (np.maximum(-net_power_kw, 0.0) * time_step_hours) / safe_efficiency,
+        max_discharge_rate_kw * time_step_hours,
+        current_charge_kwh,
+    ])
+    discharge_delivered_kwh = discharge_raw_kwh * safe_efficiency
+
+    charging = net_power_kw > 0
+    discharging = net_power_kw < 0
+
+    change_kwh = np.where(charging, charge_change_kwh, np.where(discharging, -discharge_raw_kwh, 0.0))
+    loss_kwh = np.where(charging, charge_raw_kwh - charge_change_kwh, np.where(discharging, discharge_raw_kwh - discharge_delivered_kwh, 0.0))
+
+    new_charge_kwh = np.clip(current_charge_kwh + change_kwh, 0.0, safe_capacity)
+
+    new_charge_percentage = np.where(valid, (new_charge_kwh / safe_capacity) * 100.0, 0.0)
+    actual_battery_flow_kw = np.where(valid, change_kwh / time_step_hours, 0.0)
+    battery_loss_kw = np.where(valid, loss_kwh / time_step_hours, 0.0)
+
+    return new_charge_percentage, actual_battery_flow_kw, battery_loss_kw
+
+
+def calculate_grid_contribution_batch(solar_production_kw, household_consumption_kw, battery_flow_kw, battery_loss_kw) -> np.ndarray:
+    """Vektorizovana verzija calculate_grid_contribution, > 0 uvoz iz grid-a, < 0 izvoz u grid."""
+    return (_as_float_array(household_consumption_kw) - _as_float_array(solar_production_kw)) + _as_float_array(battery_flow_kw) + _as_float_array(battery_loss_kw)
+
+
+def simulate_batch(solar_configs: dict, weather: dict, iot_consumption_watts, battery_configs: dict, time_step_hours: float, decimals: int = None) -> dict:
+    """
+    Cilj funkcije:
+        Ceo live metering proracun (koraci 1-5 sa vrha fajla) za vise user-a u jednom pozivu.
+
+    Args:
+        solar_configs: nizovi "total_panel_wattage_wp", "inverter_capacity_kw", "base_consumption_kw"
+        weather: nizovi "global_tilted_irradiance_instant", "temperature_2m", "is_day"
+        iot_consumption_watts: niz sa sumom snage ukljucenih IoT uredjaja po user-u
+        battery_configs: nizovi "has_battery", "capacity_kwh", "current_charge_percentage",
+                         "max_charge_rate_kw", "max_discharge_rate_kw", "efficiency"
+        time_step_hours: vremenski korak simulacije
+        decimals: ako je zadato zaokruzuje medjurezultate na istim mestima kao calculate_and_emit_live_data
+                  (proizvodnja, potrosnja, neto snaga, baterija) da bi batch i tick davali identicne brojeve
+
+    Returns:
+        dict: nizovi "solar_production_kw", "household_consumption_kw", "net_power_kw", "battery_charge_percentage",
+              "battery_flow_kw", "battery_loss_kw", "grid_contribution_kw"
+    """
+    def _round(values):
+        return np.round(values, decimals) if decimals is not None else values
+
+    solar_production_kw = _round(calculate_solar_production_batch(
+        solar_configs["total_panel_wattage_wp"],
+        solar_configs["inverter_capacity_kw"],
+        weather["global_tilted_irradiance_instant"],
+        weather["temperature_2m"],
+        weather["is_day"],
+    ))
+
+    household_consumption_kw = _round(calculate_household_consumption_batch(solar_configs["base_consumption_kw"], iot_consumption_watts))
+
+    net_power_kw = _round(solar_production_kw - household_consumption_kw)
+
+    new_charge_percentage, battery_flow_kw, battery_loss_kw = update_battery_charge_batch(
+        battery_configs["has_battery"],
+        battery_configs["capacity_kwh"],
+        battery_configs["current_charge_percentage"],
+        battery_configs["max_charge_rate_kw"],
+        battery_configs["max_discharge_rate_kw"],
+        battery_configs["efficiency"],
+        net_power_kw,
+        time_step_hours,
+    )
+
+    new_charge_percentage = _round(new_charge_percentage)
+    battery_flow_kw = _round(battery_flow_kw)
+    battery_loss_kw = _round(battery_loss_kw)
+
+    grid_contribution_kw = calculate_grid_contribution_batch(solar_production_kw, household_consumption_kw, battery_flow_kw, battery_loss_kw)
+
+    return {
+        "solar_production_kw": solar_production_kw,
+        "household_consumption_kw": household_consumption_kw,
+        "net_power_kw": net_power_kw,
+        "battery_charge_percentage": new_charge_percentage,
+        "battery_flow_kw": battery_flow_kw,
+        "battery_loss_kw": battery_loss_kw,
+        "grid_contribution_kw": grid_contribution_kw,
+    }
+
+
+BATCH_SOLAR_FIELDS = ("total_panel_wattage_wp", "inverter_capacity_kw", "base_consumption_kw")
+BATCH_WEATHER_FIELDS = ("global_tilted_irradiance_instant", "temperature_2m", "is_day")
+BATCH_BATTERY_FIELDS = ("capacity_kwh", "current_charge_percentage", "max_charge_rate_kw", "max_discharge_rate_kw", "efficiency")
+
+
+def _batch_inputs(user: tuple):
+    """
+    Numericki ulazi jednog user-a za simulate_batch kao float-ovi, None ako neki nije konacan broj.
+    NULL kolona iz baze (npr. max_charge_rate_kw) bi u numpy nizu postala NaN i tiho se prenela u SoC i payload,
+    skalarni lanac za istog user-a puca sa TypeError.
+    """
+    solar_system_config, weather_data, iot_devices_data, battery_config = user
+    try:
+        inputs = {field: float((solar_system_config or {}).get(field, 0.0)) for field in BATCH_SOLAR_FIELDS}
+        inputs.update({field: float((weather_data or {}).get(field, 0.0)) for field in BATCH_WEATHER_FIELDS})
+        inputs["iot_consumption_watts"] = float(sum_active_iot_watts([iot_devices_data])[0])
+        inputs.update({
+            field: float((battery_config or {}).get(field, 1.0 if field == "efficiency" else 0.0)) for field in BATCH_BATTERY_FIELDS
+        })
+    except (TypeError, ValueError):
+        return None
+    return inputs if all(np.isfinite(value) for value in inputs.values()) else None
+
+
+def simulate_users_batch(users: list[tuple], time_step_hours: float, decimals: int = None) -> list:
+    """
+    Cilj funkcije:
+        simulate_batch za listu user-a zadatih istim dict-ovima koje koristi skalarni lanac (shard live metering tick-a).
+
+    Args:
+        users: lista (solar_system_config, weather_data, iot_devices_data, battery_config), battery_config je None ako user nema bateriju
+        time_step_hours, decimals: isto kao simulate_batch
+
+    Returns:
+        list: po user-u, istim redom, dict sa kljucevima rezultata simulate_batch kao python float-ovi,
+              ili None za user-a ciji ulaz nije broj (NULL kolona i sl.), njega treba racunati skalarnim lancem
+    """
+    results = [None] * len(users)
+    inputs = [_batch_inputs(user) for user in users]
+    valid = [i for i, user_inputs in enumerate(inputs) if user_inputs is not None]
+    if not valid:
+        return results
+
+    def _column(field):
+        return [inputs[i][field] for i in valid]
+
+    result = simulate_batch(
+        solar_configs={field: _column(field) for field in BATCH_SOLAR_FIELDS},
+        weather={field: _column(field) for field in BATCH_WEATHER_FIELDS},
+        iot_consumption_watts=np.array(_column("iot_consumption_watts"), dtype=np.float64),
+        battery_configs={
+            "has_battery": [users[i][3] is not None for i in valid],
+            **{field: _column(field) for field in BATCH_BATTERY_FIELDS},
+        },
+        time_step_hours=time_step_hours,
+        decimals=decimals,
+    )
+    for row, i in enumerate(valid):
+        results[i] = {name: float(values[row]) for name, values in result.items()}
+    return results
+
+
+# --- OTISAK ULAZA SIMULACIJE ---
+# U okviru jednog 15-min weather slot-a, bez promena IoT uredjaja i sa baterijom zakucanom na 0% ili 100%, tick za user-a dobija iste ulaze
+# kao prethodni i racuna isti rezultat. Otisak su samo polja koja funkcije iznad citaju (konfiguracija, slot, stanje uredjaja, SoC),
+# pa last_cached_at, imena i sl. ne prave razliku. Ako je otisak isti kao kod poslednjeg snapshot-a tick preskace simulaciju.
+
+FINGERPRINT_SOLAR_FIELDS = ("total_panel_wattage_wp", "inverter_capacity_kw", "base_consumption_kw")
+FINGERPRINT_BATTERY_FIELDS = ("capacity_kwh", "max_charge_rate_kw", "max_discharge_rate_kw", "efficiency")
+FINGERPRINT_DEVICE_FIELDS = ("current_status", "base_consumption_watts", "priority_level")     # priority_level odlucuje o gasenju ispod 25%
+
+
+def simulation_input_fingerprint(solar_system_config: dict, battery_config: dict, iot_devices_data: list[dict], weather_data: dict) -> str:
+    """
+    Otisak (sha1) svih ulaza jednog tick-a: verzija konfiguracije (solarni sistem + baterija), weather slot,
+    stanje IoT uredjaja (po device_id, redosled nije bitan) i trenutni SoC.
+    Weather vrednosti se zaokruzuju isto kao u calculate_and_emit_live_data pre racunanja.
+
+    Returns:
+        str: hex otisak, isti ulazi -> isti otisak
+    """
+    battery_config = battery_config or {}
+    inputs = {
+        "config": [solar_system_config.get(field) for field in FINGERPRINT_SOLAR_FIELDS]
+                  + [battery_config.get(field) for field in FINGERPRINT_BATTERY_FIELDS],
+        "weather": [
+            round(weather_data.get("global_tilted_irradiance_instant", 0), 2),
+            round(weather_data.get("temperature_2m", 0), 2),
+            bool(weather_data.get("is_day")),
+        ],
+        "iot": sorted(
+            [int(device["device_id"])] + [device.get(field) for field in FINGERPRINT_DEVICE_FIELDS]
+            for device in iot_devices_data or []
+        ),
+        "soc": battery_config.get("current_charge_percentage"),
+    }
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
@@ -1,4 +1,5 @@
 from ..DataBaseHandler import *                #importujemo DataBase Handlere, tu se nalazi RegisterUser
+from .InvalidationBus import publish_entity_change
 
 
 
@@ -75,6 +76,9 @@ def GetSolarSystemByUserIdService(user_id:int)->dict:
     return GetSolarSystemByUserId(user_id)
 
 
-def UpdateSolarSystemBatteryIdService(system_id: int, battery_id: int = None) -> bool:
+def UpdateSolarSystemBatteryIdService(system_id: int, battery_id: int = None, user_id: int = None) -> bool:
 
-    return UpdateSolarSystemBatteryId(system_id,battery_id)
+    result = UpdateSolarSystemBatteryId(system_id,battery_id)
+    # battery_id sistema je promenjen, stara baterija se razresi iz mapiranja, vlasnik iz baze ako user_id nije prosledjen
+    publish_entity_change("solar_system", user_id=user_id, system_id=system_id)
+    return result
@@ -1,19 +1,97 @@
+#Service/UpdateService.py
+# Write-behind za stanje baterija (SoC).
+#
+# Ranije je svaki tick za svakog user-a radio UPDATE batteries + commit. Sada je Redis glavni izvor za current_charge_percentage:
+#   battery_soc            hash battery_id -> trenutni procenat (ono sto tick racuna i cita)
+#   battery_soc_persisted  hash battery_id -> procenat koji je poslednji upisan u MySQL
+# FlushBatteryStateService (celery beat) upisuje u bazu samo baterije cija se vrednost promenila bar za BATTERY_SOC_FLUSH_THRESHOLD
+# procenata od poslednjeg upisa, sve jednim executemany. Pri gasenju worker-a flush se radi sa force=True pa se upisuje svaka razlika.
+# Hash-evi nemaju TTL, pa ako worker padne stanje ostaje u Redis-u i upisuje se pri sledecem flush-u.
 
+import os
 
+from ..DataBaseHandler import *
+from extensions import redis_client
 
-#promene koje su >2% ce se pisati u bazu ostale promene se pisu u reddis
 
+# Minimalna promena (u procentnim poenima) od poslednjeg upisa da bi periodicni flush upisao bateriju u bazu
+BATTERY_SOC_FLUSH_THRESHOLD = float(os.getenv("BATTERY_SOC_FLUSH_THRESHOLD", "2.0"))
 
-# def handle_battery_update(device_id, new_percentage):
-#     cache_key = f"battery:{device_id}"
-#     cached = redis.get(cache_key)
+BATTERY_SOC_KEY = "battery_soc"
+BATTERY_SOC_PERSISTED_KEY = "battery_soc_persisted"
 
-#     if cached:
-#         old_percentage = float(cached["value"])
-#         if abs(old_percentage - new_percentage) >= 2:
-#             update_mysql(device_id, new_percentage)
-#     else:
-#         update_mysql(device_id, new_percentage)
 
-#     # Always update cache
-#     redis.set(cache_key, {"value": new_percentage, "timestamp": now()})
\ No newline at end of file
+def GetBatteryStateService(battery_id: int, db_percentage: float = None) -> float:
+    """
+    Vraca trenutni procenat baterije iz Redis-a.
+    Ako baterija jos nije u store-u, a prosledjen je db_percentage (vrednost iz baze/battery: cache-a), on se upisuje kao pocetno stanje.
+
+    Returns:
+        float ili None ako baterija nije u store-u i db_percentage nije prosledjen
+    """
+    current = redis_client.hget(BATTERY_SOC_KEY, battery_id)
+    if current is not None:
+        return float(current)
+
+    if db_percentage is None:
+        return None
+
+    # hsetnx da ne pregazimo vrednost koju je drugi proces upisao u medjuvremenu
+    pipe = redis_client.pipeline()
+    pipe.hsetnx(BATTERY_SOC_KEY, battery_id, db_percentage)
+    pipe.hsetnx(BATTERY_SOC_PERSISTED_KEY, battery_id, db_percentage)
+    pipe.hget(BATTERY_SOC_KEY, battery_id)
+    return float(pipe.execute()[-1])
+
+
+def SetBatteryStateService(battery_id: int, new_percentage: float):
+    """Upisuje novi procenat samo u Redis, u bazu ga upisuje FlushBatteryStateService."""
+    redis_client.hset(BATTERY_SOC_KEY, battery_id, new_percentage)
+
+
+def ForgetBatteryStateService(battery_id: int):
+    """Brise bateriju iz store-a (posle brisanja baterije), da je flush ne bi upisivao."""
+    pipe = redis_client.pipeline()
+    pipe.hdel(BATTERY_SOC_KEY, battery_id)
+    pipe.hdel(BATTERY_SOC_PERSISTED_KEY, battery_id)
+    pipe.execute()
+
+
+def FlushBatteryStateService(force: bool = False) -> int:
+    """
+    Upisuje u MySQL baterije cije se stanje promenilo od poslednjeg upisa.
+
+    Args:
+        force: ako je True upisuje se svaka razlika bez obzira na BATTERY_SOC_FLUSH_THRESHOLD (gasenje worker-a)
+
+    Returns:
+        int: broj baterija upisanih u bazu
+    """
+    pipe = redis_client.pipeline()
+    pipe.hgetall(BATTERY_SOC_KEY)
+    pipe.hgetall(BATTERY_SOC_PERSISTED_KEY)
+    current_by_battery, persisted_by_battery = pipe.execute()
+
+    threshold = 0.0 if force else BATTERY_SOC_FLUSH_THRESHOLD
+    to_flush = []
+    for battery_id, current in current_by_battery.items():
+        current = float(current)
+        persisted = persisted_by_battery.get(battery_id)
+        if persisted is None:
+            to_flush.append((int(battery_id), current))
+            continue
+
+        change = abs(current - float(persisted))
+        if change > 0 and change >= threshold:
+            to_flush.append((int(battery_id), current))
+
+    if not to_flush:
+        return 0
+
+    update_battery_percentages(to_flush)
+
+    # persisted je ono sto smo upisali, ne ono sto je sada u battery_soc (tick je mozda vec upisao novu vrednost, ona ide u sledeci flush)
+    redis_client.hset(BATTERY_SOC_PERSISTED_KEY, mapping={battery_id: percentage for battery_id, percentage in to_flush})
+
+    print(f"Flushed {len(to_flush)} battery states to DB (force={force})")
+    return len(to_flush)
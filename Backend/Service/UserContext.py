@@ -0,0 +1,104 @@
+#Service/UserContext.py
+# Odluka da li kontekst user-a (user, solarni sistem, baterija, IoT uredjaji) mora do baze i dopuna onoga sto fali.
+# Citanje iz Redis-a (Lua skripta), L1 i cache fill lock su u UserContextService, ovde nema ni baze ni Redis klijenta:
+# loader-i i upisi u cache dolaze kroz store (CacheRepository funkcije, vidi _user_context_store u UserContextService),
+# upisi idu u prosledjeni pipeline.
+
+
+def empty_user_context(user_id: int) -> dict:
+    return {
+        "user_id": user_id,
+        "system_id": None,
+        "battery_id": None,
+        "user": None,
+        "solar_system": None,
+        "battery": None,
+        "iot_devices": [],
+        "live_payload": None,
+        "live_snapshot": None,
+        "no_solar_system": False,
+    }
+
+
+def context_needs_db(context: dict, iot_devices_cache) -> bool:
+    """
+    True ako nesto iz konteksta fali u cache-u. User bez solarnog sistema (no_solar_system, negativni cache)
+    nema ni sistem ni bateriju, to nije miss.
+    """
+    solar_system_data = context["solar_system"]
+    return (
+        not context["user"]
+        or (not solar_system_data and not context["no_solar_system"])
+        or (not context["battery"] and bool(solar_system_data and solar_system_data.get("battery_id")))
+        or iot_devices_cache is None
+    )
+
+
+def fill_user_context(context: dict, battery_soc, iot_devices_cache, store, pipe, load_from_db: bool = True) -> dict:
+    """
+    Fallback ka bazi za ono sto fali u context-u, sve upise idu u jedan pipeline.
+    Sa load_from_db=False (drugi proces je upravo napunio cache) se ne ide do baze, samo se preuzme stanje baterije iz store-a.
+
+    Args:
+        store: load_user, load_solar_system, load_battery, load_iot_devices, write_*_cache i battery_soc_key / battery_soc_persisted_key
+        pipe: Redis pipeline, izvrsava se samo ako je nesto upisano
+    """
+    user_id = context["user_id"]
+    writes = 0
+
+    if not context["user"]:
+        if not load_from_db:
+            return context
+        context["user"] = store.load_user(user_id)
+        if not context["user"]:
+            return context
+        store.write_user_cache(pipe, context["user"])
+        writes += 1
+
+    if not context["solar_system"] and not context["no_solar_system"] and load_from_db:
+        context["solar_system"] = store.load_solar_system(user_id)
+        if context["solar_system"]:
+            context["system_id"] = context["solar_system"]["system_id"]
+            store.write_solar_system_cache(pipe, user_id, context["solar_system"])
+            writes += 2
+        else:
+            context["no_solar_system"] = True
+            store.write_no_solar_system_cache(pipe, user_id)
+            writes += 1
+
+    solar_system_data = context["solar_system"]
+    if not context["battery"] and load_from_db and solar_system_data and solar_system_data.get("battery_id"):
+        battery_id_from_solar_system = solar_system_data["battery_id"]
+        context["battery"] = store.load_battery(battery_id_from_solar_system)
+        if context["battery"]:
+            context["battery_id"] = battery_id_from_solar_system
+            store.write_battery_cache(pipe, battery_id_from_solar_system, context["battery"], system_id=solar_system_data["system_id"])
+            writes += 2
+
+    if iot_devices_cache is None and load_from_db:
+        iot_devices_data = store.load_iot_devices(user_id)
+        # i prazna lista se upisuje (negativni cache), da user bez uredjaja ne ide do baze svaki tick
+        context["iot_devices"] = iot_devices_data
+        store.write_iot_devices_cache(pipe, user_id, iot_devices_data)
+        writes += 1
+
+    read_soc_after_write = False
+    if context["battery"]:
+        if battery_soc is not None:
+            context["battery"]["current_charge_percentage"] = float(battery_soc)
+        else:
+            # skripta nije nasla stanje (nema ga u store-u ili je battery_id dosao iz baze): vrednost iz cache-a/baze postaje pocetno stanje,
+            # hsetnx ne pregazi vrednost koja vec postoji pa se posle upisa cita ono sto je stvarno u store-u
+            battery_id_for_soc = context["battery"]["battery_id"]
+            pipe.hsetnx(store.battery_soc_key, battery_id_for_soc, context["battery"]["current_charge_percentage"])
+            pipe.hsetnx(store.battery_soc_persisted_key, battery_id_for_soc, context["battery"]["current_charge_percentage"])
+            pipe.hget(store.battery_soc_key, battery_id_for_soc)
+            read_soc_after_write = True
+            writes += 3
+
+    if writes:
+        results = pipe.execute()
+        if read_soc_after_write and results[-1] is not None:
+            context["battery"]["current_charge_percentage"] = float(results[-1])
+
+    return context
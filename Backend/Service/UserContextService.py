@@ -0,0 +1,231 @@
+#Service/UserContextService.py
+# Ucitavanje celog konteksta user-a (user, solarni sistem, baterija, IoT uredjaji, poslednji live payload) iz Redis-a.
+#
+# Ranije su /auth/me i calculate_and_emit_live_data prvo radili GET user_solar_system_id:{id}, pa GET solar_system_battery_id:{sid},
+# pa tek onda pipeline za ostale kljuceve (3 round trip-a), a kod cache miss-a jos po jedan setex/set za svaki kljuc.
+# Sada Lua skripta na Redis serveru razresi ceo lanac i vrati sve vrednosti u jednom round trip-u,
+# a sve sto je falilo i ucitano je iz baze upisuje se nazad jednim pipeline-om.
+# Loader-i, oblik podataka, TTL-ovi i brojaci su u CacheRepository, ovde je samo redosled (user -> sistem -> baterija -> uredjaji).
+
+from types import SimpleNamespace
+
+from extensions import redis_binary_client
+from .CacheCodec import decode_cache_value, decode_hash_fields
+from .CacheRepository import *
+from .UpdateService import BATTERY_SOC_KEY, BATTERY_SOC_PERSISTED_KEY
+from .LocalCache import local_cache
+from .InvalidationBus import start_cache_invalidation_listener
+from .UserContext import empty_user_context, context_needs_db, fill_user_context
+
+
+# ARGV[1] = user_id, ARGV[2] = hash sa stanjem baterija (battery_soc)
+# ARGV[3], ARGV[4] = system_id i battery_id cija je konfiguracija vec u L1 (LocalCache) ovog procesa, ili "" - njih skripta ne cita
+# Kljucevi se racunaju u skripti (ne salju se kao KEYS) jer system_id i battery_id saznajemo tek usput, radi samo na jednom Redis node-u
+# Lua false (GET koji nije nasao kljuc) se vraca kao nil
+# battery:{id}, iot_device:{id} i user_iot_devices:{user_id} (set device_id-eva) se citaju samo ako su vec novog tipa,
+# stari string unosi (pre prelaska na hash-eve) se tretiraju kao miss i prepisuju iz baze
+# system_id "0" i device_id 0 su negativni cache (NO_ENTITY_ID u CacheRepository): user nema sistem / uredjaje, nista se ne cita
+_USER_CONTEXT_LUA = """
+local user_id = ARGV[1]
+local system_id = redis.call('GET', 'user_solar_system_id:' .. user_id)
+local battery_id = false
+local solar_system = false
+local battery = false
+local battery_soc = false
+local iot_devices = false
+
+local function key_type(key)
+    return redis.call('TYPE', key).ok
+end
+
+if system_id and system_id ~= '0' then
+    battery_id = redis.call('GET', 'solar_system_battery_id:' .. system_id)
+    if system_id ~= ARGV[3] then
+        solar_system = redis.call('GET', 'solar_system:' .. system_id)
+    end
+end
+if battery_id then
+    if battery_id ~= ARGV[4] and key_type('battery:' .. battery_id) == 'hash' then
+        battery = redis.call('HGETALL', 'battery:' .. battery_id)
+    end
+    battery_soc = redis.call('HGET', ARGV[2], battery_id)
+end
+
+local iot_index = 'user_iot_devices:' .. user_id
+if key_type(iot_index) == 'set' then
+    iot_devices = {}
+    for _, device_id in ipairs(redis.call('SMEMBERS', iot_index)) do
+        if device_id ~= '0' then
+            iot_devices[#iot_devices + 1] = redis.call('HGETALL', 'iot_device:' .. device_id)
+        end
+    end
+end
+
+return {
+    system_id,
+    battery_id,
+    redis.call('GET', 'user:' .. user_id),
+    solar_system,
+    battery,
+    battery_soc,
+    iot_devices,
+    redis.call('GET', 'live_metering_data:' .. user_id),
+    redis.call('GET', 'live_metering_snapshot:' .. user_id)
+}
+"""
+
+# register_script salje EVALSHA i sam ponovo ucita skriptu ako je Redis restartovan (NOSCRIPT)
+# binarni klijent jer su vrednosti kodirane CacheCodec-om, id-evi dolaze kao bytes (int(b"12") radi)
+_user_context_script = redis_binary_client.register_script(_USER_CONTEXT_LUA)
+
+# loader-i i upisi iz CacheRepository za fill_user_context (UserContext ne zna za bazu ni Redis)
+_user_context_store = SimpleNamespace(
+    load_user=load_user,
+    load_solar_system=load_solar_system,
+    load_battery=load_battery,
+    load_iot_devices=load_iot_devices,
+    write_user_cache=write_user_cache,
+    write_solar_system_cache=write_solar_system_cache,
+    write_battery_cache=write_battery_cache,
+    write_no_solar_system_cache=write_no_solar_system_cache,
+    write_iot_devices_cache=write_iot_devices_cache,
+    battery_soc_key=BATTERY_SOC_KEY,
+    battery_soc_persisted_key=BATTERY_SOC_PERSISTED_KEY,
+)
+
+
+def _decode_iot_devices(raw_devices):
+    """
+    Lista HGETALL rezultata iz skripte -> lista uredjaja po device_id, None ako je bilo koji hash istekao (ceo IoT cache je tada miss).
+    Prazna lista je negativni cache (indeks sa samo NO_ENTITY_ID), user nema uredjaja.
+    """
+    if raw_devices is None:
+        return None
+    devices = [decode_hash_fields(raw_device) for raw_device in raw_devices]
+    if any(device is None for device in devices):
+        return None
+    return sorted(devices, key=lambda device: device["device_id"])
+
+
+def LoadUserContextService(user_id: int, skip_db_if_live_payload: bool = False, refresh: bool = False) -> dict:
+    """
+    Vraca sve sto treba za /auth/me i live metering za jednog user-a: jedan EVALSHA za sve iz Redis-a,
+    fallback na bazu za ono sto fali i jedan pipeline da se to upise nazad u cache.
+    Procenat baterije se uzima iz battery_soc (write-behind store) jer battery: cache i baza mogu kasniti za njim.
+    Kod miss-a do baze ide samo jedan proces po user-u (cache fill lock), ostali cekaju njegov upis.
+
+    Args:
+        skip_db_if_live_payload: live metering tick ne treba nista drugo ako je payload jos u cache-u, pa se tada ne ide do baze
+        refresh: preskace citanje cache-a i sve ucitava iz baze i prepisuje (login, da user dobije sveze podatke)
+
+    Returns:
+        dict sa kljucevima user_id, system_id, battery_id, user, solar_system, battery, iot_devices (lista), live_payload,
+        live_snapshot ({"seq", "payload"} poslednje poslato klijentima, LiveDelta), no_solar_system.
+        user je None ako user ne postoji, solar_system je None ako user nema solarni sistem (no_solar_system je tada True
+        ako je to vec poznato iz negativnog cache-a ili baze).
+
+    Raises:
+        ConnectionException: ako pukne fallback ka bazi
+    """
+    user_id = int(user_id)
+
+    if refresh:
+        # battery_soc = None: posle upisa baterije hsetnx/hget ispod procita stanje iz store-a, baza ga ne pregazi
+        context, battery_soc, iot_devices_cache = empty_user_context(user_id), None, None
+    else:
+        context, battery_soc, iot_devices_cache = _read_user_context(user_id)
+
+        if skip_db_if_live_payload:
+            record_cache_lookup(LIVE_METERING_CACHE.name, hits=int(bool(context["live_payload"])), misses=int(not context["live_payload"]))
+            if context["live_payload"]:
+                return context
+
+        _record_context_lookups(context, iot_devices_cache)
+
+    # --- Stampede zastita: kada kljucevi isteknu, tick, /auth/me i handle_connect mogu istovremeno promasiti cache ---
+    # samo proces koji dobije lock ide do baze, ostali sacekaju da ga pusti i procitaju ono sto je on upisao
+    fill_lock_name = f"user_context:{user_id}"
+    fill_token = None
+    load_from_db = True
+    if not refresh and context_needs_db(context, iot_devices_cache):
+        fill_token = acquire_cache_fill_lock(fill_lock_name)
+        if fill_token is None and wait_for_cache_fill(fill_lock_name):
+            context, battery_soc, iot_devices_cache = _read_user_context(user_id)
+            load_from_db = False
+
+    try:
+        return fill_user_context(
+            context, battery_soc, iot_devices_cache, _user_context_store, redis_binary_client.pipeline(transaction=False),
+            load_from_db=load_from_db,
+        )
+    finally:
+        if fill_token:
+            release_cache_fill_lock(fill_lock_name, fill_token)
+
+
+def _read_user_context(user_id: int):
+    """
+    Jedan EVALSHA, vraca (context, battery_soc iz store-a, listu uredjaja iz cache-a ili None ako ih nema).
+    Solarni sistem i baterija se uzimaju iz L1 ako skripta potvrdi da user-u i dalje pripadaju isti system_id/battery_id.
+    """
+    start_cache_invalidation_listener()
+    generation = local_cache.generation
+
+    l1_system_id = local_cache.get(("user_solar_system", user_id))
+    l1_solar_system = local_cache.get(("solar_system", l1_system_id)) if l1_system_id else None
+    l1_battery_id = l1_solar_system.get("battery_id") if l1_solar_system else None
+    l1_battery = local_cache.get(("battery", l1_battery_id)) if l1_battery_id else None
+
+    (system_id, battery_id, user_raw, solar_system_raw, battery_raw,
+     battery_soc, iot_devices_raw, live_payload_raw, live_snapshot_raw) = _user_context_script(args=[
+        user_id, BATTERY_SOC_KEY,
+        l1_system_id if l1_solar_system else "",
+        l1_battery_id if l1_battery else "",
+    ])
+
+    system_id = int(system_id) if system_id else None
+    no_solar_system = system_id == NO_ENTITY_ID
+    if no_solar_system:
+        system_id = None
+    battery_id = int(battery_id) if battery_id else None
+    context = {
+        "user_id": user_id,
+        "system_id": system_id,
+        "battery_id": battery_id,
+        "user": decode_cache_value(user_raw),
+        "solar_system": decode_cache_value(solar_system_raw),
+        "battery": decode_hash_fields(battery_raw),
+        "iot_devices": [],
+        "live_payload": decode_cache_value(live_payload_raw),
+        "live_snapshot": decode_cache_value(live_snapshot_raw),
+        "no_solar_system": no_solar_system,
+    }
+
+    # skripta nije citala ono sto je u L1 samo ako se id poklopio
+    l1_hits = 0
+    if l1_solar_system and system_id == l1_system_id:
+        context["solar_system"] = l1_solar_system
+        l1_hits += 1
+    elif context["solar_system"]:
+        local_cache.put(("user_solar_system", user_id), system_id, generation)
+        local_cache.put(("solar_system", system_id), context["solar_system"], generation)
+    if l1_battery and battery_id == l1_battery_id:
+        context["battery"] = l1_battery
+        l1_hits += 1
+    elif context["battery"]:
+        local_cache.put(("battery", battery_id), context["battery"], generation)
+    record_cache_lookup("l1", hits=l1_hits, misses=int(bool(system_id)) + int(bool(battery_id)) - l1_hits)
+
+    iot_devices_cache = _decode_iot_devices(iot_devices_raw)
+    if iot_devices_cache is not None:
+        context["iot_devices"] = iot_devices_cache
+    return context, battery_soc, iot_devices_cache
+
+
+def _record_context_lookups(context: dict, iot_devices_cache):
+    """Hit/miss za ono sto je skripta nasla. Baterija se broji samo kada je poznato da postoji (solarni sistem ima battery_id)."""
+    record_cache_lookup(USER_CACHE.name, hits=int(bool(context["user"])), misses=int(not context["user"]))
+    record_cache_lookup(SOLAR_SYSTEM_CACHE.name, hits=int(bool(context["solar_system"])), misses=int(not context["solar_system"]))
+    if context["battery"] or (context["solar_system"] and context["solar_system"].get("battery_id")):
+        record_cache_lookup(BATTERY_CACHE.name, hits=int(bool(context["battery"])), misses=int(not context["battery"]))
+    record_cache_lookup(IOT_DEVICE_CACHE.name, hits=int(iot_devices_cache is not None), misses=int(iot_devices_cache is None))
@@ -91,6 +91,41 @@ def GetAllUsersWithSystemDataService()-> list[dict]:
     return GetAllUsersWithSystemData()
 
 
+ADMIN_USERS_PAGE_SIZE = 50
+ADMIN_USERS_MAX_PAGE_SIZE = 500
+
+
+def GetUsersWithSystemDataPageService(after_user_id: int = 0, limit: int = ADMIN_USERS_PAGE_SIZE, filters: dict = None) -> dict:
+    """
+    Stranica admin liste user-a.
+
+    Returns:
+        dict: {"users": [...], "next_cursor": user_id poslednjeg user-a ili None ako nema vise stranica}
+    """
+    limit = max(1, min(int(limit), ADMIN_USERS_MAX_PAGE_SIZE))
+    # uzimamo jedan vise da bi znali da li postoji sledeca stranica bez dodatnog COUNT upita
+    users = GetUsersWithSystemDataPage(after_user_id, limit + 1, filters)
+    has_more = len(users) > limit
+    users = users[:limit]
+    return {
+        "users": users,
+        "next_cursor": users[-1]["user_id"] if has_more else None,
+    }
+
+
+def StreamUsersWithSystemDataService(after_user_id: int = 0, filters: dict = None, batch_size: int = ADMIN_USERS_MAX_PAGE_SIZE):
+    """
+    Generator svih user-a koji prolaze filtere, ucitava ih stranicu po stranicu (keyset) pa u memoriji nikad nije vise od batch_size user-a.
+    Koristi ga NDJSON mod /auth/admin_getUsers.
+    """
+    while True:
+        users = GetUsersWithSystemDataPage(after_user_id, batch_size, filters)
+        yield from users
+        if len(users) < batch_size:
+            return
+        after_user_id = users[-1]["user_id"]
+
+
 def UpdateUserApprovalStatusService(system_id, approved):
 
     return UpdateUserApprovalStatus(system_id, approved)
\ No newline at end of file
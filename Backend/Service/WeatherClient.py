@@ -0,0 +1,144 @@
+#Service/WeatherClient.py
+# Jedan dugo-zivi Open-Meteo klijent po procesu.
+#
+# Ranije je svaki poziv get_live_irradiance pravio novi requests_cache.CachedSession('.cache'), novi retry wrapper i novi openmeteo Client,
+# sto znaci novi SQLite handle i novi connection pool (pa i novi TCP/TLS handshake) za svakog user-a u svakom tick-u.
+# Sada se session pravi jednom, drzi keep-alive konekcije u pool-u i deli ga ceo proces (Flask app ili celery worker).
+#
+# Cache backend za HTTP odgovore se bira preko WEATHER_CACHE_BACKEND:
+#   sqlite  -> '.cache.sqlite' fajl kao i do sada (default)
+#   memory  -> LRU u memoriji procesa, ogranicen na WEATHER_MEMORY_CACHE_SIZE odgovora
+#   redis   -> deljen izmedju svih procesa, koristi isti redis-praksa server
+
+import os
+import threading
+
+import requests_cache
+import openmeteo_requests
+from requests.adapters import HTTPAdapter
+from requests_cache.backends.base import BaseCache, DictStorage
+from urllib3 import Retry
+
+
+WEATHER_CACHE_SECONDS = 60 * 15         # 15 min, koliko traje jedan minutely_15 slot
+
+WEATHER_CACHE_BACKEND = os.getenv("WEATHER_CACHE_BACKEND", "sqlite").lower()
+WEATHER_MEMORY_CACHE_SIZE = int(os.getenv("WEATHER_MEMORY_CACHE_SIZE", "1024"))
+
+# Koliko keep-alive konekcija ka api.open-meteo.com drzimo, pool_block=True znaci da ce greenlet sacekati slobodnu konekciju
+# umesto da otvori novu koja se posle baca (gevent worker ima --concurrency=5 pa je 10 dovoljno)
+WEATHER_HTTP_POOL_SIZE = int(os.getenv("WEATHER_HTTP_POOL_SIZE", "10"))
+WEATHER_HTTP_RETRIES = 5
+WEATHER_HTTP_BACKOFF = 0.2
+WEATHER_HTTP_TIMEOUT_SECONDS = 10
+
+
+class LRUDictStorage(DictStorage):
+    """
+    In-memory storage za requests_cache koji cuva najvise max_size odgovora, izbacuje najstariji koriscen.
+    Bez ovoga memory backend raste neograniceno posto se istekli odgovori brisu tek kada se ponovo zatraze.
+    """
+
+    def __init__(self, max_size: int, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            item = self.data.pop(key)           # KeyError se propagira isto kao kod dict-a
+            self.data[key] = item               # pomeramo na kraj -> najskorije koriscen
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self.data.pop(key, None)
+            self.data[key] = value
+            while len(self.data) > self.max_size:
+                self.data.pop(next(iter(self.data)))
+
+
+def _redis_connection():
+    """Posebna konekcija za HTTP cache jer requests_cache cuva pickle bajtove (extensions.redis_client ima decode_responses=True)."""
+    import redis
+
+    return redis.StrictRedis(
+        host=os.getenv("REDIS_HOST", "redis-praksa"),
+        port=int(os.getenv("REDIS_PORT", "6379")),
+        password=os.getenv("REDIS_PASSWORD"),
+    )
+
+
+def _build_cache_backend(backend_name: str):
+    if backend_name == "memory":
+        backend = BaseCache(cache_name="weather_http_cache")
+        backend.responses = LRUDictStorage(WEATHER_MEMORY_CACHE_SIZE)
+        return backend
+    if backend_name == "redis":
+        return requests_cache.RedisCache(namespace="weather_http_cache", connection=_redis_connection())
+    if backend_name == "sqlite":
+        return requests_cache.SQLiteCache('.cache')
+
+    raise ValueError(f"Unknown WEATHER_CACHE_BACKEND '{backend_name}', expected one of: sqlite, memory, redis")
+
+
+class _WeatherSession(requests_cache.CachedSession):
+    """requests nema globalni timeout, a greenlet koji visi na API-u blokira ceo shard."""
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", WEATHER_HTTP_TIMEOUT_SECONDS)
+        return super().request(method, url, *args, **kwargs)
+
+
+def _build_session(backend_name: str) -> requests_cache.CachedSession:
+    session = _WeatherSession(backend=_build_cache_backend(backend_name), expire_after=WEATHER_CACHE_SECONDS)
+
+    adapter = HTTPAdapter(
+        max_retries=Retry(
+            total=WEATHER_HTTP_RETRIES,
+            read=WEATHER_HTTP_RETRIES,
+            connect=WEATHER_HTTP_RETRIES,
+            backoff_factor=WEATHER_HTTP_BACKOFF,
+            status_forcelist=(500, 502, 504),
+            allowed_methods=None,
+        ),
+        pool_connections=1,                     # saljemo samo na jedan host
+        pool_maxsize=WEATHER_HTTP_POOL_SIZE,
+        pool_block=True,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_weather_client() -> openmeteo_requests.Client:
+    """
+    Vraca Open-Meteo klijent koji deli ceo proces, pravi ga pri prvom pozivu.
+    Ako je proces fork-ovan (gunicorn/celery prefork) posle pravljenja klijenta, dete pravi svoj jer se socket-i ne smeju deliti izmedju procesa.
+    """
+    global _client, _client_pid
+
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = openmeteo_requests.Client(session=_build_session(WEATHER_CACHE_BACKEND))
+            _client_pid = os.getpid()
+        return _client
+
+
+def reset_weather_client():
+    """Zatvara session i brise klijent, sledeci get_weather_client pravi novi (npr. posle promene konfiguracije)."""
+    global _client, _client_pid
+
+    with _client_lock:
+        if _client is not None:
+            _client._session.close()
+        _client = None
+        _client_pid = None
@@ -0,0 +1,426 @@
+#Service/WeatherService.py
+# Sloj za dohvatanje vremenskih podataka sa Open-Meteo API-a za live metering.
+#
+# Ranije je get_live_irradiance slao user_id u parametrima da bi svaki user imao svoj cache, pa je svaki user pravio svoj HTTP poziv
+# cak i kada komsije imaju iste koordinate, tilt i azimut. Ovde se koordinate "snap-uju" na celiju grid-a i kljuc je (celija, tilt, azimut)
+# tako da svi user-i na istoj lokaciji dele jedan poziv (i jedan requests_cache unos) u 15 min prozoru.
+# Ako vise greenlet-a/thread-ova istovremeno trazi isti kljuc, samo prvi ide do API-a a ostali cekaju njegov rezultat (single-flight).
+#
+# Umesto jednog slota (forecast_minutely_15=1) za svaku lokaciju se uzima cela prognoza za WEATHER_FORECAST_SLOTS slotova (default 48h)
+# i cuva kao kompaktan niz (SiteForecast). Trenutni slot se cita iz niza po indeksu pa live metering tick skoro nikad ne zove API.
+# Prognoza se drzi na dva mesta:
+#   - u memoriji procesa (_forecasts), najbrze, bez mreze
+#   - u Redis-u pod weather_forecast:{lat}:{lon}:{tilt}:{azimut}, da bi Flask app i svi celery workeri delili jedan Open-Meteo poziv
+# Prognoza je "sveza" WEATHER_FORECAST_REFRESH_SECONDS (Open-Meteo modeli se osvezavaju otprilike na sat), a refresh_site_forecasts
+# (celery beat) je osvezava u pozadini pre nego sto istekne, tako da tick-ovi ne cekaju na API.
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    from .WeatherClient import get_weather_client, WEATHER_CACHE_SECONDS
+except ImportError:                     # modul ucitan direktno (unittest iz Backend/Service foldera), bez paketa
+    from WeatherClient import get_weather_client, WEATHER_CACHE_SECONDS
+
+
+MINUTELY_15_VARIABLES = ["global_tilted_irradiance_instant", "temperature_2m", "is_day"]
+
+# Velicina celije grid-a u stepenima, 0.05° je ~5.5 km po sirini sto je manje od rezolucije Open-Meteo modela pa se preciznost ne gubi
+WEATHER_GRID_DEGREES = float(os.getenv("WEATHER_GRID_DEGREES", "0.05"))
+
+# Koliko lokacija ide u jedan multi-location zahtev (da URL ne bude predugacak)
+WEATHER_BULK_CHUNK_SIZE = int(os.getenv("WEATHER_BULK_CHUNK_SIZE", "100"))
+
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+
+# Koliko minutely_15 slotova unapred se trazi za svaku lokaciju, 192 slota = 48h
+WEATHER_FORECAST_SLOTS = int(os.getenv("WEATHER_FORECAST_SLOTS", "192"))
+
+# Koliko dugo se dohvacena prognoza koristi pre nego sto se ponovo trazi od API-a
+WEATHER_FORECAST_REFRESH_SECONDS = int(os.getenv("WEATHER_FORECAST_REFRESH_SECONDS", "3600"))
+
+# Pozadinski refresh osvezava prognoze kojima je ostalo manje od ovoliko sekundi, mora biti vece od intervala refresh task-a
+WEATHER_FORECAST_REFRESH_AHEAD_SECONDS = int(os.getenv("WEATHER_FORECAST_REFRESH_AHEAD_SECONDS", "1200"))
+
+
+def snap_to_grid(latitude: float, longitude: float, grid_degrees: float = None) -> tuple[float, float]:
+    """
+    Zaokruzuje koordinate na centar celije grid-a.
+
+    Returns:
+        tuple: (latitude, longitude) celije, zaokruzeno na 4 decimale da bi kljuc bio stabilan (bez 45.250000000001)
+    """
+    grid_degrees = grid_degrees or WEATHER_GRID_DEGREES
+    return (
+        round(round(float(latitude) / grid_degrees) * grid_degrees, 4),
+        round(round(float(longitude) / grid_degrees) * grid_degrees, 4),
+    )
+
+
+def weather_site_key(latitude: float, longitude: float, tilt, azimuth) -> tuple:
+    """
+    Kljuc lokacije za vremenske podatke: (lat_celije, lon_celije, tilt, azimut).
+    GTI zavisi od nagiba i orijentacije panela pa oni moraju biti deo kljuca.
+    """
+    cell_latitude, cell_longitude = snap_to_grid(latitude, longitude)
+    return (cell_latitude, cell_longitude, int(round(float(tilt))), int(round(float(azimuth))))
+
+
+# --- PROGNOZA ZA LOKACIJU ---
+class SiteForecast:
+    """
+    minutely_15 prognoza za jednu lokaciju: values[i] je niz vrednosti MINUTELY_15_VARIABLES[i] (float32),
+    slot j pocinje u start + j * interval (unix sekunde, UTC).
+    """
+    __slots__ = ("start", "interval", "values", "expires_at")
+
+    def __init__(self, start: int, interval: int, values, expires_at: float):
+        self.start = int(start)
+        self.interval = int(interval)
+        self.values = np.asarray(values, dtype=np.float32).reshape(len(MINUTELY_15_VARIABLES), -1)
+        self.expires_at = float(expires_at)
+
+    @property
+    def end(self) -> int:
+        """Kraj poslednjeg slota u prognozi."""
+        return self.start + self.interval * self.values.shape[1]
+
+    def slot_index(self, now: float = None) -> int:
+        """Indeks slota u kome je now, ili -1 ako je now van prognoze."""
+        now = time.time() if now is None else now
+        index = int((now - self.start) // self.interval)
+        return index if 0 <= index < self.values.shape[1] else -1
+
+    def slot_at(self, now: float = None) -> dict:
+        """Vrednosti slota u kome je now kao dict obicnih float-ova, ili None ako je now van prognoze."""
+        index = self.slot_index(now)
+        if index < 0:
+            return None
+        return dict(zip(MINUTELY_15_VARIABLES, self.values[:, index].tolist()))
+
+    def is_fresh(self, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        return now < self.expires_at and self.slot_index(now) >= 0
+
+    def needs_refresh(self, now: float = None) -> bool:
+        """True ako prognoza istice (ili je trenutni slot blizu kraja prognoze) u narednih WEATHER_FORECAST_REFRESH_AHEAD_SECONDS."""
+        now = time.time() if now is None else now
+        return now + WEATHER_FORECAST_REFRESH_AHEAD_SECONDS >= min(self.expires_at, self.end)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "start": self.start,
+            "interval": self.interval,
+            "expires_at": self.expires_at,
+            "values": [[round(float(value), 2) for value in row] for row in self.values],
+        })
+
+    @classmethod
+    def from_json(cls, raw: str) -> "SiteForecast":
+        data = json.loads(raw)
+        return cls(data["start"], data["interval"], data["values"], data["expires_at"])
+
+
+# --- KES PROGNOZA: MEMORIJA PROCESA + REDIS ---
+_forecasts = {}                             # site_key -> SiteForecast
+_forecasts_lock = threading.Lock()
+
+
+def _remember_forecasts(forecasts: dict, now: float = None):
+    now = time.time() if now is None else now
+    with _forecasts_lock:
+        _forecasts.update(forecasts)
+        for site_key in [site_key for site_key, forecast in _forecasts.items() if forecast.expires_at <= now]:
+            del _forecasts[site_key]
+
+
+def _local_forecast(site_key: tuple):
+    return _forecasts.get(site_key)
+
+
+def weather_forecast_cache_key(site_key: tuple) -> str:
+    latitude, longitude, tilt, azimuth = site_key
+    return f"weather_forecast:{latitude}:{longitude}:{tilt}:{azimuth}"
+
+
+def _shared_weather_cache():
+    """
+    Vraca redis_client iz extensions.py, ili None ako extensions nije dostupan (modul ucitan van aplikacije, npr. unittest).
+    Bez Redis-a sve radi kao i ranije, samo bez deljenja izmedju procesa.
+    """
+    try:
+        from extensions import redis_client
+    except Exception:
+        return None
+    return redis_client
+
+
+def get_cached_site_forecasts(site_keys, redis=None) -> dict:
+    """
+    Cita prognoze za vise lokacija iz Redis-a jednim MGET-om.
+
+    Returns:
+        dict: site_key -> SiteForecast, samo za lokacije koje su u Redis-u
+    """
+    redis = redis or _shared_weather_cache()
+    site_keys = list(dict.fromkeys(site_keys))
+    if redis is None or not site_keys:
+        return {}
+
+    try:
+        cached_values = redis.mget([weather_forecast_cache_key(site_key) for site_key in site_keys])
+    except Exception as e:
+        print(f"Error reading weather forecasts from Redis: {e}")
+        return {}
+
+    return {site_key: SiteForecast.from_json(raw) for site_key, raw in zip(site_keys, cached_values) if raw}
+
+
+def cache_site_forecasts(forecasts: dict, now: float = None, redis=None):
+    """Upisuje prognoze u Redis jednim pipeline-om, kljuc istice kada i prognoza (expires_at)."""
+    redis = redis or _shared_weather_cache()
+    if redis is None or not forecasts:
+        return
+
+    now = time.time() if now is None else now
+    try:
+        pipe = redis.pipeline()
+        for site_key, forecast in forecasts.items():
+            ttl = int(forecast.expires_at - now)
+            if ttl > 0:
+                pipe.setex(weather_forecast_cache_key(site_key), ttl, forecast.to_json())
+        pipe.execute()
+    except Exception as e:
+        print(f"Error writing weather forecasts to Redis: {e}")
+
+
+# --- SINGLE-FLIGHT ---
+# kljuc -> _InFlightCall, dok traje poziv za taj kljuc svi ostali pozivaoci cekaju na isti rezultat
+_in_flight = {}
+_in_flight_lock = threading.Lock()          # gevent monkey.patch_all() ga pretvara u greenlet-safe lock
+
+
+class _InFlightCall:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def single_flight(key, loader):
+    """
+    Izvrsava loader() najvise jednom istovremeno za isti kljuc.
+    Pozivaoci koji dodju dok je poziv u toku dobijaju isti rezultat (ili isti exception) bez novog poziva.
+    """
+    with _in_flight_lock:
+        call = _in_flight.get(key)
+        leader = call is None
+        if leader:
+            call = _InFlightCall()
+            _in_flight[key] = call
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = loader()
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+        call.done.set()
+
+
+# --- HTTP POZIV ---
+def _build_params(latitudes, longitudes, tilt, azimuth) -> dict:
+    """Open-Meteo prima liste koordinata odvojene zarezom, za jednu lokaciju su to obicni brojevi."""
+    return {
+        "latitude": latitudes,
+        "longitude": longitudes,
+        "minutely_15": MINUTELY_15_VARIABLES,
+        "forecast_minutely_15": WEATHER_FORECAST_SLOTS,
+        "timezone": "auto",
+        "tilt": tilt,
+        "azimuth": azimuth,
+    }
+
+
+def _decode_forecast(response, now: float = None) -> SiteForecast:
+    """
+    Iz jednog Open-Meteo odgovora pravi SiteForecast za sve minutely_15 slotove.
+    ValuesAsNumpy() bafere slaze direktno u jedan (3, n) niz, bez pandas date_range/DataFrame-a: vreme slota je start + i * interval
+    pa datumska kolona nije potrebna (bench_weather_decoder.py poredi sa starim DataFrame putem).
+
+    Returns:
+        SiteForecast, ili None ako odgovor nema podataka
+    """
+    now = time.time() if now is None else now
+    minutely_15 = response.Minutely15()
+
+    values = np.vstack([minutely_15.Variables(i).ValuesAsNumpy() for i in range(len(MINUTELY_15_VARIABLES))])
+    if values.shape[1] == 0:
+        return None
+
+    return SiteForecast(
+        start=minutely_15.Time(),
+        interval=minutely_15.Interval(),
+        values=values,
+        expires_at=min(now + WEATHER_FORECAST_REFRESH_SECONDS, minutely_15.TimeEnd()),
+    )
+
+
+def fetch_bulk_site_forecasts(site_keys, chunk_size: int = None, client=None, now: float = None) -> dict:
+    """
+    Dohvata prognoze za vise lokacija sa sto manje HTTP poziva.
+
+    Open-Meteo prima vise lokacija u jednom zahtevu (latitude=a,b,c&longitude=x,y,z) i vraca po jedan odgovor za svaku lokaciju.
+    tilt i azimut su zajednicki za ceo zahtev pa se lokacije prvo grupisu po (tilt, azimut) i onda salju u chunk-ovima.
+
+    Args:
+        site_keys: iterabla kljuceva iz weather_site_key
+        chunk_size: max broj lokacija po zahtevu (default WEATHER_BULK_CHUNK_SIZE)
+        client: openmeteo_requests.Client, moze se proslediti klijent ka lokalnom test serveru ili fake klijent sa snimljenim odgovorima
+
+    Returns:
+        dict: site_key -> SiteForecast, lokacije za koje poziv nije uspeo nisu u rezultatu
+    """
+    chunk_size = chunk_size or WEATHER_BULK_CHUNK_SIZE
+    client = client or get_weather_client()
+
+    sites_by_orientation = {}
+    for site_key in dict.fromkeys(site_keys):           # dict.fromkeys -> bez duplikata a cuva redosled
+        sites_by_orientation.setdefault((site_key[2], site_key[3]), []).append(site_key)
+
+    forecasts = {}
+
+    for (tilt, azimuth), sites in sites_by_orientation.items():
+        for start in range(0, len(sites), chunk_size):
+            chunk = sites[start:start + chunk_size]
+            params = _build_params(
+                ",".join(str(site[0]) for site in chunk),
+                ",".join(str(site[1]) for site in chunk),
+                tilt,
+                azimuth,
+            )
+
+            try:
+                responses = client.weather_api(OPEN_METEO_URL, params=params)
+            except Exception as e:
+                print(f"Error calling Open-Meteo bulk API for {len(chunk)} sites (tilt={tilt}, azimuth={azimuth}): {e}")
+                continue
+
+            # odgovori dolaze redom kojim su lokacije poslate, LocationId je indeks lokacije u zahtevu
+            for position, response in enumerate(responses):
+                location_id = response.LocationId() if hasattr(response, "LocationId") else position
+                if location_id >= len(chunk):
+                    continue
+                forecast = _decode_forecast(response, now)
+                if forecast is not None:
+                    forecasts[chunk[location_id]] = forecast
+
+    return forecasts
+
+
+# --- JAVNI API ---
+def load_site_forecasts(site_keys, refresh: bool = False, chunk_size: int = None, client=None, redis=None, now: float = None) -> dict:
+    """
+    Vraca prognoze za lokacije redom: memorija procesa -> Redis -> Open-Meteo (samo za ono sto fali, bulk zahtevima).
+    Sve sto se dohvati iz Redis-a ili API-a se pamti u memoriji, a ono sa API-a se upisuje i u Redis za ostale procese.
+
+    Args:
+        refresh: ako je True i prognoze kojima je ostalo manje od WEATHER_FORECAST_REFRESH_AHEAD_SECONDS se traze ponovo (pozadinski refresh)
+
+    Returns:
+        dict: site_key -> SiteForecast
+    """
+    now = time.time() if now is None else now
+    usable = (lambda forecast: not forecast.needs_refresh(now)) if refresh else (lambda forecast: forecast.is_fresh(now))
+
+    site_keys = list(dict.fromkeys(site_keys))
+    forecasts = {}
+    for site_key in site_keys:
+        forecast = _local_forecast(site_key)
+        if forecast is not None and usable(forecast):
+            forecasts[site_key] = forecast
+
+    missing = [site_key for site_key in site_keys if site_key not in forecasts]
+    if missing:
+        from_redis = {
+            site_key: forecast
+            for site_key, forecast in get_cached_site_forecasts(missing, redis=redis).items()
+            if usable(forecast)
+        }
+        forecasts.update(from_redis)
+        _remember_forecasts(from_redis, now)
+
+        missing = [site_key for site_key in missing if site_key not in from_redis]
+
+    if missing:
+        from_api = fetch_bulk_site_forecasts(missing, chunk_size=chunk_size, client=client, now=now)
+        cache_site_forecasts(from_api, now=now, redis=redis)
+        _remember_forecasts(from_api, now)
+        forecasts.update(from_api)
+
+    return forecasts
+
+
+def get_shared_site_weather(site_keys, chunk_size: int = None, client=None, redis=None, now: float = None) -> dict:
+    """
+    Trenutni minutely_15 slot za vise lokacija, iz prognoza koje vraca load_site_forecasts.
+
+    Returns:
+        dict: site_key -> dict trenutnog slota
+    """
+    now = time.time() if now is None else now
+    forecasts = load_site_forecasts(site_keys, chunk_size=chunk_size, client=client, redis=redis, now=now)
+
+    weather_by_site = {}
+    for site_key, forecast in forecasts.items():
+        slot = forecast.slot_at(now)
+        if slot is not None:
+            weather_by_site[site_key] = slot
+    return weather_by_site
+
+
+def refresh_site_forecasts(site_keys, chunk_size: int = None, client=None, redis=None) -> int:
+    """
+    Pozadinski refresh: ponovo dohvata prognoze koje uskoro isticu (ili ih nema), da ih tick nikad ne bi cekao.
+
+    Returns:
+        int: broj lokacija za koje prognoza postoji posle refresh-a
+    """
+    return len(load_site_forecasts(site_keys, refresh=True, chunk_size=chunk_size, client=client, redis=redis))
+
+
+def get_site_weather(latitude, longitude, tilt, azimuth) -> dict:
+    """
+    Vraca trenutni minutely_15 slot (global_tilted_irradiance_instant, temperature_2m, is_day) za lokaciju.
+    Koordinate se snap-uju na grid, slot se cita iz prognoze u memoriji/Redis-u, a ako prognoze nema
+    istovremeni pozivi za istu lokaciju se spajaju u jedan HTTP poziv.
+
+    Returns:
+        dict ili None ako API nije dostupan
+    """
+    site_key = weather_site_key(latitude, longitude, tilt, azimuth)
+
+    forecast = _local_forecast(site_key)
+    if forecast is None or not forecast.is_fresh():
+        try:
+            forecast = single_flight(site_key, lambda: load_site_forecasts([site_key]).get(site_key))
+        except Exception as e:
+            print(f"Error calling Open-Meteo API for site {site_key}: {e}")
+            return None
+
+    return forecast.slot_at() if forecast is not None else None
@@ -1,8 +1,19 @@
 #Praksa/Service/__init__.py
+from .CacheCodec import *
+from .LocalCache import *
+from .InvalidationBus import *
 from .UserService import *
 from .BatteryService import *
 from .SolarSystemService import *
 from .UpdateService import *
 from .IoTService import *
 from .SimulationService import *
+from .LiveDelta import *
+from .EnergyAccumulator import *
+from .EnergyHistory import *
+from .CacheRepository import *
+from .UserContext import *
+from .UserContextService import *
+from .EnergyHistoryService import *
+from .WeatherService import *
 from .LiveMeteringWebSocket import *
\ No newline at end of file
@@ -0,0 +1,86 @@
+#Service/bench_cache_codec.py
+# Benchmark cache codec-a: vreme encode/decode i velicina vrednosti po kljucu za N user-a (default 10k).
+# Za svakog user-a se prave isti unosi kao u Redis-u: user:, solar_system:, battery:, user_iot_devices: (5 uredjaja) i live_metering_data:.
+#
+# Pokretanje iz Backend/Service foldera:
+#   python bench_cache_codec.py [broj_user-a]
+# Velicina je duzina kodirane vrednosti, Redis dodaje jos svoj overhead po kljucu (isti za oba codec-a).
+
+import random
+import sys
+import time
+
+from CacheCodec import CACHE_CODECS, decode_cache_value, msgpack
+
+
+def _entries_for_user(user_id: int, rng: random.Random) -> dict:
+    now = time.time()
+    system_id = user_id + 100000
+    battery_id = user_id + 200000
+    return {
+        "user": {
+            "user_id": user_id, "username": f"user{user_id}", "email": f"user{user_id}@example.com", "user_type": "regular",
+            "house_size_sqm": round(rng.uniform(40, 250), 2), "num_household_members": rng.randint(1, 6),
+            "latitude": round(rng.uniform(42, 46), 6), "longitude": round(rng.uniform(19, 23), 6),
+            "registration_date": now - rng.randint(0, 10**7), "last_cached_at": now,
+        },
+        "solar_system": {
+            "system_id": system_id, "user_id": user_id, "battery_id": battery_id, "system_name": f"System {user_id}",
+            "system_type": "grid_tied_hybrid", "total_panel_wattage_wp": float(rng.randint(3000, 15000)),
+            "inverter_capacity_kw": float(rng.randint(3, 12)), "base_consumption_kw": round(rng.uniform(0.2, 1.5), 2),
+            "tilt_degrees": rng.randint(0, 60), "azimuth_degrees": rng.randint(90, 270), "approved": 1, "last_cached_at": now,
+        },
+        "battery": {
+            "battery_id": battery_id, "system_id": system_id, "model_name": "Powerwall 2", "capacity_kwh": 13.5,
+            "max_charge_rate_kw": 5.0, "max_discharge_rate_kw": 5.0, "efficiency": 0.9, "manufacturer": "Tesla",
+            "current_charge_percentage": round(rng.uniform(0, 100), 2), "last_cached_at": now,
+        },
+        "iot_devices": {
+            "user_id": user_id, "solar_system_id": system_id, "last_cached_at": now,
+            "devices": [
+                {"device_id": user_id * 10 + i, "user_id": user_id, "system_id": system_id, "device_name": f"Device {i}",
+                 "device_type": "appliance", "base_consumption_watts": float(rng.randint(5, 3000)),
+                 "priority_level": rng.choice(["critical", "medium", "low"]), "current_status": rng.choice(["on", "off"])}
+                for i in range(5)
+            ],
+        },
+        "live_payload": {
+            "timestamp": "2026-01-01T12:00:00+00:00", "user_id": user_id,
+            "solar_production_kw": round(rng.uniform(0, 10), 2), "household_consumption_kw": round(rng.uniform(0, 5), 2),
+            "battery_charge_percentage": round(rng.uniform(0, 100), 2), "battery_flow_kw": round(rng.uniform(-5, 5), 2),
+            "global_tilted_irradiance_instant": round(rng.uniform(0, 900), 2), "grid_contribution_kw": round(rng.uniform(-5, 5), 2),
+            "current_temperature_c": round(rng.uniform(-5, 35), 1), "battery_loss_kw": 0.05, "is_day": True, "alarm_user": None,
+        },
+    }
+
+
+def _redis_bytes(value) -> bytes:
+    """Redis cuva bajtove, str se salje kao utf-8 isto kao u redis-py."""
+    return value if isinstance(value, bytes) else value.encode("utf-8")
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rng = random.Random(0)
+    dataset = [_entries_for_user(user_id, rng) for user_id in range(1, users + 1)]
+    kinds = list(dataset[0])
+
+    codecs = [codec for name, codec in CACHE_CODECS.items() if name != "msgpack" or msgpack is not None]
+    print(f"{users} users, {len(kinds)} keys per user")
+    print(f"{'codec':<8} {'key':<14} {'encode us':>10} {'decode us':>10} {'bytes/key':>10} {'MB total':>9}")
+
+    for codec in codecs:
+        for kind in kinds:
+            values = [entry[kind] for entry in dataset]
+
+            started = time.perf_counter()
+            encoded = [_redis_bytes(codec.encode(value)) for value in values]
+            encode_us = (time.perf_counter() - started) / users * 1e6
+
+            started = time.perf_counter()
+            for raw in encoded:
+                decode_cache_value(raw)
+            decode_us = (time.perf_counter() - started) / users * 1e6
+
+            total_bytes = sum(len(raw) for raw in encoded)
+            print(f"{codec.name:<8} {kind:<14} {encode_us:10.2f} {decode_us:10.2f} {total_bytes / users:10.1f} {total_bytes / 1e6:9.2f}")
@@ -0,0 +1,109 @@
+#Service/bench_weather_decoder.py
+# Micro-benchmark: stari pandas put (date_range + DataFrame + iloc[0]) naspram direktnog dekodera iz WeatherService.
+#
+# Pokretanje iz Backend/Service foldera:
+#   python bench_weather_decoder.py [broj_slotova] [broj_ponavljanja]
+# pandas treba samo za stari put, WeatherService ga vise ne ucitava.
+
+import sys
+import time
+import timeit
+
+import numpy as np
+
+from WeatherService import MINUTELY_15_VARIABLES, _decode_forecast
+
+
+class _Variable:
+    def __init__(self, values):
+        self.values = values
+
+    def ValuesAsNumpy(self):
+        return self.values
+
+
+class _Minutely15:
+    def __init__(self, slots, start, interval=900):
+        rng = np.random.default_rng(0)
+        self.variables = [
+            _Variable(rng.uniform(0, 900, slots).astype(np.float32)),
+            _Variable(rng.uniform(-5, 35, slots).astype(np.float32)),
+            _Variable(rng.integers(0, 2, slots).astype(np.float32)),
+        ]
+        self.start = start
+        self.interval = interval
+        self.slots = slots
+
+    def Variables(self, index):
+        return self.variables[index]
+
+    def Time(self):
+        return self.start
+
+    def TimeEnd(self):
+        return self.start + self.interval * self.slots
+
+    def Interval(self):
+        return self.interval
+
+
+class _Response:
+    def __init__(self, slots):
+        self.minutely_15 = _Minutely15(slots, int(time.time() // 900) * 900)
+
+    def Minutely15(self):
+        return self.minutely_15
+
+    def UtcOffsetSeconds(self):
+        return 7200
+
+
+def legacy_dataframe_slot(response) -> dict:
+    """Isti kod koji je get_live_irradiance koristio pre WeatherService-a."""
+    import pandas as pd
+
+    minutely_15 = response.Minutely15()
+    offset = pd.Timedelta(seconds=response.UtcOffsetSeconds())
+
+    minutely_15_dataframe = pd.DataFrame(data={
+        "date": pd.date_range(
+            start=pd.to_datetime(minutely_15.Time(), unit="s", utc=False) + offset,
+            end=pd.to_datetime(minutely_15.TimeEnd(), unit="s", utc=False) + offset,
+            freq=pd.Timedelta(seconds=minutely_15.Interval()),
+            inclusive="left"
+        ),
+        **{name: minutely_15.Variables(i).ValuesAsNumpy() for i, name in enumerate(MINUTELY_15_VARIABLES)},
+    })
+
+    current_slot = minutely_15_dataframe.iloc[0]
+    return {name: float(current_slot[name]) for name in MINUTELY_15_VARIABLES}
+
+
+def array_decoder_slot(response) -> dict:
+    return _decode_forecast(response).slot_at()
+
+
+def _report(name, timer, repeat):
+    best = min(timer.repeat(repeat=5, number=repeat)) / repeat
+    print(f"{name:<40} {best * 1e6:10.2f} us/call")
+    return best
+
+
+if __name__ == "__main__":
+    slots = int(sys.argv[1]) if len(sys.argv) > 1 else 192
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    response = _Response(slots)
+    forecast = _decode_forecast(response)
+
+    print(f"{slots} minutely_15 slots, best of 5 x {repeat} calls")
+    array_time = _report("array decoder + slot lookup", timeit.Timer(lambda: array_decoder_slot(response)), repeat)
+    _report("slot lookup on stored forecast", timeit.Timer(lambda: forecast.slot_at()), repeat)
+
+    try:
+        assert legacy_dataframe_slot(response) == array_decoder_slot(response)
+    except ImportError:
+        print("pandas nije instaliran, preskacem stari DataFrame put")
+    else:
+        legacy_time = _report("pandas DataFrame + iloc[0] (stari put)", timeit.Timer(lambda: legacy_dataframe_slot(response)), repeat)
+        print(f"array decoder je {legacy_time / array_time:.0f}x brzi")
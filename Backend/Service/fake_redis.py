@@ -0,0 +1,111 @@
+#Service/fake_redis.py
+# Redis u memoriji za unittest-ove iz Backend/Service foldera (nije test modul, samo ga testovi importuju).
+# Samo komande koje servisi zaista koriste, sa istom semantikom kao Redis (delete brise kljuc bilo kog tipa, pipeline izvrsava tek na execute).
+# Lua skripte se ne izvrsavaju: test registruje python funkciju za skriptu u scripts[lua], register_script je vraca.
+
+
+class FakePipeline:
+    """Pamti komande i izvrsava ih redom na execute, vraca listu rezultata kao redis-py."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.strings = {}
+        self.hashes = {}
+        self.sets = {}
+        self.zsets = {}
+        self.ttls = {}
+        self.deleted = []           # svi kljucevi prosledjeni delete-u, redom
+        self.scripts = {}           # lua izvor -> python funkcija (args=..., client=...)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def register_script(self, lua):
+        return self.scripts.get(lua)
+
+    # --- kljucevi ---
+    def delete(self, *keys):
+        self.deleted.extend(keys)
+        removed = 0
+        for key in keys:
+            for store in (self.strings, self.hashes, self.sets, self.zsets):
+                if store.pop(key, None) is not None:
+                    removed += 1
+            self.ttls.pop(key, None)
+        return removed
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+        return True
+
+    # --- string-ovi ---
+    def get(self, key):
+        return self.strings.get(key)
+
+    def mget(self, keys):
+        return [self.strings.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.strings[key] = value
+        if ex is not None:
+            self.ttls[key] = ex
+        return True
+
+    def setex(self, key, ttl, value):
+        return self.set(key, value, ex=ttl)
+
+    # --- hash-evi ---
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        fields = dict(mapping or {})
+        if field is not None:
+            fields[field] = value
+        self.hashes.setdefault(key, {}).update(fields)
+        return len(fields)
+
+    def hsetnx(self, key, field, value):
+        bucket = self.hashes.setdefault(key, {})
+        if field in bucket:
+            return 0
+        bucket[field] = value
+        return 1
+
+    def hincrbyfloat(self, key, field, amount):
+        bucket = self.hashes.setdefault(key, {})
+        bucket[field] = str(float(bucket.get(field, 0.0)) + float(amount))
+        return float(bucket[field])
+
+    # --- set-ovi i sorted set-ovi ---
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+        return len(members)
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+        return len(mapping)
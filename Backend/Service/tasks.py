@@ -3,14 +3,17 @@
 from gevent import monkey
 monkey.patch_all()
 
-from celery_app import celery
+from celery_app import celery, LIVE_METERING_INTERVAL_SECONDS, LIVE_METERING_SHARDS, LIVE_METERING_UNWATCHED_INTERVAL_SECONDS
+from celery import chord
+from celery.signals import worker_shutdown
 import redis, os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-from extensions import redis_client
+from extensions import redis_client, get_active_users_from_redis, get_watched_user_ids
 # Connect to Redis
 # redis_client = redis.StrictRedis(
 #     host="redis-praksa",
@@ -32,29 +35,221 @@ from flask_socketio import SocketIO as SocketIOEmitter
 socketio_emitter = SocketIOEmitter(message_queue=redis_url, cors_allowed_origins="*")
 
 
+def shard_user_ids(user_ids, shard_count):
+    """
+    Deli user_id-eve na shard-ove po user_id % shard_count (hash particionisanje).
+    Isti user uvek zavrsi u istom shard-u pa se njegovi tick-ovi nikad ne izvrsavaju paralelno sami sa sobom.
+
+    Returns:
+        list[list[int]]: lista duzine shard_count, prazni shard-ovi su prazne liste
+    """
+    shard_count = max(1, int(shard_count))
+    shards = [[] for _ in range(shard_count)]
+    for user_id in user_ids:
+        shards[int(user_id) % shard_count].append(int(user_id))
+    return shards
+
+
 @celery.task
 def update_all_users_live_data():
+    """
+    Beat task (svakih LIVE_METERING_INTERVAL_SECONDS), ne racuna nista sam vec samo podeli aktivne user-e na shard-ove
+    i pokrene chord: svaki shard je zaseban update_live_data_shard task koji gevent worker izvrsava istovremeno,
+    a summarize_live_data_tick na kraju skupi koliko je svaki shard trajao.
+
+    Racuna se samo za user-e koji imaju ziv socket (live_subscriber_sessions) i jos su u registru active_users. Ako je LIVE_METERING_UNWATCHED_INTERVAL_SECONDS > 0,
+    jednom u tom intervalu tick ukljuci i aktivne user-e koje niko ne gleda, da bi im se stanje baterije i dalje vodilo.
+    """
+    registered_users = get_active_users_from_redis()
+    # presek sa registrom: user koji je izlogovan ili istekao se ne racuna i ako je neka konekcija ostala u setu
+    watched_users = get_watched_user_ids().intersection(registered_users)
+    active_users = sorted(watched_users)
+
+    # SET NX EX: samo jedan tick u intervalu (i samo jedan beat/worker) dobije "slow" krug za user-e koje niko ne gleda
+    if LIVE_METERING_UNWATCHED_INTERVAL_SECONDS > 0 and redis_client.set(
+        "live_metering:unwatched_tick", "1", nx=True, ex=LIVE_METERING_UNWATCHED_INTERVAL_SECONDS
+    ):
+        unwatched_users = [user_id for user_id in registered_users if user_id not in watched_users]
+        active_users.extend(unwatched_users)
+        print(f"Including {len(unwatched_users)} unwatched users in this tick")
+
+    print(f"Updating {len(active_users)} users' live data ({len(watched_users)} watched)...")
+
+    if not active_users:
+        return "No active users"
+
+    shards = shard_user_ids(active_users, LIVE_METERING_SHARDS)
+    tick_started_at = time.time()
+
+    # Jedan bulk weather fetch za sve razlicite lokacije umesto po jedan HTTP poziv po user-u, rezultat se deli shard-ovima
+    weather_by_user = {}
+    try:
+        from Backend.Service.LiveMeteringWebSocket import prefetch_weather_for_users
+        weather_by_user = prefetch_weather_for_users(active_users)
+    except Exception as e:
+        print(f"⚠️ Weather prefetch failed, shards will fetch per user: {e}")
+
+    header = [
+        update_live_data_shard.s(
+            shard_index,
+            shard_user_ids_list,
+            {str(user_id): weather_by_user[str(user_id)] for user_id in shard_user_ids_list if str(user_id) in weather_by_user},
+        )
+        for shard_index, shard_user_ids_list in enumerate(shards)
+        if shard_user_ids_list
+    ]
+    chord(header)(summarize_live_data_tick.s(tick_started_at))
+
+    return f"Dispatched {len(header)} shards for {len(active_users)} users"
+
+
+@celery.task
+def update_live_data_shard(shard_index, user_ids, weather_by_user=None):
+    """
+    Racuna i emituje live podatke za jedan shard user-a: priprema ulaza je serijska, a simulacija za ceo shard je
+    jedan simulate_batch poziv (calculate_and_emit_live_data_batch).
+    weather_by_user (str(user_id) -> slot) dolazi iz bulk prefetch-a, user-i kojih nema u njemu sami dohvataju weather.
+
+    Returns:
+        dict: kratak rezime shard-a (broj user-a, greske, trajanje) koji chord prosledjuje summarize_live_data_tick
+    """
     # Lazy import to avoid loading MySQL/Flask at worker start
     try:
-        from Backend.Service.LiveMeteringWebSocket import calculate_and_emit_live_data
+        from Backend.Service.LiveMeteringWebSocket import calculate_and_emit_live_data_batch
+    except ModuleNotFoundError:
+        print("LiveMeteringWebSocket module not found, skipping task.")
+        return {"shard": shard_index, "users": len(user_ids), "errors": len(user_ids), "duration_s": 0.0}
+
+    started = time.perf_counter()
+    print(f"[shard {shard_index}] Updating data for {len(user_ids)} users")
+
+    try:
+        errors = calculate_and_emit_live_data_batch([int(user_id) for user_id in user_ids], socketio_emitter, weather_by_user)
+    except Exception as e:
+        errors = len(user_ids)
+        print(f"⚠️ Error updating shard {shard_index}: {e}")
+
+    return {
+        "shard": shard_index,
+        "users": len(user_ids),
+        "errors": errors,
+        "duration_s": round(time.perf_counter() - started, 3),
+    }
+
+
+@celery.task
+def summarize_live_data_tick(shard_results, tick_started_at):
+    """
+    Chord callback: ispisuje per-shard trajanje jednog tick-a i upozorava ako je ceo tick duzi od beat intervala.
+    """
+    tick_duration_s = round(time.time() - tick_started_at, 3)
+    shard_results = sorted(shard_results, key=lambda result: result["shard"])
+
+    for result in shard_results:
+        print(f"[tick] shard {result['shard']}: {result['users']} users, {result['errors']} errors, {result['duration_s']}s")
+
+    slowest = max(shard_results, key=lambda result: result["duration_s"])
+    print(f"[tick] {len(shard_results)} shards done in {tick_duration_s}s (slowest shard {slowest['shard']}: {slowest['duration_s']}s)")
+
+    if tick_duration_s > LIVE_METERING_INTERVAL_SECONDS:
+        print(f"⚠️ Live metering tick took {tick_duration_s}s, longer than the {LIVE_METERING_INTERVAL_SECONDS}s beat interval")
+
+    # zbirni cache hit/miss (svi procesi) iz CacheRepository
+    # "simulation" su tick-ovi preskoceni jer su ulazi bili isti kao u prethodnom (hits = preskoceno, misses = izracunato)
+    cache_stats = {}
+    simulation_stats = None
+    try:
+        from Backend.Service.CacheRepository import GetCacheStatsService
+        cache_stats = GetCacheStatsService()
+        simulation_stats = cache_stats.pop("simulation", None)
+        print("[tick] cache hit rate: " + ", ".join(f"{name} {stats['hit_rate']}" for name, stats in sorted(cache_stats.items())))
+        if simulation_stats:
+            print(f"[tick] simulation skip rate: {simulation_stats['hit_rate']} ({simulation_stats['hits']} skipped, {simulation_stats['misses']} calculated)")
+    except Exception as e:
+        print(f"Failed to read cache stats: {e}")
+
+    return {
+        "tick_duration_s": tick_duration_s,
+        "shards": shard_results,
+        "cache": cache_stats,
+        "simulation": simulation_stats,
+    }
+
+
+@celery.task
+def refresh_weather_forecasts():
+    """
+    Beat task (svakih WEATHER_REFRESH_INTERVAL_SECONDS): osvezava minutely_15 prognoze za lokacije aktivnih user-a
+    pre nego sto isteknu, tako da live metering tick cita trenutni slot iz prognoze i ne zove Open-Meteo.
+    """
+    active_users = get_active_users_from_redis()
+
+    if not active_users:
+        return "No active users"
+
+    try:
+        from Backend.Service.LiveMeteringWebSocket import refresh_weather_forecasts_for_users
     except ModuleNotFoundError:
         print("LiveMeteringWebSocket module not found, skipping task.")
-        return
+        return "Skipped"
 
+    refreshed = refresh_weather_forecasts_for_users(active_users)
+    return f"Weather forecasts ready for {refreshed} sites"
 
-    user_keys = redis_client.keys("user:*")
-    active_users = [key.split(":")[1] for key in user_keys]
 
-    print(f"Updating {len(active_users)} users' live data...")
+@celery.task
+def flush_battery_state():
+    """
+    Beat task (svakih BATTERY_FLUSH_INTERVAL_SECONDS): upisuje u MySQL baterije cije se stanje u Redis-u promenilo
+    bar za BATTERY_SOC_FLUSH_THRESHOLD od poslednjeg upisa.
+    """
+    try:
+        from Backend.Service.UpdateService import FlushBatteryStateService
+    except ModuleNotFoundError:
+        print("UpdateService module not found, skipping task.")
+        return "Skipped"
+
+    flushed = FlushBatteryStateService()
+    return f"Flushed {flushed} batteries"
 
-    for user_id in active_users:
-        try:
-            print(f"Updating data for user_id:{int(user_id)}")
-            calculate_and_emit_live_data(int(user_id),socketio_emitter)
-        except Exception as e:
-            print(f"⚠️ Error updating user {user_id}: {e}")
 
-    return "Live data updated successfully"
-    # socketio_emitter.emit("test_event", {"ping": "pong"}, namespace="/")
-    # print("✅ Test event emitted through Redis SocketIO emitter.")
-    # return "Test emit done"
+@celery.task
+def flush_energy_hours():
+    """
+    Beat task (svakih ENERGY_FLUSH_INTERVAL_SECONDS): upisuje zatvorene sate iz Redis akumulatora (EnergyAccumulator)
+    u user_hourly_energy_data.
+    """
+    try:
+        from Backend.Service.EnergyAccumulator import FlushClosedEnergyHoursService
+    except ModuleNotFoundError:
+        print("EnergyAccumulator module not found, skipping task.")
+        return "Skipped"
+
+    flushed = FlushClosedEnergyHoursService()
+    return f"Flushed {flushed} hourly energy rows"
+
+
+@celery.task
+def rollup_daily_energy():
+    """
+    Beat task (svakih ENERGY_ROLLUP_INTERVAL_SECONDS): preracunava user_daily_energy_summary za dane ciji su se sati promenili
+    od poslednjeg rollup-a.
+    """
+    try:
+        from Backend.Service.EnergyAccumulator import RollupDailyEnergyService
+    except ModuleNotFoundError:
+        print("EnergyAccumulator module not found, skipping task.")
+        return "Skipped"
+
+    rolled_up = RollupDailyEnergyService()
+    return f"Rolled up {rolled_up} daily energy summaries"
+
+
+@worker_shutdown.connect
+def flush_battery_state_on_shutdown(**kwargs):
+    """Pri gasenju worker-a upisuje svaku razliku (bez praga) da baza ne bi ostala iza Redis-a posle deploy-a/restarta."""
+    try:
+        from Backend.Service.UpdateService import FlushBatteryStateService
+        FlushBatteryStateService(force=True)
+    except Exception as e:
+        print(f"⚠️ Battery state flush on shutdown failed, state stays in Redis until the next flush: {e}")
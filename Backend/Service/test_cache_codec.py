@@ -0,0 +1,63 @@
+#Service/test_cache_codec.py
+import json
+import unittest
+
+from CacheCodec import *
+
+
+BATTERY_CACHE = {
+    "battery_id": 7,
+    "system_id": 3,
+    "model_name": "Powerwall 2",
+    "capacity_kwh": 13.5,
+    "efficiency": 0.9,
+    "current_charge_percentage": 45.25,
+    "manufacturer": None,
+}
+
+
+class TestCacheCodec(unittest.TestCase):
+
+    def test_round_trip_for_every_codec(self):
+        for name in CACHE_CODECS:
+            codec = get_cache_codec(name)
+            encoded = codec.encode(BATTERY_CACHE)
+            # redis-py vraca bajtove sa binarnog klijenta
+            raw = encoded if isinstance(encoded, bytes) else encoded.encode("utf-8")
+            self.assertEqual(decode_cache_value(raw), BATTERY_CACHE, name)
+
+    def test_old_json_entries_are_still_readable(self):
+        legacy = json.dumps(BATTERY_CACHE)
+        self.assertEqual(decode_cache_value(legacy), BATTERY_CACHE)
+        self.assertEqual(decode_cache_value(legacy.encode("utf-8")), BATTERY_CACHE)
+
+    def test_missing_key(self):
+        self.assertIsNone(decode_cache_value(None))
+
+    def test_msgpack_is_smaller_than_json(self):
+        self.assertLess(len(MsgpackCodec.encode(BATTERY_CACHE)), len(JsonCodec.encode(BATTERY_CACHE)))
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_cache_codec("xml")
+
+
+class TestHashFields(unittest.TestCase):
+
+    def test_round_trip_keeps_types(self):
+        mapping = encode_hash_fields(BATTERY_CACHE)
+        # redis-py HGETALL sa binarnog klijenta vraca bajtove i za polja i za vrednosti
+        raw = {field.encode("utf-8"): value.encode("utf-8") for field, value in mapping.items()}
+        self.assertEqual(decode_hash_fields(raw), BATTERY_CACHE)
+
+    def test_flat_list_from_lua(self):
+        raw = [b"device_id", b"5", b"current_status", b'"off"']
+        self.assertEqual(decode_hash_fields(raw), {"device_id": 5, "current_status": "off"})
+
+    def test_missing_hash(self):
+        self.assertIsNone(decode_hash_fields({}))
+        self.assertIsNone(decode_hash_fields([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
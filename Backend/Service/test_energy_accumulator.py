@@ -0,0 +1,151 @@
+#Service/test_energy_accumulator.py
+import unittest
+from datetime import date, datetime, timedelta, timezone
+
+import EnergyAccumulator
+from EnergyAccumulator import *
+from fake_redis import FakeRedis
+
+
+HOUR = 1_760_000_400 // 3600 * 3600
+
+
+class EnergyRedis(FakeRedis):
+    """Deljeni fake Redis, claim skripta je ista logika kao _CLAIM_ENERGY_BUCKETS_LUA."""
+
+    def __init__(self):
+        super().__init__()
+        self.scripts[EnergyAccumulator._CLAIM_ENERGY_BUCKETS_LUA] = self._claim
+
+    def _claim(self, args, client=None):
+        max_hour, limit = float(args[0]), int(args[1])
+        buckets = self.zsets.get(ENERGY_BUCKETS_KEY, {})
+        members = sorted((member for member, hour in buckets.items() if hour <= max_hour), key=buckets.get)[:limit]
+        result = []
+        for member in members:
+            fields = self.hashes.pop(f"{ENERGY_BUCKET_KEY_PREFIX}{member}", {})
+            result.append(member)
+            result.append([item for field, value in fields.items() for item in (field, value)])
+            del buckets[member]
+        return result
+
+    def add_bucket(self, user_id, hour, **values):
+        member = f"{user_id}:{hour}"
+        for field, value in values.items():
+            self.hincrbyfloat(f"{ENERGY_BUCKET_KEY_PREFIX}{member}", field, value)
+        self.zadd(ENERGY_BUCKETS_KEY, {member: hour})
+
+
+class TestSplitPowerFlows(unittest.TestCase):
+
+    def test_import_and_battery_charge(self):
+        flows = split_power_flows({
+            "solar_production_kw": 3.0, "household_consumption_kw": 1.5, "grid_contribution_kw": 0.5, "battery_flow_kw": 2.0,
+        })
+        self.assertEqual(flows["grid_import_kwh"], 0.5)
+        self.assertEqual(flows["grid_export_kwh"], 0.0)
+        self.assertEqual(flows["battery_charge_kwh"], 2.0)
+        self.assertEqual(flows["battery_discharge_kwh"], 0.0)
+
+    def test_export_and_battery_discharge(self):
+        flows = split_power_flows({"grid_contribution_kw": -1.25, "battery_flow_kw": -0.75})
+        self.assertEqual(flows["grid_import_kwh"], 0.0)
+        self.assertEqual(flows["grid_export_kwh"], 1.25)
+        self.assertEqual(flows["battery_charge_kwh"], 0.0)
+        self.assertEqual(flows["battery_discharge_kwh"], 0.75)
+
+    def test_missing_and_negative_values_are_zero(self):
+        flows = split_power_flows({"solar_production_kw": -0.1, "household_consumption_kw": None})
+        self.assertEqual(set(flows), set(HOURLY_ENERGY_COLUMNS))
+        self.assertTrue(all(value == 0.0 for value in flows.values()))
+
+
+class TestFlushClosedEnergyHours(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = EnergyRedis()
+        self.redis.add_bucket(7, HOUR, solar_production_kwh=1.5, grid_import_kwh=0.25)
+        self.redis.add_bucket(7, HOUR + 3600, solar_production_kwh=0.5)         # jos otvoren sat
+        self.now = HOUR + 3600 + ENERGY_FLUSH_GRACE_SECONDS + 1
+
+    def test_flush_claims_only_closed_hours(self):
+        written = []
+        flushed = FlushClosedEnergyHoursService(now=self.now, redis=self.redis, upsert=written.extend)
+
+        self.assertEqual(flushed, 1)
+        self.assertEqual(written[0]["user_id"], 7)
+        self.assertEqual(written[0]["record_datetime"], datetime.fromtimestamp(HOUR, tz=timezone.utc).replace(tzinfo=None))
+        self.assertEqual(written[0]["solar_production_kwh"], 1.5)
+        self.assertEqual(written[0]["grid_import_kwh"], 0.25)
+        self.assertEqual(written[0]["battery_charge_kwh"], 0.0)
+        self.assertEqual(list(self.redis.zsets[ENERGY_BUCKETS_KEY]), [f"7:{HOUR + 3600}"])
+        self.assertEqual(self.redis.deleted, [f"energy_history:7:hour:{HOUR // 86400 * 86400}"])      # chunk istorije za taj dan
+
+    def test_failed_upsert_restores_buckets(self):
+        def failing_upsert(rows):
+            self.redis.add_bucket(7, HOUR, solar_production_kwh=0.125)           # zakasneli uzorak dok je upis trajao
+            raise RuntimeError("db down")
+
+        with self.assertRaises(RuntimeError):
+            FlushClosedEnergyHoursService(now=self.now, redis=self.redis, upsert=failing_upsert)
+
+        self.assertEqual(self.redis.zsets[ENERGY_BUCKETS_KEY][f"7:{HOUR}"], HOUR)
+        restored = self.redis.hashes[f"{ENERGY_BUCKET_KEY_PREFIX}7:{HOUR}"]
+        self.assertEqual(float(restored["solar_production_kwh"]), 1.625)
+        self.assertEqual(float(restored["grid_import_kwh"]), 0.25)
+        self.assertNotIn("battery_charge_kwh", restored)                          # nule se ne vracaju
+        self.assertEqual(self.redis.deleted, [])
+
+
+class TestRollupDailyEnergy(unittest.TestCase):
+
+    DB_NOW = datetime(2026, 3, 2, 12, 0)
+    USER_DAYS = [(1, date(2026, 3, 1)), (2, date(2026, 3, 1)), (1, date(2026, 2, 28))]
+
+    def setUp(self):
+        self.redis = EnergyRedis()
+        self.since = []
+        self.batches = []
+        self._batch_size = EnergyAccumulator.ENERGY_ROLLUP_BATCH
+        EnergyAccumulator.ENERGY_ROLLUP_BATCH = 2
+
+    def tearDown(self):
+        EnergyAccumulator.ENERGY_ROLLUP_BATCH = self._batch_size
+
+    def get_changed(self, since):
+        self.since.append(since)
+        return list(self.USER_DAYS), self.DB_NOW
+
+    def test_without_watermark_rolls_up_everything(self):
+        rolled_up = RollupDailyEnergyService(redis=self.redis, get_changed=self.get_changed, rollup=self.batches.append)
+
+        self.assertEqual(rolled_up, 3)
+        self.assertEqual(self.since, [None])                                    # pun prolaz
+        self.assertEqual(self.batches, [self.USER_DAYS[:2], self.USER_DAYS[2:]])
+        self.assertEqual(self.redis.get(ENERGY_ROLLUP_WATERMARK_KEY), self.DB_NOW.isoformat())
+        self.assertIn(f"energy_history:1:day:{int(datetime(2026, 2, 1, tzinfo=timezone.utc).timestamp())}", self.redis.deleted)
+
+    def test_watermark_is_read_with_lag(self):
+        self.redis.set(ENERGY_ROLLUP_WATERMARK_KEY, "2026-03-02T11:00:00")
+
+        RollupDailyEnergyService(redis=self.redis, get_changed=self.get_changed, rollup=self.batches.append)
+
+        self.assertEqual(self.since, [datetime(2026, 3, 2, 11, 0, 0) - timedelta(seconds=ENERGY_ROLLUP_LAG_SECONDS)])
+
+    def test_failed_batch_keeps_watermark(self):
+        self.redis.set(ENERGY_ROLLUP_WATERMARK_KEY, "2026-03-02T11:00:00")
+
+        def rollup(batch):
+            if self.batches:
+                raise RuntimeError("db down")
+            self.batches.append(batch)
+
+        with self.assertRaises(RuntimeError):
+            RollupDailyEnergyService(redis=self.redis, get_changed=self.get_changed, rollup=rollup)
+
+        self.assertEqual(self.batches, [self.USER_DAYS[:2]])
+        self.assertEqual(self.redis.get(ENERGY_ROLLUP_WATERMARK_KEY), "2026-03-02T11:00:00")  # sledeci rollup ponavlja iste dane
+
+
+if __name__ == '__main__':
+    unittest.main()
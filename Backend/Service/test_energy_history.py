@@ -0,0 +1,59 @@
+#Service/test_energy_history.py
+import unittest
+from datetime import datetime, timezone
+
+from EnergyHistory import *
+
+
+COLUMNS = ("solar_production_kwh", "grid_import_kwh")
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class TestEnergyHistory(unittest.TestCase):
+
+    def test_parse_history_time(self):
+        self.assertEqual(parse_history_time("1700000000"), datetime.fromtimestamp(1700000000, tz=timezone.utc))
+        self.assertEqual(parse_history_time("2026-03-01"), utc(2026, 3, 1))
+        self.assertEqual(parse_history_time("2026-03-01T12:30:00+02:00"), utc(2026, 3, 1, 10, 30))
+        with self.assertRaises(ValueError):
+            parse_history_time("yesterday")
+
+    def test_parse_history_time_out_of_range(self):
+        """Timestamp van opsega datetime-a je los ulaz (ValueError -> 400), ne OverflowError/OSError."""
+        for value in ("1e20", "inf", "-inf", "nan", 1e20, float("inf"), -1e20):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_history_time(value)
+
+    def test_auto_resolution_by_span(self):
+        self.assertEqual(select_resolution(utc(2026, 3, 1), utc(2026, 3, 8)), "hour")         # 168 sati
+        self.assertEqual(select_resolution(utc(2026, 1, 1), utc(2026, 4, 1)), "day")          # 90 dana
+        self.assertEqual(select_resolution(utc(2024, 1, 1), utc(2026, 1, 1)), "week")         # 105 nedelja
+        self.assertEqual(select_resolution(utc(2016, 1, 1), utc(2026, 1, 1), max_points=100), "month")
+
+    def test_count_buckets_partial(self):
+        self.assertEqual(count_buckets(utc(2026, 3, 1, 10, 30), utc(2026, 3, 1, 12, 15), "hour"), 3)
+        self.assertEqual(count_buckets(utc(2026, 1, 31), utc(2026, 3, 1), "month"), 2)
+
+    def test_chunks_cover_range(self):
+        chunks = chunk_ranges(utc(2026, 1, 15), utc(2026, 3, 2), "day")
+        self.assertEqual([chunk_start for chunk_start, _ in chunks], [utc(2026, 1, 1), utc(2026, 2, 1), utc(2026, 3, 1)])
+        self.assertEqual(chunks[-1][1], utc(2026, 4, 1))
+        self.assertEqual(len(chunk_ranges(utc(2026, 3, 1, 5), utc(2026, 3, 2, 1), "hour")), 2)
+
+    def test_downsample_sums_into_columns(self):
+        points = [
+            (utc(2026, 3, 2), [1.0, 0.5]),          # ponedeljak
+            (utc(2026, 3, 4), [2.0, 0.0]),
+            (utc(2026, 3, 9), [0.25, 1.125]),       # sledeci ponedeljak
+        ]
+        result = downsample(points, "week", COLUMNS)
+        self.assertEqual(result["timestamps"], [int(utc(2026, 3, 2).timestamp()), int(utc(2026, 3, 9).timestamp())])
+        self.assertEqual(result["solar_production_kwh"], [3.0, 0.25])
+        self.assertEqual(result["grid_import_kwh"], [0.5, 1.125])
+
+
+if __name__ == '__main__':
+    unittest.main()
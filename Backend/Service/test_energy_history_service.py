@@ -0,0 +1,72 @@
+#Service/test_energy_history_service.py
+import unittest
+from datetime import datetime, timezone
+
+from EnergyHistoryService import *
+from CacheCodec import encode_cache_value
+from fake_redis import FakeRedis
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def values(solar):
+    return [solar, 0.0, 0.0, 0.0, 0.0, 0.0]
+
+
+class FakeLoader:
+    """Satni redovi iz "baze" za [start, end), pamti koji opseg je trazen."""
+
+    def __init__(self, points):
+        self.points = points
+        self.calls = []
+
+    def __call__(self, user_id, source, start, end):
+        self.calls.append((source, start, end))
+        return [(moment, point_values) for moment, point_values in self.points if start <= moment < end]
+
+
+class TestEnergyHistoryService(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        # 1. mart je vec u cache-u, sa satom pre pocetka opsega koji mora biti odsecen
+        self.redis.strings[history_chunk_key(5, "hour", utc(2026, 3, 1))] = encode_cache_value({
+            "t": [int(utc(2026, 3, 1, 8).timestamp()), int(utc(2026, 3, 1, 22).timestamp())],
+            "v": [values(9.0), values(1.0)],
+        })
+        self.loader = FakeLoader([
+            (utc(2026, 3, 2, 10), values(2.0)),
+            (utc(2026, 3, 3, 6), values(3.0)),
+            (utc(2026, 3, 3, 12), values(4.0)),         # posle kraja opsega
+        ])
+
+    def history(self, now):
+        return GetEnergyHistoryService(
+            5, utc(2026, 3, 1, 20, 30), utc(2026, 3, 3, 12), resolution="hour",
+            redis=self.redis, load_points=self.loader, now=now,
+        )
+
+    def test_merges_cached_and_loaded_chunks_and_clips_range(self):
+        history = self.history(now=utc(2026, 4, 1))
+
+        self.assertEqual(self.loader.calls, [("hour", utc(2026, 3, 2), utc(2026, 3, 4))])     # jedan upit za chunk-ove koji fale
+        self.assertEqual(history["timestamps"], [
+            int(utc(2026, 3, 1, 22).timestamp()), int(utc(2026, 3, 2, 10).timestamp()), int(utc(2026, 3, 3, 6).timestamp()),
+        ])
+        self.assertEqual(history["solar_production_kwh"], [1.0, 2.0, 3.0])
+        # ucitani zavrseni chunk-ovi su upisani u cache
+        self.assertIn(history_chunk_key(5, "hour", utc(2026, 3, 2)), self.redis.strings)
+        self.assertIn(history_chunk_key(5, "hour", utc(2026, 3, 3)), self.redis.strings)
+
+    def test_open_chunk_is_not_cached(self):
+        history = self.history(now=utc(2026, 3, 3, 13))
+
+        self.assertEqual(history["solar_production_kwh"], [1.0, 2.0, 3.0])
+        self.assertIn(history_chunk_key(5, "hour", utc(2026, 3, 2)), self.redis.strings)
+        self.assertNotIn(history_chunk_key(5, "hour", utc(2026, 3, 3)), self.redis.strings)
+
+
+if __name__ == '__main__':
+    unittest.main()
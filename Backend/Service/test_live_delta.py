@@ -0,0 +1,54 @@
+#Service/test_live_delta.py
+import unittest
+
+from LiveDelta import *
+
+
+def _payload(**overrides):
+    payload = {
+        "timestamp": "2026-01-01T12:00:00+00:00",
+        "user_id": 1,
+        "solar_production_kw": 3.2,
+        "battery_charge_percentage": 55.0,
+        "alarm_user": None,
+        "iot_devices_data": [
+            {"device_id": 1, "device_name": "Frizider", "current_status": "on", "priority_level": "critical"},
+            {"device_id": 2, "device_name": "Bojler", "current_status": "on", "priority_level": "low"},
+        ],
+    }
+    payload.update(overrides)
+    return payload
+
+
+class TestLiveDelta(unittest.TestCase):
+
+    def test_only_timestamp_changed(self):
+        self.assertIsNone(compute_live_delta(_payload(), _payload(timestamp="2026-01-01T12:00:05+00:00")))
+
+    def test_changed_fields_only(self):
+        delta = compute_live_delta(_payload(), _payload(timestamp="t2", battery_charge_percentage=54.5))
+        self.assertEqual(delta, {"changes": {"timestamp": "t2", "battery_charge_percentage": 54.5}})
+
+    def test_only_changed_devices_are_sent(self):
+        current = _payload()
+        current["iot_devices_data"] = [
+            {"device_id": 1, "device_name": "Frizider", "current_status": "on", "priority_level": "critical", "last_cached_at": 123.0},
+            {"device_id": 2, "device_name": "Bojler", "current_status": "off", "priority_level": "low"},
+            {"device_id": 3, "device_name": "Klima", "current_status": "off", "priority_level": "medium"},
+        ]
+        delta = compute_live_delta(_payload(), current)
+        self.assertEqual([device["device_id"] for device in delta["iot_devices_changed"]], [2, 3])
+        self.assertNotIn("iot_devices_removed", delta)
+
+    def test_apply_round_trip(self):
+        previous = _payload()
+        current = _payload(timestamp="t2", solar_production_kw=0.0, alarm_user="Battery is bellow 25%")
+        current["iot_devices_data"] = [{"device_id": 2, "device_name": "Bojler", "current_status": "off", "priority_level": "low"}]
+
+        delta = compute_live_delta(previous, current)
+        self.assertEqual(delta["iot_devices_removed"], [1])
+        self.assertEqual(apply_live_delta(previous, delta), current)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+#Service/test_local_cache.py
+import json
+import unittest
+
+from LocalCache import *
+
+
+SOLAR_SYSTEM = {"system_id": 3, "battery_id": 7, "total_panel_wattage_wp": 5000.0, "tilt_degrees": 35}
+
+
+class TestLocalCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = LocalCache(max_entries=2, ttl_seconds=60)
+
+    def test_get_returns_copy(self):
+        self.cache.put(("solar_system", 3), SOLAR_SYSTEM, self.cache.generation)
+        cached = self.cache.get(("solar_system", 3))
+        cached["tilt_degrees"] = 0
+        self.assertEqual(self.cache.get(("solar_system", 3)), SOLAR_SYSTEM)
+
+    def test_lru_is_bounded(self):
+        generation = self.cache.generation
+        self.cache.put(("solar_system", 1), {"system_id": 1}, generation)
+        self.cache.put(("solar_system", 2), {"system_id": 2}, generation)
+        self.cache.get(("solar_system", 1))                               # 1 je sada skorije koriscen od 2
+        self.cache.put(("solar_system", 3), {"system_id": 3}, generation)
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get(("solar_system", 2)))
+        self.assertIsNotNone(self.cache.get(("solar_system", 1)))
+
+    def test_entries_expire(self):
+        self.cache.put(("battery", 7), {"battery_id": 7}, self.cache.generation, now=100.0)
+        self.assertIsNotNone(self.cache.get(("battery", 7), now=159.0))
+        self.assertIsNone(self.cache.get(("battery", 7), now=160.0))
+
+    def test_value_read_before_invalidation_is_not_stored(self):
+        generation = self.cache.generation
+        self.cache.invalidate(("solar_system", 3))                        # stigla invalidacija dok smo citali iz Redis-a
+        self.assertFalse(self.cache.put(("solar_system", 3), SOLAR_SYSTEM, generation))
+        self.assertIsNone(self.cache.get(("solar_system", 3)))
+
+    def test_invalidation_message(self):
+        generation = local_cache.generation
+        local_cache.put(("solar_system", 3), SOLAR_SYSTEM, generation)
+        local_cache.put(("battery", 7), {"battery_id": 7}, generation)
+        local_cache.put(("battery", 8), {"battery_id": 8}, generation)
+
+        # promena baterije 7 ne dira solarni sistem ni druge baterije
+        apply_cache_invalidation(json.dumps({"entities": ["battery", "iot_devices", "live_metering_data"], "user_id": 1, "system_id": 3, "battery_id": 7}))
+        self.assertIsNone(local_cache.get(("battery", 7)))
+        self.assertIsNotNone(local_cache.get(("battery", 8)))
+        self.assertIsNotNone(local_cache.get(("solar_system", 3)))
+
+        apply_cache_invalidation(json.dumps({"entities": ["solar_system", "battery"], "user_id": 1, "system_id": 3, "battery_id": None}))
+        self.assertIsNone(local_cache.get(("solar_system", 3)))
+
+if __name__ == '__main__':
+    unittest.main()
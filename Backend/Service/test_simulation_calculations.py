@@ -238,5 +238,203 @@ class TestSolarSimulationCalculations(unittest.TestCase):
         self.assertAlmostEqual(grid_contribution, 1.1, places=2)
 
 
+class TestBatchSimulationMatchesScalar(unittest.TestCase):
+    """
+    Batch (NumPy) funkcije moraju davati iste rezultate kao skalarne za iste scenarije kao gore.
+    Koristimo isti setUp kao TestSolarSimulationCalculations da bi konfiguracije bile iste.
+    """
+
+    setUp = TestSolarSimulationCalculations.setUp
+
+    weather_cases = [
+        {"global_tilted_irradiance_instant": 800.0, "temperature_2m": 25.0, "is_day": 1},
+        {"global_tilted_irradiance_instant": 150.0, "temperature_2m": 15.0, "is_day": 1},
+        {"global_tilted_irradiance_instant": 0.0, "temperature_2m": 10.0, "is_day": 0},
+        {"global_tilted_irradiance_instant": 1000.0, "temperature_2m": 25.0, "is_day": 1},
+        {"global_tilted_irradiance_instant": 1000.0, "temperature_2m": 45.0, "is_day": 1},
+        {"global_tilted_irradiance_instant": 600.0, "temperature_2m": 30.0, "is_day": 0},
+    ]
+
+    def test_solar_production_batch_matches_scalar(self):
+        configs = [self.solar_system_config, dict(self.solar_system_config, total_panel_wattage_wp=10000.0)]
+        rows = [(config, weather) for config in configs for weather in self.weather_cases]
+
+        batch = calculate_solar_production_batch(
+            [config["total_panel_wattage_wp"] for config, _ in rows],
+            [config["inverter_capacity_kw"] for config, _ in rows],
+            [weather["global_tilted_irradiance_instant"] for _, weather in rows],
+            [weather["temperature_2m"] for _, weather in rows],
+            [weather["is_day"] for _, weather in rows],
+        )
+
+        for i, (config, weather) in enumerate(rows):
+            self.assertAlmostEqual(batch[i], calculate_solar_production(config, weather), places=9)
+
+    def test_household_consumption_batch_matches_scalar(self):
+        device_lists = [self.iot_devices_data_all_off, self.iot_devices_data_some_on, self.iot_devices_data_all_on, []]
+
+        batch = calculate_household_consumption_batch(
+            [self.solar_system_config["base_consumption_kw"]] * len(device_lists),
+            sum_active_iot_watts(device_lists),
+        )
+
+        for i, devices in enumerate(device_lists):
+            self.assertAlmostEqual(batch[i], calculate_household_consumption(self.solar_system_config, devices), places=9)
+
+    def test_battery_charge_batch_matches_scalar(self):
+        cases = [(50.0, 2.0), (50.0, -2.0), (100.0, 5.0), (0.0, -5.0), (50.0, 10.0), (99.9, 3.0), (0.5, -3.0)]
+
+        new_percentage, actual_flow, battery_loss_kw = update_battery_charge_batch(
+            [True] * len(cases),
+            [self.battery_config["capacity_kwh"]] * len(cases),
+            [percentage for percentage, _ in cases],
+            [self.battery_config["max_charge_rate_kw"]] * len(cases),
+            [self.battery_config["max_discharge_rate_kw"]] * len(cases),
+            [self.battery_config["efficiency"]] * len(cases),
+            [net_power for _, net_power in cases],
+            self.time_step_hours,
+        )
+
+        for i, (percentage, net_power) in enumerate(cases):
+            battery_config_test = dict(self.battery_config, current_charge_percentage=percentage)
+            expected = update_battery_charge(battery_config_test, net_power, self.time_step_hours)
+            self.assertAlmostEqual(new_percentage[i], expected[0], places=9)
+            self.assertAlmostEqual(actual_flow[i], expected[1], places=9)
+            self.assertAlmostEqual(battery_loss_kw[i], expected[2], places=9)
+
+    def test_battery_charge_batch_without_battery(self):
+        """Redovi bez baterije vracaju nule kao i update_battery_charge(None, ...)."""
+        new_percentage, actual_flow, battery_loss_kw = update_battery_charge_batch(
+            [False, True], [0.0, 0.0], [0.0, 40.0], [0.0, 3.0], [0.0, 4.0], [1.0, 0.9], [2.0, 2.0], self.time_step_hours
+        )
+        expected_none = update_battery_charge(None, 2.0, self.time_step_hours)
+        expected_zero_capacity = update_battery_charge(dict(self.battery_config, capacity_kwh=0.0), 2.0, self.time_step_hours)
+
+        self.assertEqual((new_percentage[0], actual_flow[0], battery_loss_kw[0]), expected_none)
+        self.assertEqual((new_percentage[1], actual_flow[1], battery_loss_kw[1]), expected_zero_capacity)
+
+    def test_battery_charge_batch_idle(self):
+        """Kada je net_power_kw == 0 baterija ostaje na istom procentu bez protoka i gubitaka."""
+        new_percentage, actual_flow, battery_loss_kw = update_battery_charge_batch(
+            [True], [10.0], [42.0], [3.0], [4.0], [0.9], [0.0], self.time_step_hours
+        )
+        self.assertAlmostEqual(new_percentage[0], 42.0, places=9)
+        self.assertAlmostEqual(actual_flow[0], 0.0, places=9)
+        self.assertAlmostEqual(battery_loss_kw[0], 0.0, places=9)
+
+    def test_simulate_batch_matches_scalar_pipeline(self):
+        """Ceo lanac kao u calculate_and_emit_live_data (sa zaokruzivanjem na 2 decimale) za vise user-a odjednom."""
+        users = [
+            (self.solar_system_config, self.weather_cases[0], self.iot_devices_data_all_off, self.battery_config),
+            (self.solar_system_config, self.weather_cases[1], self.iot_devices_data_all_on, dict(self.battery_config, current_charge_percentage=20.0)),
+            (self.solar_system_config, self.weather_cases[2], self.iot_devices_data_some_on, dict(self.battery_config, current_charge_percentage=100.0)),
+            (self.solar_system_config, self.weather_cases[4], self.iot_devices_data_some_on, None),
+        ]
+
+        result = simulate_batch(
+            solar_configs={
+                "total_panel_wattage_wp": [config["total_panel_wattage_wp"] for config, _, _, _ in users],
+                "inverter_capacity_kw": [config["inverter_capacity_kw"] for config, _, _, _ in users],
+                "base_consumption_kw": [config["base_consumption_kw"] for config, _, _, _ in users],
+            },
+            weather={
+                "global_tilted_irradiance_instant": [weather["global_tilted_irradiance_instant"] for _, weather, _, _ in users],
+                "temperature_2m": [weather["temperature_2m"] for _, weather, _, _ in users],
+                "is_day": [weather["is_day"] for _, weather, _, _ in users],
+            },
+            iot_consumption_watts=sum_active_iot_watts([devices for _, _, devices, _ in users]),
+            battery_configs={
+                "has_battery": [battery is not None for _, _, _, battery in users],
+                "capacity_kwh": [(battery or {}).get("capacity_kwh", 0.0) for _, _, _, battery in users],
+                "current_charge_percentage": [(battery or {}).get("current_charge_percentage", 0.0) for _, _, _, battery in users],
+                "max_charge_rate_kw": [(battery or {}).get("max_charge_rate_kw", 0.0) for _, _, _, battery in users],
+                "max_discharge_rate_kw": [(battery or {}).get("max_discharge_rate_kw", 0.0) for _, _, _, battery in users],
+                "efficiency": [(battery or {}).get("efficiency", 1.0) for _, _, _, battery in users],
+            },
+            time_step_hours=self.time_step_hours,
+            decimals=2,
+        )
+
+        for i, (config, weather, devices, battery) in enumerate(users):
+            production = round(calculate_solar_production(config, weather), 2)
+            consumption = round(calculate_household_consumption(config, devices), 2)
+            net_power = round(production - consumption, 2)
+            percentage, flow, loss = update_battery_charge(battery, net_power, self.time_step_hours)
+            percentage, flow, loss = round(percentage, 2), round(flow, 2), round(loss, 2)
+            grid = calculate_grid_contribution(production, consumption, flow, loss)
+
+            self.assertAlmostEqual(result["solar_production_kw"][i], production, places=9)
+            self.assertAlmostEqual(result["household_consumption_kw"][i], consumption, places=9)
+            self.assertAlmostEqual(result["battery_charge_percentage"][i], percentage, places=9)
+            self.assertAlmostEqual(result["battery_flow_kw"][i], flow, places=9)
+            self.assertAlmostEqual(result["battery_loss_kw"][i], loss, places=9)
+            self.assertAlmostEqual(result["grid_contribution_kw"][i], grid, places=9)
+
+    def test_simulate_users_batch_rows_match_scalar(self):
+        """Shard tick: isti dict-ovi kao skalarni lanac, rezultat po user-u kao float-ovi."""
+        users = [
+            (self.solar_system_config, self.weather_cases[1], self.iot_devices_data_all_on, dict(self.battery_config, current_charge_percentage=20.0)),
+            (self.solar_system_config, self.weather_cases[4], [], None),
+        ]
+
+        rows = simulate_users_batch(users, self.time_step_hours, decimals=2)
+
+        self.assertEqual(len(rows), 2)
+        for row, (config, weather, devices, battery) in zip(rows, users):
+            production = round(calculate_solar_production(config, weather), 2)
+            consumption = round(calculate_household_consumption(config, devices), 2)
+            percentage, flow, loss = update_battery_charge(battery, round(production - consumption, 2), self.time_step_hours)
+
+            self.assertIsInstance(row["battery_charge_percentage"], float)
+            self.assertAlmostEqual(row["solar_production_kw"], production, places=9)
+            self.assertAlmostEqual(row["household_consumption_kw"], consumption, places=9)
+            self.assertAlmostEqual(row["battery_charge_percentage"], round(percentage, 2), places=9)
+            self.assertAlmostEqual(row["battery_flow_kw"], round(flow, 2), places=9)
+        self.assertEqual(simulate_users_batch([], self.time_step_hours), [])
+
+    def test_simulate_users_batch_skips_null_inputs(self):
+        """NULL kolona (baterija, IoT uredjaj) ne sme postati NaN: taj user dobija None i racuna se skalarnim lancem, ostali normalno."""
+        good = (self.solar_system_config, self.weather_cases[1], self.iot_devices_data_all_on, dict(self.battery_config))
+        users = [
+            (self.solar_system_config, self.weather_cases[1], [], dict(self.battery_config, max_charge_rate_kw=None)),
+            good,
+            (self.solar_system_config, self.weather_cases[1], [{"current_status": "on", "base_consumption_watts": None}], None),
+        ]
+
+        rows = simulate_users_batch(users, self.time_step_hours, decimals=2)
+
+        self.assertIsNone(rows[0])
+        self.assertIsNone(rows[2])
+        self.assertEqual(rows[1], simulate_users_batch([good], self.time_step_hours, decimals=2)[0])
+        self.assertTrue(all(value == value for value in rows[1].values()))
+        self.assertEqual(simulate_users_batch(users[:1], self.time_step_hours), [None])
+
+
+class TestSimulationInputFingerprint(unittest.TestCase):
+
+    setUp = TestSolarSimulationCalculations.setUp
+
+    weather = {"global_tilted_irradiance_instant": 0.0, "temperature_2m": 10.0, "is_day": 0}
+
+    def fingerprint(self, battery_config=None, iot_devices_data=None, weather=None):
+        return simulation_input_fingerprint(
+            self.solar_system_config,
+            battery_config or dict(self.battery_config, current_charge_percentage=0.0),
+            self.iot_devices_data_some_on if iot_devices_data is None else iot_devices_data,
+            weather or self.weather,
+        )
+
+    def test_same_inputs_same_fingerprint(self):
+        """Nocu sa praznom baterijom tick dobija iste ulaze, redosled uredjaja i last_cached_at nisu bitni."""
+        devices = [dict(device, last_cached_at=123.0) for device in reversed(self.iot_devices_data_some_on)]
+        self.assertEqual(self.fingerprint(), self.fingerprint(iot_devices_data=devices))
+
+    def test_inputs_change_fingerprint(self):
+        base = self.fingerprint()
+        self.assertNotEqual(base, self.fingerprint(battery_config=dict(self.battery_config, current_charge_percentage=0.5)))
+        self.assertNotEqual(base, self.fingerprint(weather=dict(self.weather, temperature_2m=11.0)))
+        self.assertNotEqual(base, self.fingerprint(iot_devices_data=self.iot_devices_data_all_on))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,117 @@
+#Service/test_user_context.py
+import unittest
+from types import SimpleNamespace
+
+from UserContext import *
+from fake_redis import FakeRedis
+
+
+USER = {"user_id": 3, "username": "pera"}
+SOLAR_SYSTEM = {"system_id": 11, "battery_id": 21}
+BATTERY = {"battery_id": 21, "current_charge_percentage": 40.0}
+DEVICES = [{"device_id": 31, "device_name": "bojler"}]
+
+
+class FakeStore:
+    """Loader-i iz "baze" i upisi u cache kao CacheRepository, pamti sta je ucitano."""
+
+    def __init__(self, solar_system=None, battery=None, iot_devices=()):
+        self.data = {"user": USER, "solar_system": solar_system, "battery": battery, "iot_devices": list(iot_devices)}
+        self.loaded = []
+        self.battery_soc_key = "battery_soc"
+        self.battery_soc_persisted_key = "battery_soc_persisted"
+
+    def _loader(name):
+        def load(self, entity_id):
+            self.loaded.append(name)
+            return self.data[name]
+        return load
+
+    load_user = _loader("user")
+    load_solar_system = _loader("solar_system")
+    load_battery = _loader("battery")
+    load_iot_devices = _loader("iot_devices")
+
+    def write_user_cache(self, pipe, user_data):
+        pipe.set(f"user:{user_data['user_id']}", "user")
+
+    def write_solar_system_cache(self, pipe, user_id, solar_system_data):
+        pipe.set(f"user_solar_system_id:{user_id}", solar_system_data["system_id"])
+        pipe.set(f"solar_system:{solar_system_data['system_id']}", "solar_system")
+
+    def write_battery_cache(self, pipe, battery_id, battery_data, system_id=None):
+        pipe.hset(f"battery:{battery_id}", mapping=battery_data)
+        pipe.set(f"solar_system_battery_id:{system_id}", battery_id)
+
+    def write_no_solar_system_cache(self, pipe, user_id):
+        pipe.set(f"user_solar_system_id:{user_id}", 0)
+
+    def write_iot_devices_cache(self, pipe, user_id, devices):
+        pipe.sadd(f"user_iot_devices:{user_id}", *([device["device_id"] for device in devices] or [0]))
+
+
+class TestUserContext(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+
+    def cached_context(self, **fields):
+        context = empty_user_context(USER["user_id"])
+        context.update(user=dict(USER), **fields)
+        return context
+
+    def fill(self, context, store, battery_soc=None, iot_devices_cache=None):
+        return fill_user_context(context, battery_soc, iot_devices_cache, store, self.redis.pipeline(transaction=False))
+
+    def test_user_without_solar_system_does_not_need_db(self):
+        context = self.cached_context(no_solar_system=True)
+
+        self.assertFalse(context_needs_db(context, iot_devices_cache=[]))
+        self.assertTrue(context_needs_db(context, iot_devices_cache=None))          # uredjaji i dalje mogu da fale
+
+    def test_fill_user_without_solar_system_loads_only_missing_devices(self):
+        store = FakeStore(iot_devices=DEVICES)
+        context = self.fill(self.cached_context(no_solar_system=True), store)
+
+        self.assertEqual(store.loaded, ["iot_devices"])
+        self.assertIsNone(context["solar_system"])
+        self.assertIsNone(context["battery"])
+        self.assertEqual(context["iot_devices"], DEVICES)
+        self.assertEqual(self.redis.smembers("user_iot_devices:3"), {31})
+
+    def test_missing_solar_system_is_negative_cached(self):
+        store = FakeStore()
+        context = self.fill(self.cached_context(), store)
+
+        self.assertEqual(store.loaded, ["solar_system", "iot_devices"])
+        self.assertTrue(context["no_solar_system"])
+        self.assertEqual(self.redis.get("user_solar_system_id:3"), 0)
+        self.assertEqual(self.redis.smembers("user_iot_devices:3"), {0})             # ni uredjaja, i to se pamti
+        self.assertFalse(context_needs_db(context, iot_devices_cache=context["iot_devices"]))
+
+    def test_missing_battery_needs_db(self):
+        context = self.cached_context(solar_system=dict(SOLAR_SYSTEM), system_id=11)
+
+        self.assertTrue(context_needs_db(context, iot_devices_cache=[]))
+        self.assertFalse(context_needs_db(dict(context, solar_system={"system_id": 11, "battery_id": None}), iot_devices_cache=[]))
+
+    def test_loaded_battery_takes_state_from_soc_store(self):
+        self.redis.hset("battery_soc", 21, "55.5")                                   # tick je vec pomerio stanje
+        store = FakeStore(battery=dict(BATTERY))
+        context = self.fill(self.cached_context(solar_system=dict(SOLAR_SYSTEM), system_id=11), store, iot_devices_cache=[])
+
+        self.assertEqual(store.loaded, ["battery"])
+        self.assertEqual(context["battery_id"], 21)
+        self.assertEqual(context["battery"]["current_charge_percentage"], 55.5)
+        self.assertEqual(self.redis.hget("battery_soc_persisted", 21), 40.0)
+
+    def test_without_load_from_db_nothing_is_loaded(self):
+        store = FakeStore(iot_devices=DEVICES)
+        context = fill_user_context(empty_user_context(3), None, None, store, self.redis.pipeline(), load_from_db=False)
+
+        self.assertEqual(store.loaded, [])
+        self.assertIsNone(context["user"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,225 @@
+#Service/test_weather_service.py
+import threading
+import time
+import unittest
+
+import numpy as np
+
+import WeatherService
+from WeatherService import *
+from fake_redis import FakeRedis
+
+
+class FakeVariable:
+    def __init__(self, values):
+        self.values = np.array(values, dtype=np.float32)
+
+    def ValuesAsNumpy(self):
+        return self.values
+
+
+class FakeMinutely15:
+    def __init__(self, gti, temperature, is_day, start=1_760_000_000, interval=900):
+        self.variables = [FakeVariable(gti), FakeVariable(temperature), FakeVariable(is_day)]
+        self.start = start
+        self.interval = interval
+
+    def Variables(self, index):
+        return self.variables[index]
+
+    def Time(self):
+        return self.start
+
+    def TimeEnd(self):
+        return self.start + self.interval * len(self.variables[0].values)
+
+    def Interval(self):
+        return self.interval
+
+
+FORECAST_START = int(time.time() // 900) * 900          # pocetak trenutnog 15 min slota
+
+
+class FakeResponse:
+    """Snimljen Open-Meteo odgovor za jednu lokaciju (ista polja koja citamo iz WeatherApiResponse), GTI raste za 1 po slotu."""
+
+    def __init__(self, location_id, gti, temperature=20.0, is_day=1.0, slots=8):
+        self.location_id = location_id
+        self.minutely_15 = FakeMinutely15(
+            [gti + i for i in range(slots)], [temperature] * slots, [is_day] * slots, start=FORECAST_START
+        )
+
+    def LocationId(self):
+        return self.location_id
+
+    def Minutely15(self):
+        return self.minutely_15
+
+    def UtcOffsetSeconds(self):
+        return 7200
+
+
+class FakeOpenMeteoClient:
+    """Vraca po jedan odgovor za svaku lokaciju iz zahteva, GTI = latitude da bi mogli da proverimo mapiranje."""
+
+    def __init__(self):
+        self.requests = []
+
+    def weather_api(self, url, params):
+        self.requests.append(dict(params))
+        latitudes = [float(value) for value in str(params["latitude"]).split(",")]
+        return [FakeResponse(location_id, latitude) for location_id, latitude in enumerate(latitudes)]
+
+
+class TestWeatherSiteKey(unittest.TestCase):
+
+    def test_neighbours_share_site_key(self):
+        """Dve kuce na par stotina metara sa istim panelima dele istu lokaciju."""
+        self.assertEqual(weather_site_key(45.2671, 19.8335, 30, 180), weather_site_key(45.2649, 19.8351, 30, 180))
+
+    def test_orientation_is_part_of_site_key(self):
+        self.assertNotEqual(weather_site_key(45.2671, 19.8335, 30, 180), weather_site_key(45.2671, 19.8335, 35, 180))
+        self.assertNotEqual(weather_site_key(45.2671, 19.8335, 30, 180), weather_site_key(45.2671, 19.8335, 30, 90))
+
+    def test_snap_to_grid(self):
+        self.assertEqual(snap_to_grid(45.2671, 19.8335, 0.05), (45.25, 19.85))
+        self.assertEqual(snap_to_grid(45.2671, 19.8335, 0.1), (45.3, 19.8))
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_callers_share_one_call(self):
+        calls = []
+        release = threading.Event()
+
+        def loader():
+            calls.append(1)
+            release.wait(1)
+            return {"global_tilted_irradiance_instant": 500.0}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(single_flight(("site",), loader))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 8)
+
+    def test_error_is_not_cached(self):
+        def failing_loader():
+            raise RuntimeError("API down")
+
+        with self.assertRaises(RuntimeError):
+            single_flight(("site",), failing_loader)
+        self.assertEqual(single_flight(("site",), lambda: 1), 1)
+
+
+class TestBulkSiteForecasts(unittest.TestCase):
+
+    def test_bulk_maps_responses_back_to_sites(self):
+        sites = [
+            weather_site_key(45.25, 19.85, 30, 180),
+            weather_site_key(44.80, 20.45, 30, 180),
+            weather_site_key(43.30, 21.90, 35, 180),
+            weather_site_key(45.25, 19.85, 30, 180),      # duplikat ne sme praviti novi zahtev
+        ]
+        client = FakeOpenMeteoClient()
+
+        forecasts = fetch_bulk_site_forecasts(sites, client=client)
+
+        # jedan zahtev po orijentaciji (30/180 i 35/180)
+        self.assertEqual(len(client.requests), 2)
+        self.assertEqual(client.requests[0]["latitude"], "45.25,44.8")
+        self.assertEqual(client.requests[0]["forecast_minutely_15"], WEATHER_FORECAST_SLOTS)
+        self.assertEqual(len(forecasts), 3)
+        for site in sites:
+            slot = forecasts[site].slot_at(FORECAST_START)
+            self.assertAlmostEqual(slot["global_tilted_irradiance_instant"], site[0], places=3)
+            self.assertEqual(slot["is_day"], 1.0)
+
+    def test_bulk_respects_chunk_size(self):
+        sites = [weather_site_key(40.0 + i * 0.1, 20.0, 30, 180) for i in range(7)]
+        client = FakeOpenMeteoClient()
+
+        forecasts = fetch_bulk_site_forecasts(sites, chunk_size=3, client=client)
+
+        self.assertEqual(len(client.requests), 3)
+        self.assertEqual(len(forecasts), 7)
+
+
+class TestSiteForecast(unittest.TestCase):
+
+    def setUp(self):
+        self.forecast = SiteForecast(FORECAST_START, 900, [[100.0, 200.0, 300.0], [10.0, 11.0, 12.0], [1.0, 1.0, 0.0]], FORECAST_START + 2700)
+
+    def test_slot_lookup_by_index(self):
+        self.assertEqual(self.forecast.slot_at(FORECAST_START + 899)["global_tilted_irradiance_instant"], 100.0)
+        self.assertEqual(self.forecast.slot_at(FORECAST_START + 900)["temperature_2m"], 11.0)
+        self.assertEqual(self.forecast.slot_at(FORECAST_START + 1800)["is_day"], 0.0)
+
+    def test_outside_horizon(self):
+        self.assertIsNone(self.forecast.slot_at(FORECAST_START - 1))
+        self.assertIsNone(self.forecast.slot_at(FORECAST_START + 2700))
+        self.assertFalse(self.forecast.is_fresh(FORECAST_START + 2700))
+
+    def test_array_decoder(self):
+        forecast = WeatherService._decode_forecast(FakeResponse(0, 100.0, slots=4))
+        self.assertEqual(forecast.values.shape, (3, 4))
+        self.assertEqual(forecast.start, FORECAST_START)
+        self.assertEqual(forecast.slot_at(FORECAST_START + 3 * 900)["global_tilted_irradiance_instant"], 103.0)
+        self.assertIsNone(WeatherService._decode_forecast(FakeResponse(0, 100.0, slots=0)))
+
+    def test_json_round_trip(self):
+        restored = SiteForecast.from_json(self.forecast.to_json())
+        self.assertEqual(restored.slot_at(FORECAST_START + 900), self.forecast.slot_at(FORECAST_START + 900))
+        self.assertEqual(restored.expires_at, self.forecast.expires_at)
+
+
+class TestForecastStore(unittest.TestCase):
+
+    def setUp(self):
+        WeatherService._forecasts.clear()
+        self.site = weather_site_key(45.25, 19.85, 30, 180)
+        self.other_site = weather_site_key(44.80, 20.45, 30, 180)
+
+    def tearDown(self):
+        WeatherService._forecasts.clear()
+
+    def test_current_slot_is_served_without_new_calls(self):
+        client = FakeOpenMeteoClient()
+
+        for slot in range(4):
+            weather_by_site = get_shared_site_weather([self.site], client=client, now=FORECAST_START + slot * 900)
+            self.assertAlmostEqual(weather_by_site[self.site]["global_tilted_irradiance_instant"], self.site[0] + slot, places=3)
+
+        self.assertEqual(len(client.requests), 1)
+
+    def test_other_process_reads_forecast_from_redis(self):
+        redis = FakeRedis()
+        client = FakeOpenMeteoClient()
+        load_site_forecasts([self.site], client=client, redis=redis, now=FORECAST_START)
+
+        WeatherService._forecasts.clear()           # drugi proces nema nista u memoriji
+        weather_by_site = get_shared_site_weather([self.site, self.other_site], client=client, redis=redis, now=FORECAST_START)
+
+        self.assertEqual(len(client.requests), 2)
+        self.assertEqual(client.requests[1]["latitude"], "44.8")
+        self.assertEqual(len(weather_by_site), 2)
+        self.assertEqual(redis.ttls[weather_forecast_cache_key(self.site)], WEATHER_FORECAST_REFRESH_SECONDS)
+
+    def test_refresh_only_refetches_expiring_forecasts(self):
+        client = FakeOpenMeteoClient()
+        load_site_forecasts([self.site], client=client, now=FORECAST_START)
+
+        refresh_site_forecasts([self.site], client=client)
+        self.assertEqual(len(client.requests), 1)
+
+        WeatherService._forecasts[self.site].expires_at = time.time() + WEATHER_FORECAST_REFRESH_AHEAD_SECONDS - 1
+        refresh_site_forecasts([self.site], client=client)
+        self.assertEqual(len(client.requests), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,17 @@
 // src/api/adminApi.js
 import axiosInstance from "./axiosInstance";
 
-// Fetch all users (admin only)
-export const fetchAllUsers = async () => {
-  const response = await axiosInstance.get("/api/auth/admin_getUsers");
-  return response.data.users;
+// Fetch one page of users (admin only), keyset pagination on user_id
+// filters: { approved, system_type, min_latitude, max_latitude, min_longitude, max_longitude }, empty values are skipped
+export const fetchUsersPage = async ({ cursor = null, limit = 50, filters = {} } = {}) => {
+  const params = { limit };
+  if (cursor !== null) params.cursor = cursor;
+  Object.entries(filters).forEach(([name, value]) => {
+    if (value !== "" && value !== null && value !== undefined) params[name] = value;
+  });
+
+  const response = await axiosInstance.get("/api/auth/admin_getUsers", { params });
+  return { users: response.data.users, nextCursor: response.data.next_cursor };
 };
 
 // Update approval status
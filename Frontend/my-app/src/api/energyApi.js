@@ -0,0 +1,19 @@
+// energyApi.js
+import axiosInstance from './axiosInstance';
+
+// Energy history for charts, from/to are unix seconds or ISO strings (UTC), resolution "auto" lets the server pick by span
+// Response is columnar: { resolution, from, to, timestamps: [...], solar_production_kwh: [...], ... }
+export const fetchEnergyHistory = async ({ from, to, resolution = 'auto', maxPoints } = {}) => {
+    const params = { resolution };
+    if (from !== undefined) params.from = from;
+    if (to !== undefined) params.to = to;
+    if (maxPoints !== undefined) params.max_points = maxPoints;
+
+    try {
+        const response = await axiosInstance.get('/api/energy/history', { params });
+        return response.data;
+    } catch (error) {
+        console.error("DEBUG energyApi: Failed to fetch energy history", error.response?.data || error.message);
+        throw error;
+    }
+};
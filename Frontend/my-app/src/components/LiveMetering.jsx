@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import { io } from "socket.io-client";
 const kuca = process.env.PUBLIC_URL + "/kuca.png";
 import "./pulse.css"; // pulse animation
@@ -7,6 +7,23 @@ import { updateIotDeviceState, updateIotDevicePriority } from "../api/iotApi";
 import { toggleIotDevice, setIotDevices, updateIotDevicePriorityRedux } from "../features/authorization/authSlice";
 
 
+// Primeni live_metering_delta na poslednji snapshot (isto kao apply_live_delta na backendu)
+const applyLiveDelta = (snapshot, delta) => {
+    const devices = new Map((snapshot.iot_devices_data || []).map((device) => [device.device_id, device]));
+    (delta.iot_devices_changed || []).forEach((device) => devices.set(device.device_id, device));
+    (delta.iot_devices_removed || []).forEach((deviceId) => devices.delete(deviceId));
+
+    return {
+        ...snapshot,
+        ...delta.changes,
+        seq: delta.seq,
+        iot_devices_data: [...devices.values()].sort((a, b) => a.device_id - b.device_id),
+    };
+};
+
+// mora biti kraci od LIVE_SUBSCRIBER_TTL_SECONDS na backend-u (LIVE_SUBSCRIBER_PING_SECONDS, default 30s)
+const LIVE_METERING_PING_MS = 30000;
+
 const PRIORITY_LEVELS = [
     { value: "critical", label: "Critical" },
     { value: "medium", label: "Medium" },
@@ -23,6 +40,9 @@ export default function LiveMetering() {
 
     const [notification, setNotification] = useState({ visible: false, message: "" });
 
+    // poslednji primljeni snapshot (sa seq), delta se primenjuje samo na njega
+    const liveDataRef = useRef(null);
+
 
 
     const iotDevices = useSelector((state) => state.auth.iotDevices || []);
@@ -81,6 +101,13 @@ export default function LiveMetering() {
             setStatus("connected");
         });
 
+        // heartbeat, backend brise konekcije koje se nisu javile ~90s (live_subscriber_sessions) i prestaje da racuna za njih
+        const pingTimer = setInterval(() => {
+            if (socket.connected) {
+                socket.emit("live_metering_ping");
+            }
+        }, LIVE_METERING_PING_MS);
+
         socket.on("test_event", (data) => {
             addLog("📨 Test event received: " + JSON.stringify(data));
             console.log("Received test event:", data);
@@ -96,8 +123,24 @@ export default function LiveMetering() {
             setStatus("disconnected");
         });
 
+        const showAlarm = () => {
+            addLog("Server je zatrazio iskljucivanje svih IoT uredjaja.");
+
+            setNotification({
+                visible: true,
+                message: "All non-critical IoT devices will be turned off to conserve energy. 🔋"
+            });
+
+            // Automatically hide the notification after a few seconds
+            setTimeout(() => {
+                setNotification({ visible: false, message: "" });
+            }, 5000); // 5000 milliseconds = 5 seconds
+        };
+
+        // ceo snapshot: pri konekciji, na resync ili kada backend jos nema snapshot za user-a
         socket.on("live_metering_data", (payload) => {
-            addLog("📡 Live data received: " + JSON.stringify(payload));
+            addLog(`📡 Live snapshot received (seq ${payload.seq})`);
+            liveDataRef.current = payload;
             setLiveData(payload);
 
             if (payload.iot_devices_data) {
@@ -105,36 +148,44 @@ export default function LiveMetering() {
                 dispatch(setIotDevices(payload.iot_devices_data));
             }
 
-            //alarm za IoT da se pogase svi kojini nisi critical priority i upaljeni su
-
-            // Proveri da li postoji signal za isključivanje svih uređaja, bice None ako nema potrebe za gasenje ili ako korisnik nema IoT uredjaje ili bateriju
+            // alarm ce biti None ako nema potrebe za gasenje ili ako korisnik nema IoT uredjaje ili bateriju
             if (payload.alarm_user) {
-                addLog("Server je zatrazio iskljucivanje svih IoT uredjaja.");
-
-                setNotification({
-                    visible: true,
-                    message: "All non-critical IoT devices will be turned off to conserve energy. 🔋"
-                });
-
-                // Automatically hide the notification after a few seconds
-                setTimeout(() => {
-                    setNotification({ visible: false, message: "" });
-                }, 5000); // 5000 milliseconds = 5 seconds
-
-                // iotDevices.forEach(device => {
-                //   if (device.current_status === "on" && device.priority_level !== "critical") {
-                //     dispatch(toggleIotDevice({ deviceId: device.device_id, status: "off" }));        //u Redux-u da updejtujemo posto sam na backendu vec updejtovao
-                //     addLog(`Device ${device.device_name} turned off due to not being critical priority.`);
-                //   }
-                // });
+                showAlarm();
             }
+        });
 
+        // samo promene od prethodnog snapshot-a
+        socket.on("live_metering_delta", (delta) => {
+            const current = liveDataRef.current;
+            if (!current) {
+                return; // snapshot jos nije stigao, on ce sadrzati i ovu promenu
+            }
+            if (delta.seq <= current.seq) {
+                return; // vec primenjeno (snapshot je stigao posle ove delte)
+            }
+            if (delta.seq !== current.seq + 1) {
+                addLog(`⚠️ Missed live update (have seq ${current.seq}, got ${delta.seq}), requesting resync...`);
+                socket.emit("live_metering_resync");
+                return;
+            }
+
+            const updated = applyLiveDelta(current, delta);
+            addLog("📡 Live delta received: " + JSON.stringify(delta));
+            liveDataRef.current = updated;
+            setLiveData(updated);
 
+            if (delta.iot_devices_changed || delta.iot_devices_removed) {
+                dispatch(setIotDevices(updated.iot_devices_data));
+            }
 
+            if (delta.changes && delta.changes.alarm_user) {
+                showAlarm();
+            }
         });
 
         return () => {
             addLog("Cleaning up and disconnecting socket...");
+            clearInterval(pingTimer);
             socket.disconnect();
         };
     }, [dispatch]); // Added dispatch as dependency
@@ -1,26 +1,65 @@
-import React, { useEffect, useState } from "react";
-import { fetchAllUsers, updateUserApproval } from "../api/adminApi";
+import React, { useCallback, useEffect, useState } from "react";
+import { fetchUsersPage, updateUserApproval } from "../api/adminApi";
+
+const PAGE_SIZE = 50;
+
+const EMPTY_FILTERS = {
+  approved: "",
+  system_type: "",
+  min_latitude: "",
+  max_latitude: "",
+  min_longitude: "",
+  max_longitude: "",
+};
 
 const AdminPage = () => {
   const [users, setUsers] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [updating, setUpdating] = useState(false);
   const [expanded, setExpanded] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [filters, setFilters] = useState(EMPTY_FILTERS);            // ono sto je uneto u formu
+  const [appliedFilters, setAppliedFilters] = useState(EMPTY_FILTERS); // ono sa cime su ucitane stranice
 
-  useEffect(() => {
-    const loadUsers = async () => {
-      try {
-        const data = await fetchAllUsers();
-        setUsers(data);
-      } catch (err) {
-        console.error("Error fetching users:", err);
-      } finally {
-        setLoading(false);
-      }
-    };
-    loadUsers();
+  // ucitava stranicu posle cursor-a, cursor null = prva stranica (lista se zamenjuje)
+  const loadPage = useCallback(async (cursor, activeFilters) => {
+    try {
+      const page = await fetchUsersPage({ cursor, limit: PAGE_SIZE, filters: activeFilters });
+      setUsers((prev) => (cursor === null ? page.users : [...prev, ...page.users]));
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error("Error fetching users:", err);
+    }
   }, []);
 
+  useEffect(() => {
+    setLoading(true);
+    setExpanded(null);
+    loadPage(null, appliedFilters).finally(() => setLoading(false));
+  }, [appliedFilters, loadPage]);
+
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    await loadPage(nextCursor, appliedFilters);
+    setLoadingMore(false);
+  };
+
+  const handleFilterChange = (e) => {
+    const { name, value } = e.target;
+    setFilters((prev) => ({ ...prev, [name]: value }));
+  };
+
+  const handleApplyFilters = (e) => {
+    e.preventDefault();
+    setAppliedFilters(filters);
+  };
+
+  const handleResetFilters = () => {
+    setFilters(EMPTY_FILTERS);
+    setAppliedFilters(EMPTY_FILTERS);
+  };
+
   const handleApprovalToggle = async (user) => {
     if (!user.solar_system) {
       console.warn("User has no solar system");
@@ -63,6 +102,69 @@ const AdminPage = () => {
         🌞 Admin Dashboard
       </h1>
 
+      {/* Filters */}
+      <form
+        onSubmit={handleApplyFilters}
+        className="bg-gray-800 rounded-2xl border border-gray-700 p-4 mb-6 flex flex-wrap items-end gap-4 text-sm"
+      >
+        <label className="flex flex-col gap-1">
+          <span className="text-gray-400">Approval</span>
+          <select
+            name="approved"
+            value={filters.approved}
+            onChange={handleFilterChange}
+            className="bg-gray-700 rounded-md px-2 py-1"
+          >
+            <option value="">All</option>
+            <option value="true">Approved</option>
+            <option value="false">Pending</option>
+          </select>
+        </label>
+
+        <label className="flex flex-col gap-1">
+          <span className="text-gray-400">System type</span>
+          <select
+            name="system_type"
+            value={filters.system_type}
+            onChange={handleFilterChange}
+            className="bg-gray-700 rounded-md px-2 py-1"
+          >
+            <option value="">All</option>
+            <option value="grid_tied">Grid tied</option>
+            <option value="grid_tied_hybrid">Grid tied hybrid</option>
+          </select>
+        </label>
+
+        {["min_latitude", "max_latitude", "min_longitude", "max_longitude"].map((name) => (
+          <label key={name} className="flex flex-col gap-1">
+            <span className="text-gray-400">{name.replace("_", " ")}</span>
+            <input
+              type="number"
+              step="any"
+              name={name}
+              value={filters[name]}
+              onChange={handleFilterChange}
+              className="bg-gray-700 rounded-md px-2 py-1 w-28"
+            />
+          </label>
+        ))}
+
+        <button type="submit" className="px-4 py-1 rounded-md font-medium bg-teal-600 hover:bg-teal-700">
+          Apply
+        </button>
+        <button
+          type="button"
+          onClick={handleResetFilters}
+          className="px-4 py-1 rounded-md font-medium bg-gray-600 hover:bg-gray-700"
+        >
+          Reset
+        </button>
+      </form>
+
+      {users.length === 0 && (
+        <p className="text-gray-400 text-center">No users match the filters.</p>
+      )}
+
       {users.map((user) => {
         const approved = user.solar_system?.approved === 1;
         const isExpanded = expanded === user.user_id;
@@ -241,6 +343,18 @@ const AdminPage = () => {
           </div>
         );
       })}
+
+      {nextCursor !== null && (
+        <div className="text-center">
+          <button
+            disabled={loadingMore}
+            onClick={handleLoadMore}
+            className="px-6 py-2 rounded-md font-medium bg-teal-600 hover:bg-teal-700 disabled:opacity-60"
+          >
+            {loadingMore ? "Loading..." : "Load more"}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
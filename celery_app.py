@@ -23,11 +23,52 @@ celery.conf.update(
     imports=('Backend.Service.tasks',), 
 )
 
+# Koliko cesto beat pokrece live metering tick, tasks.py koristi ovu vrednost da proveri da li je tick prekoracio svoj interval
+LIVE_METERING_INTERVAL_SECONDS = 5
+
+# Na koliko shard-ova (user_id % N) se deli jedan tick, svaki shard je zaseban task koji gevent pool izvrsava paralelno
+# default je isti kao --concurrency=5 u docker-compose da bi svi shard-ovi mogli odjednom da se izvrse
+LIVE_METERING_SHARDS = int(os.getenv("LIVE_METERING_SHARDS", "5"))
+
+# Tick racuna samo za user-e sa otvorenim socket-om. Ako je ovo > 0, jednom u ovoliko sekundi racuna i za aktivne user-e
+# koje niko ne gleda (vodjenje stanja baterije i istorije energije u pozadini), 0 iskljucuje.
+# EnergyAccumulator cita isti env, ENERGY_MAX_SAMPLE_GAP_SECONDS mora biti >= ovoga inace istorija ima samo minute kada je neko gledao
+LIVE_METERING_UNWATCHED_INTERVAL_SECONDS = int(os.getenv("LIVE_METERING_UNWATCHED_INTERVAL_SECONDS", "60"))
+
+# Koliko cesto se osvezavaju minutely_15 prognoze, mora biti manje od WEATHER_FORECAST_REFRESH_AHEAD_SECONDS (WeatherService)
+# da bi prognoza bila osvezena pre nego sto istekne
+WEATHER_REFRESH_INTERVAL_SECONDS = int(os.getenv("WEATHER_REFRESH_INTERVAL_SECONDS", "600"))
+
+# Koliko cesto se stanje baterija iz Redis-a (write-behind) upisuje u MySQL
+BATTERY_FLUSH_INTERVAL_SECONDS = int(os.getenv("BATTERY_FLUSH_INTERVAL_SECONDS", "60"))
+
+# Koliko cesto se zatvoreni sati iz Redis akumulatora energije upisuju u user_hourly_energy_data
+ENERGY_FLUSH_INTERVAL_SECONDS = int(os.getenv("ENERGY_FLUSH_INTERVAL_SECONDS", "300"))
+
+# Koliko cesto se dnevne sume (user_daily_energy_summary) preracunavaju iz promenjenih satnih redova
+ENERGY_ROLLUP_INTERVAL_SECONDS = int(os.getenv("ENERGY_ROLLUP_INTERVAL_SECONDS", "900"))
+
 celery.conf.beat_schedule = {
     "live_metering_job": {
         # Ensure this task name matches the one registered by the import
         "task": "Backend.Service.tasks.update_all_users_live_data", 
-        "schedule": timedelta(seconds=5),
+        "schedule": timedelta(seconds=LIVE_METERING_INTERVAL_SECONDS),
+    },
+    "weather_forecast_refresh_job": {
+        "task": "Backend.Service.tasks.refresh_weather_forecasts",
+        "schedule": timedelta(seconds=WEATHER_REFRESH_INTERVAL_SECONDS),
+    },
+    "battery_state_flush_job": {
+        "task": "Backend.Service.tasks.flush_battery_state",
+        "schedule": timedelta(seconds=BATTERY_FLUSH_INTERVAL_SECONDS),
+    },
+    "energy_hourly_flush_job": {
+        "task": "Backend.Service.tasks.flush_energy_hours",
+        "schedule": timedelta(seconds=ENERGY_FLUSH_INTERVAL_SECONDS),
+    },
+    "energy_daily_rollup_job": {
+        "task": "Backend.Service.tasks.rollup_daily_energy",
+        "schedule": timedelta(seconds=ENERGY_ROLLUP_INTERVAL_SECONDS),
     },
 }
 celery.conf.timezone = 'UTC'
@@ -103,7 +103,11 @@ CREATE TABLE user_hourly_energy_data (
     battery_charge_kwh DECIMAL(10, 3) NOT NULL DEFAULT 0.000,           -- Energija napunjena u bateriju, Pazi kako ovo racunas !!!! ovo zavisi od praznjenja !
     battery_discharge_kwh DECIMAL(10, 3) NOT NULL DEFAULT 0.000,        -- praznjenje baterije
 
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,  -- dnevni rollup (user_daily_energy_summary) preracunava samo dane ciji su se sati promenili posle watermark-a
+                                                                        -- postojece baze: migrations/001_user_hourly_energy_updated_at.sql
+
     PRIMARY KEY (user_id, record_datetime),                             -- Composite PK osigurava jedinstvenost da jedan korisnik za jedan sat ima jedinsven info u ovoj tabeli, (NIJE UNIQUE u smisli kao samo 1 user_id moze da se pojavi vec kombinacija sa satom je unique)
+    KEY idx_hourly_updated_at (updated_at),                             -- za trazenje promenjenih sati u rollup-u
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
 
@@ -14,7 +14,7 @@ from dotenv import load_dotenv
 import json
 from flask_socketio import SocketIO
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import timedelta
+from datetime import timedelta, datetime
 
 
 import logging
@@ -41,6 +41,14 @@ redis_client = redis.StrictRedis(
     decode_responses=True  # Automatically decode strings da ne budu u byte-ovima
 )
 
+# Ista konekcija ali bez decode_responses, za cache vrednosti kodirane binarnim codec-om (Backend/Service/CacheCodec.py)
+redis_binary_client = redis.StrictRedis(
+    host="redis-praksa",
+    port=6379,
+    password= redis_password,
+    decode_responses=False
+)
+
 
 #  For Cellery Define the Redis URL for the SocketIO message queue
 # ------------------------------------------------------------------
@@ -88,30 +96,112 @@ def get_redis_client():
     return redis_client
 
 
+# --- REGISTAR AKTIVNIH USER-A ---
+# Sorted set active_users: member = user_id, score = kada je user poslednji put vidjen (login, /auth/me, socket connect/disconnect).
+# Zamenjuje KEYS user:* koji blokira Redis O(broj svih kljuceva) svakih 5 sekundi.
+# User-i koji se nisu javili ACTIVE_USER_TTL_SECONDS (isto koliko traje user: cache) se brisu u expire_stale_active_users.
+ACTIVE_USERS_KEY = "active_users"
+ACTIVE_USER_TTL_SECONDS = int(os.getenv("ACTIVE_USER_TTL_SECONDS", "3600"))
+
+
+def mark_user_active(user_id, pipe=None):
+    """Dodaje user-a u registar ili mu pomera last-seen na sada. Moze se proslediti pipeline da upis ide sa ostalim komandama."""
+    (pipe or redis_client).zadd(ACTIVE_USERS_KEY, {str(user_id): datetime.now().timestamp()})
+
+
+def mark_user_inactive(user_id, pipe=None):
+    """Brise user-a iz registra (logout)."""
+    (pipe or redis_client).zrem(ACTIVE_USERS_KEY, str(user_id))
+
+
+def expire_stale_active_users(now: float = None) -> int:
+    """Brise user-e koji se nisu javili duze od ACTIVE_USER_TTL_SECONDS, vraca koliko ih je obrisano."""
+    now = datetime.now().timestamp() if now is None else now
+    return redis_client.zremrangebyscore(ACTIVE_USERS_KEY, "-inf", now - ACTIVE_USER_TTL_SECONDS)
+
+
+def scan_active_user_ids(cursor: int = 0, count: int = 500) -> tuple:
+    """
+    Jedan korak ZSCAN-a po registru, za iteraciju u delovima bez blokiranja Redis-a.
+
+    Returns:
+        tuple: (sledeci_cursor, lista user_id-eva), cursor 0 znaci da je iteracija gotova
+    """
+    cursor, members = redis_client.zscan(ACTIVE_USERS_KEY, cursor=cursor, count=count)
+    return cursor, [int(user_id) for user_id, _score in members]
+
+
+def iter_active_user_ids(count: int = 500):
+    """Generator svih user_id-eva iz registra, ZSCAN po count clanova."""
+    cursor = 0
+    while True:
+        cursor, user_ids = scan_active_user_ids(cursor, count)
+        yield from user_ids
+        if cursor == 0:
+            break
+
+
+# --- WEBSOCKET PRETPLATNICI ---
+# Sorted set live_subscriber_sessions: member = "{user_id}:{sid}" (jedna socket konekcija, tj. tab), score = poslednji heartbeat.
+# Heartbeat je connect, resync i live_metering_ping koji klijent salje svakih LIVE_SUBSCRIBER_PING_SECONDS.
+# Konekcija koja se nije javila LIVE_SUBSCRIBER_TTL_SECONDS se brise u expire_stale_live_subscribers, pa pad Flask procesa
+# (disconnect se nikad ne izvrsi) ne ostavlja user-a zauvek "gledanog" kao sto je bilo sa brojacem.
+# Deli se izmedju svih Flask procesa preko Redis-a isto kao i socketio message queue, live metering tick racuna samo za user-e koji su ovde.
+LIVE_SUBSCRIBERS_KEY = "live_subscriber_sessions"
+LIVE_SUBSCRIBER_PING_SECONDS = int(os.getenv("LIVE_SUBSCRIBER_PING_SECONDS", "30"))
+LIVE_SUBSCRIBER_TTL_SECONDS = int(os.getenv("LIVE_SUBSCRIBER_TTL_SECONDS", str(3 * LIVE_SUBSCRIBER_PING_SECONDS)))
+
+
+def _live_subscriber_member(user_id, sid) -> str:
+    return f"{user_id}:{sid}"
+
+
+def touch_live_subscriber(user_id, sid, now: float = None) -> None:
+    """Socket connect/resync/ping: dodaje konekciju ili joj pomera heartbeat na sada."""
+    now = datetime.now().timestamp() if now is None else now
+    redis_client.zadd(LIVE_SUBSCRIBERS_KEY, {_live_subscriber_member(user_id, sid): now})
+
+
+def remove_live_subscriber(user_id, sid) -> int:
+    """Socket disconnect: brise konekciju, vraca koliko jos konekcija user ima (0 -> niko ne gleda)."""
+    redis_client.zrem(LIVE_SUBSCRIBERS_KEY, _live_subscriber_member(user_id, sid))
+    return len(get_live_subscriber_sids(user_id))
+
+
+def get_live_subscriber_sids(user_id) -> list:
+    """sid-ovi otvorenih konekcija user-a (ZSCAN po prefiksu "{user_id}:")."""
+    prefix = f"{user_id}:"
+    return [member[len(prefix):] for member, _score in redis_client.zscan_iter(LIVE_SUBSCRIBERS_KEY, match=f"{prefix}*")]
+
+
+def expire_stale_live_subscribers(now: float = None) -> int:
+    """Brise konekcije bez heartbeat-a duze od LIVE_SUBSCRIBER_TTL_SECONDS, vraca koliko ih je obrisano."""
+    now = datetime.now().timestamp() if now is None else now
+    return redis_client.zremrangebyscore(LIVE_SUBSCRIBERS_KEY, "-inf", now - LIVE_SUBSCRIBER_TTL_SECONDS)
+
+
+def get_watched_user_ids() -> set:
+    """user_id-evi (int) koji imaju bar jednu zivu socket konekciju, prvo brise konekcije bez heartbeat-a."""
+    expire_stale_live_subscribers()
+    return {int(member.split(":", 1)[0]) for member in redis_client.zrange(LIVE_SUBSCRIBERS_KEY, 0, -1)}
+
+
 def get_active_users_from_redis() -> list:
     """
-    Dohvata listu aktivnih korisnika i njihove pune konfiguracije (solar, baterija, IoT)
-    iz Redis kesa, na osnovu definisane seme kesiranja.
-    
+    Vraca listu user_id-eva aktivnih korisnika iz registra active_users.
+    Prvo brise user-e koji se nisu javili duze od ACTIVE_USER_TTL_SECONDS.
+
     Returns:
-        Lista recnika, gde svaki recnik predstavlja aktivnog korisnika sa svim
-        konfiguracionim podacima. Vraca praznu listu ako nema aktivnih korisnika.
+        Lista user_id-eva (int). Vraca praznu listu ako nema aktivnih korisnika.
     """
     print("Dohvatam aktivne korisnike iz Redis-a...")
-    
 
-    # Koristimo 'keys("user:*")' da pronadjemo sve kljuceve aktivnih korisnika.
-    # U produkciji sa mnogo kljuceva, 'scan' je bolji od 'keys'.
-    user_keys = redis_client.keys("user:*")
-    user_ids = [key.split(":")[1] for key in user_keys]
+    expire_stale_active_users()
+    user_ids = list(dict.fromkeys(iter_active_user_ids()))          # ZSCAN moze vratiti isti element vise puta
 
-    if not user_keys:
+    if not user_ids:
         print("Nema aktivnih korisnika u Redis kesu.")
         return []
-    
 
-    print(f"Found {len(user_keys)} active users ")
+    print(f"Found {len(user_ids)} active users ")
     return user_ids
-
-
-
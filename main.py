@@ -28,6 +28,7 @@ app.register_blueprint(registration_blueprint)
 app.register_blueprint(auth_blueprint)
 app.register_blueprint(iot_bp)
 app.register_blueprint(battery_bp)
+app.register_blueprint(energy_bp)
 
 # app.register_blueprint(live_metering_bp)
 
@@ -0,0 +1,12 @@
+-- Migracija za baze napravljene pre dnevnog rollup-a (dumpPraksa.sql se izvrsava samo kada je mysql volume prazan).
+-- RollupDailyEnergyService trazi promenjene sate po updated_at, bez kolone get_changed_energy_days puca.
+-- Postojeci redovi dobijaju updated_at = vreme migracije, prvi rollup ionako nema watermark i preracunava sve dane.
+--
+-- Pokretanje (iz root-a projekta):
+--   docker exec -i mysql_db-praksa mysql -u root -p solar_app_db < migrations/001_user_hourly_energy_updated_at.sql
+
+USE solar_app_db;
+
+ALTER TABLE user_hourly_energy_data
+    ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD KEY idx_hourly_updated_at (updated_at);